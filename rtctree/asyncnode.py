@@ -0,0 +1,222 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Asynchronous facade for a node in the tree.
+
+Requires Python 3 and asyncio.
+
+'''
+
+
+from rtctree import exceptions
+
+
+##############################################################################
+## Asynchronous node object
+
+class AsyncNode(object):
+    '''Gives asyncio code access to a node in the tree without blocking the
+    event loop.
+
+    Every method that may make a remote call returns an awaitable
+    asyncio future. The call itself is made on the executor of the
+    AsyncRTCTree the node came from, counted against the endpoint of the
+    node's object. Create AsyncNode objects through AsyncRTCTree.get_node.
+
+    '''
+    def __init__(self, node, tree, endpoint=None):
+        '''Constructor.
+
+        @param node The node to give access to.
+        @param tree The AsyncRTCTree the node belongs to.
+        @param endpoint The endpoint of the node's object, if known.
+
+        '''
+        super(AsyncNode, self).__init__()
+        self._node = node
+        # The node's lock may be held by a worker thread, so the name is got
+        # now rather than on the event loop.
+        self._name = node.name
+        self._tree = tree
+        self._endpoint = endpoint
+
+    def __repr__(self):
+        return 'AsyncNode({0!r})'.format(self._name)
+
+    ##########################################################################
+    # Generic calls
+
+    def call(self, method, *args, **kwargs):
+        '''Call a method of the node.
+
+        @param method The name of the method.
+        @return A future for the method's return value.
+
+        '''
+        return self._submit(getattr(self._node, method), *args, **kwargs)
+
+    def get(self, attribute):
+        '''Get an attribute of the node, such as a property that makes a
+        remote call.
+
+        @return A future for the attribute's value.
+
+        '''
+        return self._submit(getattr, self._node, attribute)
+
+    ##########################################################################
+    # Tree structure
+
+    def children(self):
+        '''Get the children of the node.
+
+        A lazy directory lists its naming context first.
+
+        @return A future for a list of AsyncNode objects.
+
+        '''
+        def children():
+            return [self._tree._wrap_node(c) for c in self._node.children]
+        return self._submit(children)
+
+    def get_node(self, path):
+        '''Get a node below this node.
+
+        @param path A list of path elements, starting with this node's name.
+        @return A future for an AsyncNode, or None if the path does not point
+                to a node.
+
+        '''
+        def get_node():
+            return self._tree._wrap_node(self._node.get_node(path))
+        return self._submit(get_node)
+
+    ##########################################################################
+    # Component state
+
+    def state(self):
+        '''Get the merged state of the component in all its execution
+        contexts.
+        '''
+        return self.get('state')
+
+    def state_in_ec(self, ec_index):
+        '''Get the component's cached state in an execution context.'''
+        return self.call('state_in_ec', ec_index)
+
+    def refresh_state_in_ec(self, ec_index):
+        '''Get the component's current state in an execution context.'''
+        return self.call('refresh_state_in_ec', ec_index)
+
+    def activate_in_ec(self, ec_index):
+        '''Activate the component in an execution context.'''
+        return self.call('activate_in_ec', ec_index)
+
+    def deactivate_in_ec(self, ec_index):
+        '''Deactivate the component in an execution context.'''
+        return self.call('deactivate_in_ec', ec_index)
+
+    def reset_in_ec(self, ec_index):
+        '''Reset the component in an execution context.'''
+        return self.call('reset_in_ec', ec_index)
+
+    def exit(self):
+        '''Stop the component.'''
+        return self.call('exit')
+
+    ##########################################################################
+    # Ports
+
+    def ports(self):
+        '''Get the component's ports.'''
+        return self.get('ports')
+
+    def connect(self, port_name, dests, name=None, id='', props={}):
+        '''Connect a port of the component to ports of other components.
+
+        @param port_name The name of the port of this component.
+        @param dests A list of (node, port name) tuples giving the ports to
+                     connect to. Each node may be an AsyncNode or a Component
+                     node.
+        @param name, id, props As for Port.connect.
+        @return A future that is done when the ports are connected.
+        @raises NoSuchPortError through the future, if a port does not exist.
+
+        '''
+        def connect():
+            port = _get_port(self._node, port_name)
+            dest_ports = [_get_port(n.node if isinstance(n, AsyncNode) else n,
+                p) for n, p in dests]
+            port.connect(dest_ports, name, id, props)
+        return self._submit(connect)
+
+    def disconnect_all(self):
+        '''Disconnect all the component's ports.'''
+        return self.call('disconnect_all')
+
+    ##########################################################################
+    # Configuration
+
+    def conf_sets(self):
+        '''Get the component's configuration sets.'''
+        return self.get('conf_sets')
+
+    def active_conf_set_name(self):
+        '''Get the name of the component's active configuration set.'''
+        return self.get('active_conf_set_name')
+
+    def activate_conf_set(self, set_name):
+        '''Activate a configuration set of the component.'''
+        return self.call('activate_conf_set', set_name)
+
+    def set_conf_set_value(self, set_name, param, value):
+        '''Set a parameter in one of the component's configuration sets.'''
+        return self.call('set_conf_set_value', set_name, param, value)
+
+    ##########################################################################
+    # Local information
+
+    @property
+    def endpoint(self):
+        '''The endpoint the node's remote calls are counted against.'''
+        return self._endpoint
+
+    @property
+    def name(self):
+        '''The name of the node.'''
+        return self._name
+
+    @property
+    def node(self):
+        '''The node this object gives access to.
+
+        Its methods and properties block while they make remote calls.
+
+        '''
+        return self._node
+
+    def _submit(self, func, *args, **kwargs):
+        return self._tree._submit(self._endpoint, func, *args, **kwargs)
+
+
+def _get_port(comp, port_name):
+    # Get a component's port by name.
+    port = comp.get_port_by_name(port_name)
+    if not port:
+        raise exceptions.NoSuchPortError(port_name)
+    return port
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
@@ -0,0 +1,224 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Asynchronous facade for RTCTree.
+
+Requires Python 3 and asyncio.
+
+'''
+
+
+try:
+    import asyncio
+except ImportError:
+    # Python 2. The module can still be imported, as when collecting
+    # doctests, but trees cannot be created.
+    asyncio = None
+
+from rtctree import utils
+from rtctree.asyncnode import AsyncNode
+from rtctree.executor import EndpointExecutor
+from rtctree.tree import RTCTree
+
+
+##############################################################################
+## Asynchronous tree object
+
+class AsyncRTCTree(object):
+    '''Gives asyncio code access to an RTCTree without blocking the event
+    loop.
+
+    omniORB calls block, so every operation that may make a remote call is
+    run on an EndpointExecutor: a bounded pool of worker threads that limits
+    the calls made at the same time to each endpoint. Thousands of
+    concurrent queries are queued rather than each given a thread, and a
+    slow manager process only holds up the queries made to it. Each such
+    operation returns an awaitable future.
+
+    Create a tree and parse it without blocking the loop using @ref create:
+
+    tree = await AsyncRTCTree.create(servers=['localhost'])
+    comp = await tree.get_node(['/', 'localhost', 'ConsoleIn0.rtc'])
+    await comp.activate_in_ec(0)
+    state = await comp.state()
+
+    Nodes are returned as AsyncNode objects.
+
+    '''
+    def __init__(self, tree, executor=None, workers=16, per_endpoint=4):
+        '''Constructor.
+
+        @param tree The RTCTree to give access to.
+        @param executor The EndpointExecutor to make calls on. If None, one is
+                        created with @ref workers and @ref per_endpoint.
+        @param workers The maximum number of remote calls to make at the same
+                       time.
+        @param per_endpoint The maximum number of remote calls to make at the
+                            same time to any one endpoint.
+        @raises ImportError if asyncio is not available.
+
+        '''
+        super(AsyncRTCTree, self).__init__()
+        _check_asyncio()
+        self._tree = tree
+        if executor is None:
+            executor = EndpointExecutor(workers, per_endpoint)
+        self._executor = executor
+
+    @classmethod
+    def create(cls, *args, **kwargs):
+        '''Create and parse a tree on a worker thread.
+
+        @param workers The maximum number of remote calls to make at the same
+                       time. Keyword only; defaults to 16.
+        @param per_endpoint The maximum number of remote calls to make at the
+                            same time to any one endpoint. Keyword only;
+                            defaults to 4.
+        @param args, kwargs The other arguments are given to the RTCTree
+                            constructor.
+        @return A future for the new AsyncRTCTree.
+        @raises ImportError if asyncio is not available.
+
+        '''
+        _check_asyncio()
+        executor = EndpointExecutor(kwargs.pop('workers', 16),
+                kwargs.pop('per_endpoint', 4))
+        def create():
+            try:
+                return cls(RTCTree(*args, **kwargs), executor=executor)
+            except:
+                # Nothing else will stop the worker threads. This call is
+                # still running on one of them, so do not wait for it.
+                executor.shutdown(wait=False)
+                raise
+        return asyncio.wrap_future(executor.submit(None, create))
+
+    def close(self, wait=True):
+        '''Stop the worker threads once the calls already made have finished.
+        '''
+        self._executor.shutdown(wait)
+
+    def add_name_server(self, server, filter=[], dynamic=None):
+        '''Parse a name server, adding its contents to the tree.
+
+        @return A future that is done when the name server has been parsed.
+
+        '''
+        return self._submit(server, self._tree.add_name_server, server,
+                filter, dynamic)
+
+    def get_node(self, path):
+        '''Get a node by its path.
+
+        @param path A list of path elements, starting with '/'.
+        @return A future for an AsyncNode, or None if the path does not point
+                to a node.
+
+        '''
+        def get_node():
+            return self._wrap_node(self._tree.get_node(path))
+        return self._submit(_path_server(path), get_node)
+
+    def has_path(self, path):
+        '''Check if a path exists in the tree.
+
+        @return A future for a bool.
+
+        '''
+        return self._submit(_path_server(path), self._tree.has_path, path)
+
+    def is_component(self, path):
+        '''Check if a path points to a component.'''
+        return self._submit(_path_server(path), self._tree.is_component, path)
+
+    def is_directory(self, path):
+        '''Check if a path points to a directory.'''
+        return self._submit(_path_server(path), self._tree.is_directory, path)
+
+    def is_manager(self, path):
+        '''Check if a path points to a manager.'''
+        return self._submit(_path_server(path), self._tree.is_manager, path)
+
+    def is_nameserver(self, path):
+        '''Check if a path points to a name server.'''
+        return self._submit(_path_server(path), self._tree.is_nameserver,
+                path)
+
+    def is_zombie(self, path):
+        '''Check if a path points to a zombie.'''
+        return self._submit(_path_server(path), self._tree.is_zombie, path)
+
+    def run(self, endpoint, func, *args, **kwargs):
+        '''Call any blocking function on the tree's executor.
+
+        @param endpoint The endpoint the function's remote calls go to, or
+                        None if it is not known.
+        @return A future for the function's return value.
+
+        '''
+        return self._submit(endpoint, func, *args, **kwargs)
+
+    @property
+    def executor(self):
+        '''The executor remote calls are made on.'''
+        return self._executor
+
+    @property
+    def tree(self):
+        '''The RTCTree this object gives access to.
+
+        Its methods block while they make remote calls.
+
+        '''
+        return self._tree
+
+    def _submit(self, endpoint, func, *args, **kwargs):
+        # Run a blocking call on the executor and give back an asyncio future
+        # for it, on the calling thread's event loop.
+        return asyncio.wrap_future(self._executor.submit(endpoint, func,
+            *args, **kwargs))
+
+    def _wrap_node(self, node):
+        # Make an AsyncNode for a node, counting its calls against the
+        # endpoint of its object. Called on a worker thread, as finding the
+        # endpoint locks the node. Directories are counted against their
+        # name server.
+        if node is None:
+            return None
+        endpoint = None
+        if node.is_component or node.is_manager or node.is_unknown:
+            obj = node.object
+            if obj is not None:
+                endpoint = utils.ior_endpoint(
+                        self._tree.orb.object_to_string(obj))
+        elif node.is_directory:
+            endpoint = _path_server(node.full_path)
+        return AsyncNode(node, self, endpoint)
+
+
+def _check_asyncio():
+    # Make sure asyncio is available.
+    if asyncio is None:
+        raise ImportError('AsyncRTCTree needs asyncio (Python 3.4 or later)')
+
+
+def _path_server(path):
+    # Get the name server a path goes through, if any.
+    if len(path) > 1:
+        return path[1]
+    return None
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
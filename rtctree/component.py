@@ -20,6 +20,8 @@ Object representing a component node in the tree.
 import time
 import uuid
 
+from omniORB import CORBA, TRANSIENT_ConnectFailed
+
 from rtctree import exceptions
 from rtctree import ports
 from rtctree import sdo
@@ -29,6 +31,7 @@ from rtctree.exec_context import ExecutionContext
 from rtctree.node import TreeNode
 from rtctree.rtc import RTC
 from rtctree.rtc import SDOPackage
+from rtctree.zombie import Zombie
 
 
 ##############################################################################
@@ -232,25 +235,44 @@ class Component(TreeNode):
     >>> p[1].wait()
     -15
     '''
-    def __init__(self, name=None, parent=None, obj=None, *args, **kwargs):
+    __slots__ = ('_active_conf_set', '_category', '_conf', '_conf_sets',
+            '_defer_profile', '_description', '_instance_name',
+            '_last_heartbeat', '_loggers', '_members', '_obj', '_obs',
+            '_obs_id', '_orgs', '_owned_ec_states', '_owned_ecs',
+            '_parent_obj', '_parent_orgs', '_participating_ec_states',
+            '_participating_ecs', '_ports', '_profile_parsed', '_properties',
+            '_type_name', '_vendor', '_version')
+
+    def __init__(self, name=None, parent=None, obj=None, defer_profile=False,
+            *args, **kwargs):
         '''Constructor.
 
         @param name Name of this component (i.e. its entry in the path).
         @param parent The parent node of this node, if any.
         @param obj The CORBA LightweightRTObject object to wrap.
+        @param defer_profile Do not get the component's profile until one of
+                             the profile properties, such as instance_name or
+                             properties, is first used. Because the
+                             component is not contacted when the node is
+                             created, a component that no longer exists is
+                             not noticed until then: the property raises
+                             the CORBA error, and the node is replaced in
+                             its parent by a Zombie node.
 
         '''
         self._obj = obj
+        self._defer_profile = defer_profile
+        self._profile_parsed = False
         self._obs = None
         self._obs_id = None
-        self._loggers = {}
+        self._loggers = None
         self._last_heartbeat = time.time() # RTC is alive at construction time
         super(Component, self).__init__(name=name, parent=parent,
                                         *args, **kwargs)
-        self._set_events(['rtc_status', 'component_profile', 'ec_event',
-            'port_event', 'config_event', 'heartbeat', 'fsm_event'])
+        self._set_events(self._EVENTS)
         self._reset_data()
-        self._parse_profile()
+        if not defer_profile:
+            self._parse_profile()
 
     def reparse(self):
         '''Reparse the component's information.
@@ -265,7 +287,7 @@ class Component(TreeNode):
 
         '''
         self._reset_data()
-        self._parse_profile()
+        self.reparse_profile()
 
     def reparse_conf_sets(self):
         '''Delayed reparse configuration sets.'''
@@ -290,7 +312,11 @@ class Component(TreeNode):
 
     def reparse_profile(self):
         '''Delayed reparse the component's profile.'''
-        self._parse_profile()
+        if self._defer_profile:
+            with self._mutex:
+                self._profile_parsed = False
+        else:
+            self._parse_profile()
 
     ###########################################################################
     # Component information
@@ -298,18 +324,21 @@ class Component(TreeNode):
     @property
     def category(self):
         '''The category in which the component belongs.'''
+        self._load_profile()
         with self._mutex:
             return self._category
 
     @property
     def description(self):
         '''The component's description.'''
+        self._load_profile()
         with self._mutex:
             return self._description
 
     @property
     def instance_name(self):
         '''Instance name of the component.'''
+        self._load_profile()
         with self._mutex:
             return self._instance_name
 
@@ -319,30 +348,35 @@ class Component(TreeNode):
         component), if it has one.
 
         '''
+        self._load_profile()
         with self._mutex:
             return self._parent_obj
 
     @property
     def properties(self):
         '''The component's extra properties dictionary.'''
+        self._load_profile()
         with self._mutex:
             return self._properties
 
     @property
     def type_name(self):
         '''Type name of the component.'''
+        self._load_profile()
         with self._mutex:
             return self._type_name
 
     @property
     def vendor(self):
         '''The component's vendor.'''
+        self._load_profile()
         with self._mutex:
             return self._vendor
 
     @property
     def version(self):
         '''The component's version.'''
+        self._load_profile()
         with self._mutex:
             return self._version
 
@@ -363,7 +397,7 @@ class Component(TreeNode):
         org = self.organisations[0].obj
         org.add_members([x.object for x in rtcs])
         # Force a reparse of the member information
-        self._orgs = []
+        self._orgs = None
 
     def remove_members(self, rtcs):
         '''Remove other RT Components from this composite component.
@@ -390,7 +424,7 @@ class Component(TreeNode):
             # Remove the RTC from the composition
             org.remove_member(rtc_name)
         # Force a reparse of the member information
-        self._orgs = []
+        self._orgs = None
 
     @property
     def composite_parent(self):
@@ -441,10 +475,11 @@ class Component(TreeNode):
         '''Member components if this component is composite.'''
         with self._mutex:
             if not self._members:
-                self._members = {}
+                members = {}
                 for o in self.organisations:
                     # TODO: Search for these in the tree
-                    self._members[o.org_id] = o.obj.get_members()
+                    members[o.org_id] = o.obj.get_members()
+                self._members = members
         return self._members
 
     @property
@@ -459,6 +494,7 @@ class Component(TreeNode):
 
         with self._mutex:
             if not self._orgs:
+                self._orgs = []
                 for org in self._obj.get_owned_organizations():
                     owner = org.get_owner()
                     if owner:
@@ -498,6 +534,7 @@ class Component(TreeNode):
 
         with self._mutex:
             if not self._parent_orgs:
+                self._parent_orgs = []
                 for sdo in self._obj.get_organizations():
                     if not sdo:
                         continue
@@ -996,6 +1033,8 @@ class Component(TreeNode):
     @property
     def loggers(self):
         '''Returns the list of logger IDs attached to this component.'''
+        if not self._loggers:
+            return []
         return list(self._loggers.keys())
 
     @property
@@ -1033,6 +1072,8 @@ class Component(TreeNode):
             conf = self.object.get_configuration()
             res = conf.add_service_profile(sprof)
             if res:
+                if self._loggers is None:
+                    self._loggers = {}
                 self._loggers[uuid_val] = obs
                 return uuid_val
             raise exceptions.AddLoggerError(self.name)
@@ -1044,7 +1085,7 @@ class Component(TreeNode):
         @raises NoLoggerError
 
         '''
-        if cb_id not in self._loggers:
+        if not self._loggers or cb_id not in self._loggers:
             raise exceptions.NoLoggerError(cb_id, self.name)
         conf = self.object.get_configuration()
         res = conf.remove_service_profile(cb_id.get_bytes())
@@ -1261,6 +1302,36 @@ class Component(TreeNode):
             except SDOPackage.NotAvailable:
                 self._active_conf_set = ''
 
+    def _load_profile(self):
+        # Parse the component's profile if that has been deferred. A
+        # component found not to exist is replaced by a Zombie node, as when
+        # its profile is parsed while the tree is built, and the error is
+        # raised to the caller. This node's lock is not held on entry, so
+        # that the parent's lock can be taken to replace it.
+        with self._mutex:
+            if self._profile_parsed:
+                return
+        try:
+            self._parse_profile()
+        except CORBA.OBJECT_NOT_EXIST:
+            self._replace_with_zombie()
+            raise
+        except CORBA.TRANSIENT as e:
+            if e.args[0] == TRANSIENT_ConnectFailed:
+                self._replace_with_zombie()
+            raise
+
+    def _replace_with_zombie(self):
+        # Put a Zombie node in this node's place in its parent.
+        parent = self._parent
+        if parent is None:
+            return
+        with parent._mutex:
+            if parent._children.get(self._name) is not self:
+                return
+            parent._add_child(Zombie(self._name, parent,
+                dynamic=self.dynamic))
+
     def _parse_profile(self):
         # Parse the component's profile
         with self._mutex:
@@ -1277,6 +1348,7 @@ class Component(TreeNode):
             else:
                 self._parent_obj = ''
             self._properties = utils.nvlist_to_dict(profile.properties)
+            self._profile_parsed = True
 
     def _port_event(self, port_name, event):
         def get_port_obj(port_name):
@@ -1348,10 +1420,12 @@ class Component(TreeNode):
             self._ports = None
 
     def _reset_composite(self):
+        # The composition caches are made when first used; most components
+        # are not in a composition.
         with self._mutex:
-            self._orgs = []
-            self._parent_orgs = []
-            self._members = {}
+            self._orgs = None
+            self._parent_orgs = None
+            self._members = None
 
     def _set_state_in_ec(self, ec_handle, state):
         # Forcefully set the state of this component in an EC
@@ -1366,6 +1440,10 @@ class Component(TreeNode):
         # Call callbacks outside the mutex
         self._call_cb('rtc_status', (ec_handle, state))
 
+    # The events callbacks can be added for
+    _EVENTS = ('rtc_status', 'component_profile', 'ec_event', 'port_event',
+            'config_event', 'heartbeat', 'fsm_event')
+
     # Constant for a component in the inactive state
     INACTIVE = 1
     # Constant for a component in the active state
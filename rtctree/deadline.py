@@ -0,0 +1,184 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Object used to limit the wall-clock time spent building a tree.
+
+'''
+
+
+import contextlib
+import threading
+import time
+
+import omniORB
+
+
+##############################################################################
+## Deadline object
+
+class Deadline(object):
+    '''A time limit shared by all the nodes built while parsing a tree.
+
+    Nodes check the deadline before making remote calls. Once it has
+    expired, they stop parsing and mark what is left as pending. A deadline
+    is cleared when the parse it limits is over, so that nodes expanded
+    later, such as pending directories, are not limited by it.
+
+    A deadline can also be made to expire early, to stop a parse that is no
+    longer needed.
+
+    A deadline may carry a timeout for each remote call made during the
+    parse. It is applied to a thread by @ref limit_calls. A call is never
+    allowed more than the time left until the deadline, so a call started
+    just before it expires cannot take the parse far past it.
+
+    '''
+    def __init__(self, seconds=None, call_timeout=None):
+        '''Constructor.
+
+        @param seconds The time from now until the deadline expires. If
+                       None, the deadline only expires when @ref expire is
+                       called.
+        @param call_timeout The maximum time, in seconds, that a single
+                            remote call made during the parse may take. If
+                            None, calls are only limited by the time left.
+
+        '''
+        if seconds is None:
+            self._end = None
+        else:
+            self._end = time.time() + seconds
+        self._call_timeout = call_timeout
+        self._active = True
+
+    def expire(self):
+        '''Make the deadline expire now, stopping the parse it limits.'''
+        self._end = 0
+
+    def clear(self):
+        '''Stop enforcing the deadline.'''
+        self._active = False
+
+    @property
+    def call_timeout(self):
+        '''The timeout, in seconds, for a remote call made now, or None if
+        calls are not limited or the deadline is no longer enforced.
+
+        This is the smaller of the call timeout and the time remaining.
+
+        >>> Deadline(call_timeout=5).call_timeout
+        5
+        >>> Deadline(60, 5).call_timeout
+        5
+        >>> Deadline(1, 5).call_timeout <= 1
+        True
+
+        '''
+        remaining = self.remaining
+        if remaining is None:
+            return self._call_timeout if self._active else None
+        if self._call_timeout is None:
+            return remaining
+        return min(self._call_timeout, remaining)
+
+    @property
+    def expired(self):
+        '''Has the deadline passed, if it is still enforced?'''
+        return self._active and self._end is not None and \
+                time.time() >= self._end
+
+    @property
+    def remaining(self):
+        '''The number of seconds left until the deadline, or None if the
+        deadline is no longer enforced.
+
+        '''
+        if not self._active or self._end is None:
+            return None
+        return max(self._end - time.time(), 0)
+
+
+##############################################################################
+## API functions
+
+# The call timeout, in milliseconds, set for each thread by limit_calls, and
+# the deadline it was taken from
+_thread_timeouts = threading.local()
+
+
+@contextlib.contextmanager
+def limit_calls(deadline):
+    '''Limit the remote calls made by the calling thread to the call timeout
+    of a deadline.
+
+    omniORB's per-thread call timeout is used, so calls made by other threads,
+    and calls made by this thread once the block is left, are not affected.
+    Connection attempts are limited by the same timeout unless omniORB has
+    been configured with a separate connect timeout.
+
+    The timeout is fixed when the block is entered. As the deadline draws
+    nearer, call @ref renew_calls before making more calls so that they are
+    limited to the time left.
+
+    with limit_calls(deadline):
+        ...
+
+    @param deadline A Deadline, or None. Nothing is changed if it is None or
+                    has no call timeout.
+
+    '''
+    timeout = deadline.call_timeout if deadline else None
+    if timeout is None:
+        yield
+        return
+    previous = getattr(_thread_timeouts, 'ms', 0)
+    previous_deadline = getattr(_thread_timeouts, 'deadline', None)
+    _thread_timeouts.deadline = deadline
+    _set_timeout(timeout)
+    try:
+        yield
+    finally:
+        # A timeout of zero leaves the thread with no timeout of its own.
+        _thread_timeouts.ms = previous
+        _thread_timeouts.deadline = previous_deadline
+        omniORB.setClientThreadCallTimeout(previous)
+
+
+def renew_calls():
+    '''Limit the next remote calls made by the calling thread to the call
+    timeout of its deadline as it is now.
+
+    This only has an effect inside a @ref limit_calls block, and only if the
+    deadline is still enforced.
+
+    '''
+    deadline = getattr(_thread_timeouts, 'deadline', None)
+    if deadline is None:
+        return
+    timeout = deadline.call_timeout
+    if timeout is not None:
+        _set_timeout(timeout)
+
+
+def _set_timeout(timeout):
+    # Set the call timeout of the calling thread, in seconds. A timeout of
+    # zero would mean no timeout at all, so the shortest is a millisecond.
+    ms = max(int(timeout * 1000), 1)
+    if ms != getattr(_thread_timeouts, 'ms', 0):
+        _thread_timeouts.ms = ms
+        omniORB.setClientThreadCallTimeout(ms)
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
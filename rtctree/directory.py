@@ -18,18 +18,23 @@ Object representing a directory node in the tree.
 '''
 
 
-import copy
 import sys
+import threading
 
 import CosNaming
-from omniORB import CORBA, TRANSIENT_ConnectFailed
+from omniORB import CORBA, TRANSIENT_CallTimedout, TRANSIENT_ConnectFailed
 
 from rtctree import exceptions
 from rtctree import utils
 from rtctree.component import Component
+from rtctree.deadline import renew_calls
 from rtctree.manager import Manager
 from rtctree.node import TreeNode
 from rtctree.options import Options
+from rtctree.pager import BindingPager
+from rtctree.pathfilter import PathFilter, compile_filter
+from rtctree.placeholder import Placeholder
+from rtctree.scheduler import ParseScheduler
 from rtctree.unknown import Unknown
 from rtctree.zombie import Zombie
 from rtctree.rtc import RTC
@@ -47,25 +52,179 @@ class Directory(TreeNode):
     directory context may specialise as a name server context, in which case
     it represents the root context of a name server.
 
+    A lazy directory does not list its naming context when it is parsed.
+    Instead, the context is listed and its bindings resolved the first time
+    the children of the directory are needed, through @ref children,
+    @ref children_names, @ref get_node, @ref has_path or @ref iterate.
+    Sub-contexts of a lazy directory are themselves lazy, so getting a node
+    by path only makes remote calls for the directories along that path.
+
     '''
-    def __init__(self, name=None, parent=None, children=None, filter=[], *args,
-            **kwargs):
-        '''Constructor. Calls the TreeNode constructor.'''
+    __slots__ = ('_concurrency', '_context', '_dead_endpoints', '_deadline',
+            '_defer_profiles', '_deferred', '_endpoint_concurrency',
+            '_expand_mutex', '_lazy', '_listener', '_names_only', '_orb',
+            '_restored', '_timed_out', '_trust_kinds')
+
+    def __init__(self, name=None, parent=None, children=None, filter=[],
+            concurrency=1, lazy=False, defer_profiles=False,
+            names_only=False, trust_kinds=False, deadline=None,
+            dead_endpoints=None, endpoint_concurrency=None, listener=None,
+            *args, **kwargs):
+        '''Constructor. Calls the TreeNode constructor.
+
+        @param concurrency The maximum number of naming contexts below this
+                           directory to list and resolve at the same time.
+                           If greater than 1, sub-contexts are parsed on a
+                           pool of worker threads rather than depth-first.
+        @param lazy Delay listing the naming context until the children of
+                    this directory are needed.
+        @param defer_profiles Create component nodes without contacting the
+                              components. Each binding then costs a single
+                              resolve on the name server; a component's
+                              profile is fetched when it is first used. If
+                              the component no longer exists, using the
+                              profile raises the CORBA error and the node
+                              is replaced by a Zombie node.
+        @param names_only Build the directory from the names of the bindings
+                          only. Objects are not resolved; a Placeholder node
+                          is created for each of them instead.
+        @param trust_kinds Trust the kind of each binding ('rtc', 'mgr' or a
+                           naming context) to give the type of the object,
+                           and narrow object references without checking.
+                           This saves one is_a round trip for every
+                           component, manager and sub-context. The type is
+                           only checked if the first call on a component or
+                           manager fails because the object does not support
+                           it, in which case the node becomes an Unknown
+                           node if the object is not of the expected type.
+        @param deadline A Deadline object limiting the time spent parsing.
+                        Once it has expired, sub-contexts are left pending,
+                        to be listed when they are first used, and objects
+                        are represented by Placeholder nodes. The same is
+                        done for any context or object for which a remote
+                        call times out.
+        @param dead_endpoints An EndpointCache of the endpoints that cannot
+                              be reached. Objects at those endpoints become
+                              Zombie nodes without being contacted, and the
+                              endpoint of any object that cannot be
+                              connected to is added to it.
+        @param endpoint_concurrency When contexts are parsed concurrently, the
+                                    maximum number of remote calls to make at
+                                    the same time to any one endpoint (the
+                                    name server, or a manager process hosting
+                                    components). Components are contacted
+                                    from the worker pool, grouped by the
+                                    endpoint in their IORs.
+        @param listener A function to call with each node created while this
+                        directory and its sub-directories are parsed. It is
+                        called as soon as the node is added to the tree,
+                        possibly from a worker thread.
+
+        '''
         super(Directory, self).__init__(name=name, parent=parent,
                 children=children, filter=filter, *args, **kwargs)
+        self._concurrency = concurrency
+        self._lazy = lazy
+        self._defer_profiles = defer_profiles
+        self._names_only = names_only
+        self._trust_kinds = trust_kinds
+        self._context = None
+        self._orb = None
+        self._deferred = None
+        self._restored = False
+        self._deadline = deadline
+        self._timed_out = False
+        self._dead_endpoints = dead_endpoints
+        self._endpoint_concurrency = endpoint_concurrency
+        self._expand_mutex = threading.Lock()
+        self._listener = listener
+
+    def get_node(self, path):
+        '''Get a child node of this node, or this node, based on a path.
+
+        A lazy directory is expanded if the path continues below it. A
+        directory restored from a snapshot is reparsed the first time the
+        path names a child it does not have.
+
+        '''
+        if len(path) > 1 and path[0] == self._name:
+            self._expand()
+            self._refresh_restored(path[1])
+        return super(Directory, self).get_node(path)
+
+    def has_path(self, path):
+        '''Check if a path exists below this node.
+
+        A lazy directory is expanded if the path continues below it. A
+        directory restored from a snapshot is reparsed the first time the
+        path names a child it does not have.
+
+        '''
+        if len(path) > 1 and path[0] == self._name:
+            self._expand()
+            self._refresh_restored(path[1])
+        return super(Directory, self).has_path(path)
+
+    def is_child(self, other_node):
+        '''Is @ref other_node a child of this node?'''
+        self._expand()
+        return super(Directory, self).is_child(other_node)
 
-    def reparse(self):
-        '''Reparse all children of this directory.
+    def reparse(self, verify_objects=True):
+        '''Bring the children of this directory up to date.
 
-        This effectively rebuilds the tree below this node.
+        The naming context is listed again and the bindings compared with the
+        existing children by name, type and object. Nodes are created only for
+        new bindings, and the nodes of bindings that have gone are removed.
+        Unchanged nodes are kept as they are, along with their callbacks and
+        any information they have cached. The children are kept in the order
+        of the bindings. Sub-directories are updated in the same way, so a
+        refresh costs one listing for each naming context, and one resolve
+        for each object.
 
-        This operation takes an unbounded time to complete; if there are a lot
-        of objects registered below this directory's context, they will all
-        need to be parsed.
+        Zombie nodes are always rebuilt, so components that have been
+        restarted under the same name are found again.
+
+        A lazy directory that has not been expanded yet is left alone; it
+        will list its context when it is first used.
+
+        @param verify_objects If True, each object binding is resolved and
+                              its object compared with the object of the
+                              existing node, which is rebuilt if they differ,
+                              so that a component restarted under the same
+                              name is found again. The comparison is made
+                              locally, from the object references. If False,
+                              only the names and types are compared, saving
+                              the resolves.
 
         '''
-        self._remove_all_children()
-        self._parse_context(self._context, self.orb)
+        with self._mutex:
+            if self._deferred:
+                return
+            context = self.context
+            orb = self._orb = self.orb
+            old_children = dict(self._children)
+            subdirs = []
+            names = []
+            no_filter = PathFilter()
+            for binding in self._list_bindings(context):
+                name = corba_name_to_string(binding.binding_name)
+                names.append(name)
+                child = old_children.pop(name, None)
+                if child and self._same_binding(child, binding,
+                        verify_objects):
+                    if binding.binding_type != CosNaming.nobject:
+                        subdirs.append(child)
+                    continue
+                if child:
+                    self.remove_child(child)
+                self._process_binding(binding, orb, no_filter)
+            for child in old_children.values():
+                # The binding for this node has gone
+                self.remove_child(child)
+            self._order_children(names)
+        for subdir in subdirs:
+            subdir.reparse(verify_objects)
 
     def unbind(self, name):
         '''Unbind an object from the context represented by this directory.
@@ -79,20 +238,38 @@ class Directory(TreeNode):
 
         '''
         with self._mutex:
-            id, sep, kind = name.rpartition('.')
-            if not id:
-                id = kind
-                kind = ''
-            name = CosNaming.NameComponent(id=str(id), kind=str(kind))
+            name = _name_component(name)
             try:
                 self.context.unbind([name])
             except CosNaming.NamingContext.NotFound:
                 raise exceptions.BadPathError(name)
 
+    @property
+    def children(self):
+        '''The child nodes of this node (if any).'''
+        self._expand()
+        return super(Directory, self).children
+
+    @property
+    def children_names(self):
+        '''A list of the names of the child nodes of this node (if any).'''
+        self._expand()
+        return super(Directory, self).children_names
+
     @property
     def context(self):
         '''The object representing this naming context.'''
         with self._mutex:
+            if self._context or not self._deferred:
+                return self._context
+            binding_name = self._deferred[0]
+        # The context of a lazy subdirectory is resolved from its parent's
+        # context when it is first needed.
+        context = self._parent._narrow_context(
+                self._parent.context.resolve(binding_name))
+        with self._mutex:
+            if not self._context:
+                self._context = context
             return self._context
 
     @property
@@ -100,96 +277,471 @@ class Directory(TreeNode):
         '''Is this node a directory?'''
         return True
 
-    def _parse_context(self, context, orb, filter=[]):
+    @property
+    def concurrency(self):
+        '''The maximum number of naming contexts parsed at the same time.'''
+        with self._mutex:
+            return self._concurrency
+
+    @property
+    def defer_profiles(self):
+        '''Are the profiles of components below this directory fetched only
+        when they are first used?
+
+        '''
+        with self._mutex:
+            return self._defer_profiles
+
+    @property
+    def expanded(self):
+        '''Has the naming context of this directory been listed?'''
+        with self._mutex:
+            return not self._deferred
+
+    @property
+    def is_pending(self):
+        '''Is this node waiting to be filled in from the name server?'''
+        return not self.expanded
+
+    @property
+    def timed_out(self):
+        '''Did a remote call for this node time out while it was parsed?'''
+        with self._mutex:
+            return self._timed_out
+
+    @property
+    def trust_kinds(self):
+        '''Are the kinds of bindings below this directory trusted to give
+        the types of their objects?
+
+        '''
+        with self._mutex:
+            return self._trust_kinds
+
+    @property
+    def lazy(self):
+        '''Is this directory expanded only when its children are needed?'''
+        with self._mutex:
+            return self._lazy
+
+    @property
+    def names_only(self):
+        '''Are objects below this directory represented by placeholders?'''
+        with self._mutex:
+            return self._names_only
+
+    def _defer_context(self, binding_name, orb, filter=[]):
+        # Record what is needed to parse this directory later. If
+        # binding_name is not None, the context is resolved from the parent's
+        # context using that name.
+        with self._mutex:
+            self._orb = orb
+            self._deferred = (binding_name, orb, compile_filter(filter))
+        self._note_pending()
+
+    def _expand(self):
+        # Parse a lazy directory's context if it has not been parsed yet. The
+        # deferred context is only ever replaced, so it is checked without
+        # locking; an expanded directory costs readers nothing.
+        deferred = self._deferred
+        if not deferred:
+            return
+        # The directory's mutex is not held while parsing, so that worker
+        # threads can add children to it. Other threads wanting to expand it
+        # wait here instead.
+        with self._expand_mutex:
+            with self._mutex:
+                if self._deferred is not deferred:
+                    # Expanded by another thread in the mean time
+                    return
+                binding_name, orb, filter = deferred
+                self._timed_out = False
+            context = self.context
+            self._parse_context(context, orb, filter, expand=True)
+            with self._mutex:
+                if self._deferred is deferred:
+                    # Not deferred again because of a time out
+                    self._deferred = None
+            self._note_pending()
+
+    def _is_unlisted(self):
+        # See TreeNode._is_unlisted. The deferred context is only ever
+        # replaced, so it is read without locking.
+        return bool(self._deferred)
+
+    def _refresh_restored(self, name):
+        # The children of a directory restored from a snapshot may be out of
+        # date. The first time a child that is not in the snapshot is looked
+        # for, list the naming context again.
+        if not self._restored:
+            return
+        with self._mutex:
+            if not self._restored or name in self._children:
+                return
+            self._restored = False
+        self.reparse()
+
+    def _parse_context(self, context, orb, filter=[], scheduler=None,
+            expand=False):
+        filter = compile_filter(filter)
+        if self._lazy and not expand:
+            # Only remember the context; it is listed when first needed.
+            with self._mutex:
+                self._context = context
+                self._defer_context(None, orb, filter)
+            return
+        if not scheduler and self._concurrency > 1:
+            # Spread the parsing of the sub-contexts over a pool of workers,
+            # then wait for the whole subtree to be complete.
+            with ParseScheduler(self._concurrency,
+                    self._endpoint_concurrency,
+                    self._deadline) as scheduler:
+                self._parse_context(context, orb, filter, scheduler,
+                        expand=expand)
+                scheduler.wait()
+            return
         with self._mutex:
             # Parse a naming context to fill in the children.
             self._context = context
-            # Get the list of bindings from the context
-            bindings, bindings_it = context.list(Options().\
-                                        get_option('max_bindings'))
+            self._orb = orb
+            if self._out_of_time():
+                # Leave the context to be listed when it is first used.
+                self._defer_context(None, orb, filter)
+                return
+            try:
+                for binding in self._list_bindings(context):
+                    self._process_binding(binding, orb, filter, scheduler)
+            except CORBA.TRANSIENT as e:
+                if e.args[0] != TRANSIENT_CallTimedout:
+                    raise
+                # Keep what has been found so far, and list the context again
+                # when it is next used.
+                self._timed_out = True
+                self._defer_context(None, orb, filter)
+
+    def _list_bindings(self, context):
+        # Get the bindings in a naming context, a page at a time.
+        with BindingPager(context, Options().get_option('max_bindings'),
+                deadline=self._deadline) as bindings:
             for binding in bindings:
-                # Process the bindings that are within max_bindings
-                self._process_binding(binding, orb, filter)
-            if bindings_it:
-                # Handle the iterator containing the remaining bindings
-                remaining, bindings = bindings_it.next_n(Options().\
-                                            get_option('max_bindings'))
-                while remaining:
-                    for binding in bindings:
-                        self._process_binding(binding, orb, filter)
-                    remaining, binding = bindings_it.next_n(Options().\
-                                                get_option('max_bindings'))
-                bindings_it.destroy()
-
-    def _process_binding(self, binding, orb, filter):
-        if utils.filtered([corba_name_to_string(binding.binding_name)], filter):
+                yield binding
+
+    def _out_of_time(self):
+        # Check if the time allowed for parsing has run out. This is checked
+        # before making remote calls, so the calls that follow are limited to
+        # the time left.
+        if self._deadline is None:
+            return False
+        if self._deadline.expired:
+            return True
+        renew_calls()
+        return False
+
+    def _parse_subdir(self, subdir, binding, orb, filter, scheduler=None):
+        # Resolve the naming context of a subdirectory and parse it.
+        if self._out_of_time():
+            subdir._defer_context(binding.binding_name, orb, filter)
+            return
+        try:
+            subdir_context = self._narrow_context(
+                    self._context.resolve(binding.binding_name))
+        except CORBA.TRANSIENT as e:
+            if e.args[0] != TRANSIENT_CallTimedout:
+                raise
+            with subdir._mutex:
+                subdir._timed_out = True
+            subdir._defer_context(binding.binding_name, orb, filter)
+            return
+        subdir._parse_context(subdir_context, orb, filter=filter,
+                scheduler=scheduler)
+
+    def _finish_leaf(self, placeholder, binding, obj, filter=[]):
+        # Create the node for an object already resolved from a binding, and
+        # put it in place of the placeholder holding its position.
+        if self._out_of_time():
+            return
+        try:
+            leaf = self._make_leaf(binding, obj, filter)
+        except CORBA.TRANSIENT as e:
+            if e.args[0] != TRANSIENT_CallTimedout:
+                raise
+            leaf = Placeholder(placeholder.name, self, binding, timed_out=True)
+        with self._mutex:
+            if self._children.get(placeholder.name) is not placeholder:
+                return
+            if leaf:
+                self._add_child(leaf)
+            else:
+                self.remove_child(placeholder)
+        if leaf:
+            self._emit(leaf)
+
+    def _make_leaf(self, binding, obj=None, filter=[]):
+        # Resolve an object binding and create the correct node type for it.
+        # The specific type can be determined from the binding name kind.
+        # Returns None if no node should be added for the binding. If the
+        # binding's object has already been resolved, pass it as obj. The
+        # filter restricts the children of a manager.
+        name = corba_name_to_string(binding.binding_name)
+        if obj is None:
+            obj = self._context.resolve(binding.binding_name)
+        if binding.binding_name[0].kind == 'mgr':
+            if not obj:
+                return None
+            if self._is_unreachable(obj):
+                return Zombie(name, self)
+            if self._trust_kinds:
+                mgr = obj._unchecked_narrow(RTM.Manager)
+            else:
+                mgr = obj._narrow(RTM.Manager)
+            try:
+                return Manager(name, self, mgr, filter=filter,
+                        dynamic=self.dynamic)
+            except CORBA.OBJECT_NOT_EXIST:
+                # Manager zombie
+                return Zombie(name, self)
+            except CORBA.TRANSIENT as e:
+                # Manager zombie
+                if e.args[0] == TRANSIENT_ConnectFailed:
+                    self._mark_unreachable(obj)
+                return Zombie(name, self)
+            except (CORBA.BAD_OPERATION, CORBA.NO_IMPLEMENT):
+                if not self._trust_kinds:
+                    raise
+                return self._verify_leaf(name, obj, RTM.Manager, Manager,
+                        filter)
+        elif binding.binding_name[0].kind == 'rtc':
+            if self._is_unreachable(obj):
+                return Zombie(name, self)
+            if self._defer_profiles:
+                # The component is not contacted until its node is used, so
+                # the kind of the binding is trusted rather than checked with
+                # a narrow.
+                return Component(name, self,
+                        obj._unchecked_narrow(RTC.RTObject),
+                        dynamic=self.dynamic, defer_profile=True)
+            if self._trust_kinds:
+                # The first call on the component, getting its profile, also
+                # checks that it exists.
+                try:
+                    return Component(name, self,
+                            obj._unchecked_narrow(RTC.RTObject),
+                            dynamic=self.dynamic)
+                except CORBA.OBJECT_NOT_EXIST:
+                    return Zombie(name, self)
+                except CORBA.TRANSIENT as e:
+                    if e.args[0] == TRANSIENT_ConnectFailed:
+                        self._mark_unreachable(obj)
+                        return Zombie(name, self)
+                    else:
+                        raise
+                except (CORBA.BAD_OPERATION, CORBA.NO_IMPLEMENT):
+                    return self._verify_leaf(name, obj, RTC.RTObject,
+                            Component)
+            try:
+                obj = obj._narrow(RTC.RTObject)
+            except CORBA.TRANSIENT as e:
+                if e.args[0] == TRANSIENT_ConnectFailed:
+                    self._mark_unreachable(obj)
+                    return Zombie(name, self)
+                else:
+                    raise
+            except CORBA.OBJECT_NOT_EXIST:
+                return Zombie(name, self)
+            try:
+                return Component(name, self, obj, dynamic=self.dynamic)
+            except CORBA.OBJECT_NOT_EXIST:
+                # Component zombie
+                return Zombie(name, self, dynamic=self.dynamic)
+            except CORBA.TRANSIENT as e:
+                if e.args[0] == TRANSIENT_ConnectFailed:
+                    self._mark_unreachable(obj)
+                    return Zombie(name, self)
+                else:
+                    raise
+        else:
+            # Unknown type - add a plain node
+            return Unknown(name, self, obj)
+
+    def _emit(self, node):
+        # Tell the listener, if any, about a node added to the tree.
+        if self._listener:
+            self._listener(node)
+
+    def _endpoint(self, obj):
+        # Get the endpoint of an object. The ORB given to this directory when
+        # it was parsed is used rather than the orb property, which would
+        # lock the parent directories while they may be waiting for this one.
+        return utils.ior_endpoint(self._orb.object_to_string(obj))
+
+    def _is_unreachable(self, obj):
+        # Check if an object is at an endpoint already found to be
+        # unreachable.
+        if self._dead_endpoints is None:
+            return False
+        return self._endpoint(obj) in self._dead_endpoints
+
+    def _mark_unreachable(self, obj):
+        # Remember that the endpoint of an object could not be connected to.
+        if self._dead_endpoints is not None:
+            self._dead_endpoints.add(self._endpoint(obj))
+
+    def _narrow_context(self, obj):
+        # Narrow a resolved sub-context. The naming service only binds naming
+        # contexts as contexts, so when kinds are trusted the check is
+        # skipped.
+        if self._trust_kinds:
+            return obj._unchecked_narrow(CosNaming.NamingContext)
+        return obj._narrow(CosNaming.NamingContext)
+
+    def _verify_leaf(self, name, obj, obj_type, node_type, filter=[]):
+        # The first call on an object trusted to be of obj_type failed. Check
+        # the object's type properly, and create a node of node_type for it if
+        # it is of that type, or an Unknown node if not.
+        try:
+            narrowed = obj._narrow(obj_type)
+        except CORBA.OBJECT_NOT_EXIST:
+            return Zombie(name, self)
+        except CORBA.TRANSIENT as e:
+            if e.args[0] == TRANSIENT_ConnectFailed:
+                self._mark_unreachable(obj)
+                return Zombie(name, self)
+            else:
+                raise
+        if CORBA.is_nil(narrowed):
+            return Unknown(name, self, obj)
+        return node_type(name, self, narrowed, filter=filter,
+                dynamic=self.dynamic)
+
+    def _make_subdir(self, name, filter=[]):
+        # Create a subdirectory node with the same parsing settings as this
+        # directory.
+        return Directory(name, self, filter=filter, dynamic=self.dynamic,
+                concurrency=self._concurrency, lazy=self._lazy,
+                defer_profiles=self._defer_profiles,
+                names_only=self._names_only, trust_kinds=self._trust_kinds,
+                deadline=self._deadline, dead_endpoints=self._dead_endpoints,
+                endpoint_concurrency=self._endpoint_concurrency,
+                listener=self._listener)
+
+    def _process_binding(self, binding, orb, filter, scheduler=None):
+        name = corba_name_to_string(binding.binding_name)
+        child_filter = filter.child(name)
+        if child_filter is None:
             # Do not pass anything which does not pass the filter
             return
-        trimmed_filter = utils.trim_filter(copy.deepcopy(filter))
+        if binding.binding_type == CosNaming.nobject and \
+                binding.binding_name[0].kind != 'mgr' and \
+                not child_filter.passes_all:
+            # Only directories and managers can hold the rest of a path, so
+            # other objects must match the filter to be resolved
+            return
         with self._mutex:
             # Process a binding, creating the correct child type for it and
             # adding that child to this node's children.
             if binding.binding_type == CosNaming.nobject:
-                # This is a leaf node; either a component or a manager.  The
-                # specific type can be determined from the binding name kind.
-                if binding.binding_name[0].kind == 'mgr':
-                    name = corba_name_to_string(binding.binding_name)
+                # This is a leaf node; either a component or a manager.
+                if self._names_only or self._out_of_time():
+                    # Record only the name and kind; the object is resolved
+                    # if the placeholder is upgraded.
+                    leaf = Placeholder(name, self, binding)
+                elif scheduler:
+                    # Contact the object from the worker pool, grouped with
+                    # the other objects at its endpoint. A placeholder keeps
+                    # its place in the order of the bindings until then.
                     obj = self._context.resolve(binding.binding_name)
-                    if not obj:
-                        leaf = Zombie(name, self)
-                        return
-                    obj = obj._narrow(RTM.Manager)
-                    try:
-                        leaf = Manager(name, self, obj, dynamic=self.dynamic)
-                    except CORBA.OBJECT_NOT_EXIST:
-                        # Manager zombie
-                        leaf = Zombie(name, self)
-                    except CORBA.TRANSIENT:
-                        # Manager zombie
-                        leaf = Zombie(name, self)
+                    leaf = Placeholder(name, self, binding)
                     self._add_child(leaf)
-                elif binding.binding_name[0].kind == 'rtc':
-                    name = corba_name_to_string(binding.binding_name)
-                    obj = self._context.resolve(binding.binding_name)
-                    try:
-                        obj = obj._narrow(RTC.RTObject)
-                    except CORBA.TRANSIENT as e:
-                        if e.args[0] == TRANSIENT_ConnectFailed:
-                            self._add_child(Zombie(name, self))
-                            return
-                        else:
-                            raise
-                    except CORBA.OBJECT_NOT_EXIST:
-                        self._add_child(Zombie(name, self))
-                        return
+                    scheduler.submit_to(self._endpoint(obj),
+                            self._finish_leaf, leaf, binding, obj,
+                            child_filter)
+                    return
+                else:
                     try:
-                        leaf = Component(name, self, obj, dynamic=self.dynamic)
-                    except CORBA.OBJECT_NOT_EXIST:
-                        # Component zombie
-                        leaf = Zombie(name, self, dynamic=self.dynamic)
+                        leaf = self._make_leaf(binding, filter=child_filter)
                     except CORBA.TRANSIENT as e:
-                        if e.args[0] == TRANSIENT_ConnectFailed:
-                            self._add_child(Zombie(name, self))
-                            return
-                        else:
+                        if e.args[0] != TRANSIENT_CallTimedout:
                             raise
+                        leaf = Placeholder(name, self, binding,
+                                timed_out=True)
+                if leaf:
                     self._add_child(leaf)
-                else:
-                    # Unknown type - add a plain node
-                    name = corba_name_to_string(binding.binding_name)
-                    obj = self._context.resolve(binding.binding_name)
-                    leaf = Unknown(name, self, obj)
-                    self._add_child(leaf)
+                    self._emit(leaf)
             else:
                 # This is a context, and therefore a subdirectory.
-                subdir_name = corba_name_to_string(binding.binding_name)
-                subdir = Directory(subdir_name, self, filter=trimmed_filter,
-                        dynamic=self.dynamic)
-                subdir_context = self._context.resolve(binding.binding_name)
-                subdir_context = subdir_context._narrow(CosNaming.NamingContext)
-                subdir._parse_context(subdir_context, orb,
-                        filter=trimmed_filter)
-                self._add_child(subdir)
+                subdir = self._make_subdir(name, child_filter)
+                if self._lazy:
+                    # Leave resolving the context to the first use of the
+                    # subdirectory.
+                    subdir._defer_context(binding.binding_name, orb,
+                            child_filter)
+                    self._add_child(subdir)
+                    self._emit(subdir)
+                elif scheduler:
+                    # Add the subdirectory now so the children keep the order
+                    # of the bindings; its contents are filled in by a worker.
+                    self._add_child(subdir)
+                    self._emit(subdir)
+                    scheduler.submit_to(self._endpoint(self._context),
+                            self._parse_subdir, subdir, binding, orb,
+                            child_filter, scheduler)
+                else:
+                    self._add_child(subdir)
+                    self._emit(subdir)
+                    self._parse_subdir(subdir, binding, orb, child_filter)
+
+    def _rebind_child(self, child):
+        # Resolve the binding of an object child again, in case its object has
+        # gone because it was restarted under the same name, and replace the
+        # child with a node for the new object. Returns the new node, or None
+        # if the name is no longer bound, is bound to the same object, or
+        # cannot be resolved.
+        with self._mutex:
+            if self._children.get(child.name) is not child:
+                return None
+            context = self.context
+            if context is None:
+                return None
+            binding = CosNaming.Binding([_name_component(child.name)],
+                    CosNaming.nobject)
+            try:
+                obj = context.resolve(binding.binding_name)
+            except (CosNaming.NamingContext.NotFound, CORBA.OBJECT_NOT_EXIST,
+                    CORBA.TRANSIENT):
+                return None
+            if not obj or (child.object is not None and
+                    obj._is_equivalent(child.object)):
+                return None
+            leaf = self._make_leaf(binding, obj)
+            if leaf:
+                self._add_child(leaf)
+            return leaf
+
+    def _same_binding(self, child, binding, verify_objects=True):
+        # Check if an existing child still matches a binding of the same name.
+        if binding.binding_type != CosNaming.nobject:
+            return child.is_directory and not child.is_manager
+        if child.is_zombie or (child.is_directory and not child.is_manager):
+            return False
+        if verify_objects and not child.is_placeholder:
+            obj = self.context.resolve(binding.binding_name)
+            if not child.object or not obj._is_equivalent(child.object):
+                return False
+        return True
+
+    def _upgrade_child(self, child):
+        # Replace a placeholder child with a node of the correct type for its
+        # binding. Returns the new node, or None if the binding no longer
+        # refers to an object.
+        with self._mutex:
+            if self._children.get(child.name) is not child:
+                raise exceptions.NotRelatedError(self.name, child.name)
+            leaf = self._make_leaf(child.binding)
+            if leaf:
+                self._add_child(leaf)
+            else:
+                self.remove_child(child)
+            return leaf
 
 
 def corba_name_to_string(name):
@@ -208,4 +760,14 @@ def corba_name_to_string(name):
     return '/'.join(parts)
 
 
+def _name_component(name):
+    # Convert a name in the format used in paths, such as 'manager.mgr', to a
+    # CosNaming.NameComponent.
+    id, sep, kind = name.rpartition('.')
+    if not id:
+        id = kind
+        kind = ''
+    return CosNaming.NameComponent(id=str(id), kind=str(kind))
+
+
 # vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
@@ -0,0 +1,148 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Object used to remember the endpoints that could not be reached while
+parsing.
+
+'''
+
+
+import json
+import os
+import threading
+import time
+
+
+##############################################################################
+## Endpoint cache object
+
+class EndpointCache(object):
+    '''A record of endpoints (host:port addresses) known to be unreachable.
+
+    When a manager process dies, every object it registered on the name
+    server is still bound, and connecting to each of them fails separately.
+    Once one connection to an endpoint has failed, the directories being
+    parsed use this cache to turn the other objects at that endpoint into
+    zombies without trying to connect again.
+
+    By default the tree uses a new cache for each parse. To carry the
+    knowledge over to later parses, create a cache with a time to live and
+    give it to each tree. If a file name is given, the cache is loaded from
+    that file when it is created and written back by @ref save.
+
+    '''
+    def __init__(self, ttl=None, filename=None):
+        '''Constructor.
+
+        @param ttl The number of seconds an endpoint is remembered as
+                   unreachable for. If None, it is remembered until the cache
+                   is closed or cleared.
+        @param filename The name of a file to persist the cache in.
+
+        '''
+        super(EndpointCache, self).__init__()
+        self._mutex = threading.RLock()
+        self._ttl = ttl
+        self._filename = filename
+        self._endpoints = {}
+        self._closed = False
+        if filename and os.path.exists(filename):
+            self.load()
+
+    def __contains__(self, endpoint):
+        '''Is an endpoint known to be unreachable?'''
+        with self._mutex:
+            if self._closed or endpoint not in self._endpoints:
+                return False
+            expiry = self._endpoints[endpoint]
+            if expiry is not None and expiry <= time.time():
+                del self._endpoints[endpoint]
+                return False
+            return True
+
+    def __len__(self):
+        with self._mutex:
+            return len(self._endpoints)
+
+    def add(self, endpoint):
+        '''Record an endpoint as unreachable.'''
+        if not endpoint:
+            return
+        with self._mutex:
+            if self._closed:
+                return
+            if self._ttl is None:
+                self._endpoints[endpoint] = None
+            else:
+                self._endpoints[endpoint] = time.time() + self._ttl
+
+    def clear(self):
+        '''Forget all unreachable endpoints.'''
+        with self._mutex:
+            self._endpoints = {}
+
+    def close(self):
+        '''Forget all unreachable endpoints and stop recording them.
+
+        The tree closes the cache it creates for a parse once the parse is
+        over, so that objects restarted at the same endpoint are found again
+        by later reparses.
+
+        '''
+        with self._mutex:
+            self._endpoints = {}
+            self._closed = True
+
+    def load(self):
+        '''Load the unexpired endpoints from the cache file.'''
+        with self._mutex:
+            try:
+                with open(self._filename, 'r') as f:
+                    saved = json.load(f)
+            except (IOError, ValueError):
+                # A missing or damaged cache is the same as an empty one
+                return
+            now = time.time()
+            for endpoint, expiry in saved.items():
+                if expiry is None or expiry > now:
+                    self._endpoints[endpoint] = expiry
+
+    def save(self):
+        '''Write the unreachable endpoints to the cache file, if there is one.
+        '''
+        with self._mutex:
+            if not self._filename:
+                return
+            tmp_name = self._filename + '.tmp'
+            with open(tmp_name, 'w') as f:
+                json.dump(self._endpoints, f)
+            if os.name == 'nt' and os.path.exists(self._filename):
+                os.remove(self._filename)
+            os.rename(tmp_name, self._filename)
+
+    @property
+    def filename(self):
+        '''The name of the file the cache is persisted in, if any.'''
+        with self._mutex:
+            return self._filename
+
+    @property
+    def ttl(self):
+        '''The number of seconds an endpoint is remembered as unreachable.'''
+        with self._mutex:
+            return self._ttl
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
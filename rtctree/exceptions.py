@@ -293,5 +293,31 @@ class InvalidSdoServiceError(RtcTreeError):
         return 'Invalid SDO service: {0}'.format(self.args[0])
 
 
+class InvalidSnapshotError(RtcTreeError):
+    '''A snapshot file could not be read.'''
+    def __str__(self):
+        return 'Invalid snapshot file {0}: {1}'.format(self.args[0],
+                self.args[1])
+
+
+class NoSuchPortError(RtcTreeError):
+    '''A component does not have the requested port.'''
+    def __str__(self):
+        return 'No such port: {0}'.format(self.args[0])
+
+
+class BadFilterError(RtcTreeError):
+    '''An iteration filter could not be compiled.'''
+    def __str__(self):
+        return 'Bad filter: {0}'.format(self.args[0])
+
+
+class ProcessesNotSupportedError(RtcTreeError):
+    '''Name servers cannot be parsed in worker processes on this platform.'''
+    def __str__(self):
+        return 'Cannot parse with {0} processes: worker processes can only '\
+            'be forked'.format(self.args[0])
+
+
 
 # vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
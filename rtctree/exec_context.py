@@ -18,8 +18,7 @@ Object representing an execution context.
 '''
 
 
-import threading
-
+from rtctree import locks
 from rtctree import utils
 from rtctree.rtc import RTC
 
@@ -29,6 +28,9 @@ from rtctree.rtc import RTC
 
 class ExecutionContext(object):
     '''An execution context, within which components may be executing.'''
+    __slots__ = ('_handle', '_is_service', '_mutex', '_obj', '_owner',
+            '_participants', '_properties')
+
     def __init__(self, ec_obj=None, handle=None, *args, **kwargs):
         '''Constructor.
 
@@ -45,7 +47,7 @@ class ExecutionContext(object):
             self._is_service = False
             self._obj = ec_obj
         self._handle = handle
-        self._mutex = threading.RLock()
+        self._mutex = locks.lock_for(self)
         self._parse()
 
     def activate_component(self, comp_ref):
@@ -54,8 +56,7 @@ class ExecutionContext(object):
         @param comp_ref The CORBA LightweightRTObject to activate.
 
         '''
-        with self._mutex:
-            self._obj.activate_component(comp_ref)
+        self._obj.activate_component(comp_ref)
 
     def deactivate_component(self, comp_ref):
         '''Deactivate a component within this context.
@@ -63,8 +64,7 @@ class ExecutionContext(object):
         @param comp_ref The CORBA LightweightRTObject to deactivate.
 
         '''
-        with self._mutex:
-            self._obj.deactivate_component(comp_ref)
+        self._obj.deactivate_component(comp_ref)
 
     def reset_component(self, comp_ref):
         '''Reset a component within this context.
@@ -72,8 +72,7 @@ class ExecutionContext(object):
         @param comp_ref The CORBA LightweightRTObject to reset.
 
         '''
-        with self._mutex:
-            self._obj.reset_component(comp_ref)
+        self._obj.reset_component(comp_ref)
 
     def get_component_state(self, comp):
         '''Get the state of a component within this context.
@@ -82,8 +81,7 @@ class ExecutionContext(object):
         @return The component state, as a LifeCycleState value.
 
         '''
-        with self._mutex:
-            return self._obj.get_component_state(comp)
+        return self._obj.get_component_state(comp)
 
     def kind_as_string(self, add_colour=True):
         '''Get the type of this context as an optionally coloured string.
@@ -92,13 +90,13 @@ class ExecutionContext(object):
         @return A string describing the kind of execution context this is.
 
         '''
-        with self._mutex:
-            if self.kind == self.PERIODIC:
-                result = 'Periodic', ['reset']
-            elif self.kind == self.EVENT_DRIVEN:
-                result = 'Event-driven', ['reset']
-            elif self.kind == self.OTHER:
-                result = 'Other', ['reset']
+        kind = self.kind
+        if kind == self.PERIODIC:
+            result = 'Periodic', ['reset']
+        elif kind == self.EVENT_DRIVEN:
+            result = 'Event-driven', ['reset']
+        elif kind == self.OTHER:
+            result = 'Other', ['reset']
         if add_colour:
             return utils.build_attr_string(result[1], supported=add_colour) + \
                     result[0] + utils.build_attr_string('reset', supported=add_colour)
@@ -121,11 +119,10 @@ class ExecutionContext(object):
         @return A string describing this context's running state.
 
         '''
-        with self._mutex:
-            if self.running:
-                result = 'Running', ['bold', 'green']
-            else:
-                result = 'Stopped', ['reset']
+        if self.running:
+            result = 'Running', ['bold', 'green']
+        else:
+            result = 'Stopped', ['reset']
         if add_colour:
             return utils.build_attr_string(result[1], supported=add_colour) + \
                     result[0] + utils.build_attr_string('reset', supported=add_colour)
@@ -134,13 +131,11 @@ class ExecutionContext(object):
 
     def start(self):
         '''Start the context.'''
-        with self._mutex:
-            self._obj.start()
+        self._obj.start()
 
     def stop(self):
         '''Stop the context.'''
-        with self._mutex:
-            self._obj.stop()
+        self._obj.stop()
 
     @property
     def handle(self):
@@ -151,14 +146,13 @@ class ExecutionContext(object):
     @property
     def kind(self):
         '''The kind of this execution context.'''
-        with self._mutex:
-            kind = self._obj.get_kind()
-            if kind == RTC.PERIODIC:
-                return self.PERIODIC
-            elif kind == RTC.EVENT_DRIVEN:
-                return self.EVENT_DRIVEN
-            else:
-                return self.OTHER
+        kind = self._obj.get_kind()
+        if kind == RTC.PERIODIC:
+            return self.PERIODIC
+        elif kind == RTC.EVENT_DRIVEN:
+            return self.EVENT_DRIVEN
+        else:
+            return self.OTHER
 
     @property
     def kind_string(self):
@@ -174,11 +168,11 @@ class ExecutionContext(object):
     @property
     def owner_name(self):
         '''The name of the RTObject that owns this context.'''
-        with self._mutex:
-            if self._owner:
-                return self._owner.get_component_profile().instance_name
-            else:
-                return ''
+        owner = self.owner
+        if owner:
+            return owner.get_component_profile().instance_name
+        else:
+            return ''
 
     @property
     def participants(self):
@@ -189,9 +183,8 @@ class ExecutionContext(object):
     @property
     def participant_names(self):
         '''The names of the RTObjects participating in this context.'''
-        with self._mutex:
-            return [obj.get_component_profile().instance_name \
-                    for obj in self._participants]
+        return [obj.get_component_profile().instance_name \
+                for obj in self.participants]
 
     @property
     def properties(self):
@@ -202,19 +195,16 @@ class ExecutionContext(object):
     @property
     def rate(self):
         '''The execution rate of this execution context.'''
-        with self._mutex:
-            return self._obj.get_rate()
+        return self._obj.get_rate()
 
     @rate.setter
     def rate(self, new_rate):
-        with self._mutex:
-            self._obj.set_rate(new_rate)
+        self._obj.set_rate(new_rate)
 
     @property
     def running(self):
         '''Is this execution context running?'''
-        with self._mutex:
-            return self._obj.is_running()
+        return self._obj.is_running()
 
     @property
     def running_string(self):
@@ -222,17 +212,21 @@ class ExecutionContext(object):
         return self.running_as_string()
 
     def _parse(self):
-        # Parse the ExecutionContext object.
+        # Parse the ExecutionContext object. The profile is got before taking
+        # this context's lock, which may be shared with other objects.
+        if self._is_service:
+            profile = self._obj.get_profile()
+            owner = profile.owner
+            participants = profile.participants
+            properties = utils.nvlist_to_dict(profile.properties)
+        else:
+            owner = None
+            participants = []
+            properties = []
         with self._mutex:
-            if self._is_service:
-                profile = self._obj.get_profile()
-                self._owner = profile.owner
-                self._participants = profile.participants
-                self._properties = utils.nvlist_to_dict(profile.properties)
-            else:
-                self._owner = None
-                self._participants = []
-                self._properties = []
+            self._owner = owner
+            self._participants = participants
+            self._properties = properties
 
     ## Constant for a periodic execution context.
     PERIODIC = 1
@@ -0,0 +1,139 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Executor used to make blocking remote calls on behalf of asynchronous code.
+
+'''
+
+
+try:
+    from concurrent.futures import Future
+except ImportError:
+    # Python 2 without the futures package. The module can still be imported,
+    # as when collecting doctests, but executors cannot be created.
+    Future = None
+from multiprocessing.pool import ThreadPool
+import threading
+
+from rtctree.scheduler import EndpointQueue
+
+
+##############################################################################
+## Endpoint executor object
+
+class EndpointExecutor(object):
+    '''Runs blocking calls on a bounded pool of worker threads, limiting the
+    calls made at the same time to each endpoint.
+
+    Each call is given the endpoint (host:port) of the process it talks to.
+    Calls are queued, however many are submitted, and started taking the
+    endpoints in turn, so a slow or busy process does not hold up calls to
+    the others, and no more than a set number of calls are made to any one
+    endpoint at the same time. Unlike the ParseScheduler, calls are
+    independent: each has its own future, and a failed call does not stop
+    the others.
+
+    On Python 2, the futures package is needed.
+
+    '''
+    def __init__(self, workers=16, per_endpoint=4):
+        '''Constructor.
+
+        @param workers The maximum number of calls to make at the same time.
+        @param per_endpoint The maximum number of calls to make at the same
+                            time to a single endpoint. If None, only
+                            @ref workers limits them.
+        @raises ImportError if concurrent.futures is not available.
+
+        '''
+        super(EndpointExecutor, self).__init__()
+        if Future is None:
+            raise ImportError('EndpointExecutor needs concurrent.futures')
+        self._pool = ThreadPool(workers)
+        self._cond = threading.Condition()
+        self._queue = EndpointQueue(workers, per_endpoint)
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+    def shutdown(self, wait=True):
+        '''Stop accepting calls, and stop the worker threads once the calls
+        already submitted have finished.
+
+        @param wait If True, wait for the calls to finish.
+
+        '''
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            while wait and self._queue.busy:
+                self._cond.wait()
+        self._pool.close()
+        if wait:
+            self._pool.join()
+
+    def submit(self, endpoint, func, *args, **kwargs):
+        '''Call func(*args, **kwargs) on a worker thread.
+
+        @param endpoint The endpoint the call goes to, or None if it is not
+                        known. Calls with no endpoint are only limited by the
+                        number of workers.
+        @return A concurrent.futures.Future for the result of the call.
+        @raises RuntimeError if the executor has been shut down.
+
+        '''
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('cannot submit calls after shutdown')
+            self._queue.put(endpoint, (future, func, args, kwargs))
+            self._dispatch()
+        return future
+
+    def _dispatch(self):
+        # Start queued calls while there are free workers. Must be called with
+        # _cond held.
+        while True:
+            call = self._queue.take()
+            if call is None:
+                return
+            endpoint, call = call
+            self._pool.apply_async(self._run, (endpoint,) + call)
+
+    def _run(self, endpoint, future, func, args, kwargs):
+        # Make a call and give its result to its future, unless the call was
+        # cancelled while it was queued.
+        try:
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = func(*args, **kwargs)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+        finally:
+            with self._cond:
+                self._queue.done(endpoint)
+                self._dispatch()
+                if not self._queue.busy:
+                    self._cond.notify_all()
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
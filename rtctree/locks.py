@@ -0,0 +1,66 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Pool of locks shared by the short-lived objects of a tree.
+
+Ports, connections, service interfaces and execution contexts are made
+afresh every time a component's ports or a port's connections are listed
+again. Rather than each creating its own lock, they take one from a fixed
+pool of reentrant locks, chosen by the object's identity. The memory used
+by locks stays constant however many of these objects exist, and making
+one costs no lock allocation.
+
+Objects that share a lock cannot be used at the same time by different
+threads. The pool is large enough that this is rare. Code holding one of
+these locks must not wait for another thread that may need a lock from
+the pool.
+
+'''
+
+
+import threading
+
+
+# The number of locks in the pool
+STRIPES = 1024
+
+
+##############################################################################
+## API functions
+
+def lock_for(obj):
+    '''Get the lock an object uses from the pool.
+
+    The same object always gets the same lock.
+
+    >>> lock_for(STRIPES) is lock_for(STRIPES)
+    True
+
+    @param obj The object to get a lock for.
+    @return A reentrant lock.
+
+    '''
+    # Objects are aligned in memory, so the low bits of their identities
+    # carry no information
+    return _locks[(id(obj) >> 4) % STRIPES]
+
+
+##############################################################################
+## Internal data
+
+_locks = tuple([threading.RLock() for ii in range(STRIPES)])
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
@@ -29,6 +29,7 @@ from rtctree import exceptions
 from rtctree import utils
 from rtctree.component import Component
 from rtctree.node import TreeNode
+from rtctree.pathfilter import compile_filter
 from rtctree.rtc import RTC
 
 
@@ -161,12 +162,29 @@ class Manager(TreeNode):
     >>> p.wait()
     -15
     '''
-    def __init__(self, name=None, parent=None, obj=None, *args, **kwargs):
-        '''Constructor. Calls the TreeNode constructor.'''
-        super(Manager, self).__init__(name=name, parent=parent, *args,
-                                      **kwargs)
+    __slots__ = ('_components', '_configuration', '_factory_profiles',
+            '_filter', '_loadable_modules', '_loaded_modules', '_masters',
+            '_obj', '_profile', '_slaves')
+
+    def __init__(self, name=None, parent=None, obj=None, parse=True,
+            filter=[], *args, **kwargs):
+        '''Constructor. Calls the TreeNode constructor.
+
+        @param parse If False, the manager is not contacted and the node is
+                     created with no children. Used when restoring a tree
+                     from a snapshot.
+        @param filter A list of paths, or a PathFilter, restricting the child
+                      components and managers that are added.
+
+        '''
+        super(Manager, self).__init__(name=name, parent=parent,
+                                      filter=filter, *args, **kwargs)
         self._obj = obj
-        self._parse()
+        self._filter = compile_filter(filter)
+        if parse:
+            self._parse()
+        else:
+            self._reset_data()
 
     ##########################################################################
     # Module and component management
@@ -421,14 +439,8 @@ class Manager(TreeNode):
     def _parse(self):
         # Nearly everything is delay-parsed when it is first accessed.
         with self._mutex:
-            self._components = None
-            self._configuration = None
-            self._profile = None
-            self._factory_profiles = None
-            self._loadable_modules = None
-            self._loaded_modules = None
-            self._masters = None
-            self._slaves = None
+            self._reset_data()
+            self._remove_all_children()
             self._parse_children()
 
     def _parse_children(self):
@@ -449,9 +461,11 @@ class Manager(TreeNode):
             for c in comps:
                 # Get the instance profile - this will be the node's name
                 profile = c.get_component_profile()
-                instance_name = profile.instance_name
+                name = profile.instance_name + '.rtc'
+                if not self._filter.matches(name):
+                    continue
                 # Create and store the new leaf node
-                leaf = Component(instance_name + '.rtc', self, c)
+                leaf = Component(name, self, c)
                 self._add_child(leaf)
 
     def _parse_manager_children(self):
@@ -480,9 +494,24 @@ class Manager(TreeNode):
                 else:
                     name = 'slave{0}'.format(index)
                     index += 1
-                leaf = Manager(name, self, m)
+                child_filter = self._filter.child(name)
+                if child_filter is None:
+                    continue
+                leaf = Manager(name, self, m, filter=child_filter)
                 self._add_child(leaf)
 
+    def _reset_data(self):
+        # Clear the cached information so it is fetched again when next used.
+        with self._mutex:
+            self._components = None
+            self._configuration = None
+            self._profile = None
+            self._factory_profiles = None
+            self._loadable_modules = None
+            self._loaded_modules = None
+            self._masters = None
+            self._slaves = None
+
     def _remove_master(self, master):
         # Remove a new master from this manager. A slave manager can have multiple
         # masters. new_master should be a rtctree.manager.Manager object.
@@ -19,10 +19,11 @@ Object representing a name server node in the tree.
 
 
 import CosNaming
-from omniORB import CORBA, TRANSIENT_ConnectFailed
+from omniORB import CORBA, TRANSIENT_CallTimedout, TRANSIENT_ConnectFailed
 
 from rtctree import exceptions
 from rtctree.directory import Directory
+from rtctree.pathfilter import compile_filter
 
 
 ##############################################################################
@@ -39,19 +40,38 @@ class NameServer(Directory):
     root context.
 
     '''
+    __slots__ = ('_address', '_full_address', '_ns_obj')
+
     def __init__(self, orb=None, address=None, parent=None, filter=[],
-                 *args, **kwargs):
+                 parse=True, *args, **kwargs):
         '''Constructor.
 
         @param orb An orb object to use to connect to the name server.
         @param address The address of the name server. Used as the node name.
         @param parent The parent node of this node, if any.
-        @param filter A list of paths to filter by.
+        @param filter A list of paths, or a PathFilter, to filter by. A list
+                      is compiled into a PathFilter once, here.
+        @param parse If False, the name server is not contacted and the node
+                     is created with no children. Used when restoring a
+                     tree from a snapshot.
 
         '''
+        filter = compile_filter(filter)
         super(NameServer, self).__init__(name=address, parent=parent,
                 filter=filter, *args, **kwargs)
-        self._parse_server(address, orb, filter)
+        if parse:
+            self._parse_server(address, orb, filter)
+        else:
+            self._set_server(address, orb)
+
+    @property
+    def context(self):
+        '''The object representing the root naming context.'''
+        with self._mutex:
+            if not self._context:
+                # Not connected yet because the parse was cut short.
+                self._context = self._connect_to_naming_service(self._address)
+            return self._context
 
     @property
     def is_nameserver(self):
@@ -72,20 +92,40 @@ class NameServer(Directory):
 
     def _parse_server(self, address, orb, filter=[]):
         # Parse the name server.
+        with self._mutex:
+            self._set_server(address, orb)
+            self._emit(self)
+            if self._out_of_time():
+                # Connect and list the root context when first used.
+                self._defer_context(None, orb, filter)
+                return
+            try:
+                root_context = self._connect_to_naming_service(address)
+            except CORBA.TRANSIENT as e:
+                if e.args[0] != TRANSIENT_CallTimedout:
+                    raise
+                self._timed_out = True
+                self._defer_context(None, orb, filter)
+                return
+        # The mutex is not held while parsing, so that worker threads can add
+        # children to this node.
+        self._parse_context(root_context, orb, filter)
+
+    def _set_server(self, address, orb):
+        # Store the name server's address and get a reference to its naming
+        # service. This does not contact the name server.
         with self._mutex:
             self._address = address
             self._orb = orb
-            root_context = self._connect_to_naming_service(address)
-            self._parse_context(root_context, orb, filter)
-
-    def _connect_to_naming_service(self, address):
-        # Try to connect to a name server and get the root naming context.
-        with self._mutex:
             self._full_address = 'corbaloc::{0}/NameService'.format(address)
             try:
                 self._ns_obj = self._orb.string_to_object(self._full_address)
             except CORBA.ORB.InvalidName:
                 raise exceptions.InvalidServiceError(address)
+
+    def _connect_to_naming_service(self, address):
+        # Try to connect to a name server and get the root naming context.
+        with self._mutex:
             try:
                 root_context = self._ns_obj._narrow(CosNaming.NamingContext)
             except CORBA.TRANSIENT as e:
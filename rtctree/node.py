@@ -18,9 +18,11 @@ Object representing a generic node in the tree.
 '''
 
 
+import collections
 import threading
 
 from rtctree import exceptions
+from rtctree import nodefilter
 
 
 ##############################################################################
@@ -33,6 +35,13 @@ class TreeNode(object):
     class of this class.
 
     '''
+    # Trees can hold tens of thousands of nodes, so nodes keep their
+    # attributes in slots rather than a __dict__. Child classes must list
+    # their own attributes in __slots__ as well.
+    __slots__ = ('_cbs', '_children', '_dynamic', '_events', '_index',
+            '_index_mutex', '_mutex', '_name', '_parent', '_path_info',
+            '_pending', '_types')
+
     def __init__(self, name=None, parent=None, children=None, filter=[],
             dynamic=False, *args, **kwargs):
         '''Constructor.
@@ -57,22 +66,44 @@ class TreeNode(object):
         self._mutex = threading.RLock()
         self._name = name
         self._parent = parent
+        # The children are never changed in place. Writers hold the mutex
+        # and replace the whole dictionary, so readers can use it without
+        # locking.
         if children:
-            self._children = children
+            self._children = dict(children)
         else:
             self._children = {}
-        self._cbs = {}
+        # The events callbacks can be added for; the callback table is only
+        # made when the first callback is added
+        self._events = ()
+        self._cbs = None
         self._dynamic = dynamic
+        # The path, root and name server of this node, found when first
+        # needed; see _path_info
+        self._path_info = None
+        if parent is None:
+            # The root of a tree keeps an index of the nodes below it by path,
+            # the set of nodes of each type, and the set of directories not
+            # listed yet
+            self._index = {}
+            self._types = dict([(p, set())
+                for p in nodefilter.TYPE_PROPERTIES])
+            self._pending = set()
+            self._index_mutex = threading.Lock()
+        else:
+            self._index = None
+            self._types = None
+            self._pending = None
         if dynamic:
             self._enable_dynamic(dynamic)
 
     def __str__(self):
         '''Get this node as a string.'''
-        with self._mutex:
-            indent = ''.rjust(self.depth)
-            result = '{0}{1}, {2}\n'.format(indent, self._name, self._children)
-            for child in self._children:
-                result += str(self._children[child])
+        children = self._children
+        indent = ''.rjust(self.depth)
+        result = '{0}{1}, {2}\n'.format(indent, self._name, children)
+        for child in children:
+            result += str(children[child])
         return result
 
     def add_callback(self, event, cb, args=None):
@@ -90,10 +121,42 @@ class TreeNode(object):
         registered with the callback.
 
         '''
-        if event not in self._cbs:
+        if event not in self._events:
             raise exceptions.NoSuchEventError
+        if self._cbs is None:
+            self._cbs = {}
         self._cbs[event] = [(cb, args)]
 
+    def find_first(self, predicate, filter=[], prune=None,
+            breadth_first=False):
+        '''Find the first node, at or below this node, that satisfies a
+        predicate.
+
+        The nodes are visited as by @ref walk, and the walk stops at the
+        first match.
+
+        @param predicate A function called with each node that passes
+                         @ref filter. The first node it returns True for is
+                         the result.
+        @param filter, prune, breadth_first As for @ref walk.
+        @return The node found, or None.
+
+        Example:
+        >>> c1 = TreeNode(name='c1')
+        >>> c2 = TreeNode(name='c2')
+        >>> p = TreeNode(name='p', children={'c1':c1, 'c2':c2})
+        >>> c1._parent = p
+        >>> c2._parent = p
+        >>> p.find_first(lambda n: n._name.startswith('c')) in (c1, c2)
+        True
+        >>> p.find_first(lambda n: n._name == 'c3') is None
+        True
+        '''
+        for node in self.walk(filter, prune, breadth_first):
+            if predicate(node):
+                return node
+        return None
+
     def get_node(self, path):
         '''Get a child node of this node, or this node, based on a path.
 
@@ -114,16 +177,18 @@ class TreeNode(object):
         >>> p.get_node(['p', 'c2']) == c2
         True
         '''
-        with self._mutex:
-            if path[0] == self._name:
-                if len(path) == 1:
-                    return self
-                elif path[1] in self._children:
-                    return self._children[path[1]].get_node(path[1:])
-                else:
-                    return None
-            else:
-                return None
+        if self._index is not None:
+            node = self._index.get(tuple(path))
+            if node is not None:
+                return node
+        if path[0] != self._name:
+            return None
+        if len(path) == 1:
+            return self
+        child = self._children.get(path[1])
+        if child is None:
+            return None
+        return child.get_node(path[1:])
 
     def has_path(self, path):
         '''Check if a path exists below this node.
@@ -146,21 +211,20 @@ class TreeNode(object):
         >>> p.has_path(['p', 'c3'])
         False
         '''
-        with self._mutex:
-            if path[0] == self._name:
-                if len(path) == 1:
-                    return True
-                elif path[1] in self._children:
-                    return self._children[path[1]].has_path(path[1:])
-                else:
-                    return False
-            else:
-                return False
+        if self._index is not None and tuple(path) in self._index:
+            return True
+        if path[0] != self._name:
+            return False
+        if len(path) == 1:
+            return True
+        child = self._children.get(path[1])
+        if child is None:
+            return False
+        return child.has_path(path[1:])
 
     def is_child(self, other_node):
         '''Is @ref other_node a child of this node?'''
-        with self._mutex:
-            return other_node in self._children
+        return other_node in self._children
 
     def is_parent(self, other_node):
         '''Is @ref other_node the parent of this note?'''
@@ -169,7 +233,10 @@ class TreeNode(object):
     def iterate(self, func, args=None, filter=[]):
         '''Call a function on this node, and recursively all its children.
 
-        This is a depth-first iteration.
+        This is a depth-first iteration. When it starts at the root node and
+        a filter is one of the is_* type properties, only the nodes of that
+        type are visited, taken from the root's index, but still in
+        depth-first order.
 
         @param func The function to call. Its declaration must be
                     'def blag(node, args)', where 'node' is the current node
@@ -180,8 +247,11 @@ class TreeNode(object):
                       node in the iteration. If the filter is not True,
                       @ref func will not be called for that node. Each filter
                       entry should be a string, representing one of the is_*
-                      properties (is_component, etc), or a function object.
+                      properties (is_component, etc) or an expression over
+                      the node's attributes, or a function object. See
+                      NodeFilter.
         @return The results of the calls to @ref func in a list.
+        @raises BadFilterError if a string filter cannot be compiled.
 
         Example:
         >>> c1 = TreeNode(name='c1')
@@ -196,26 +266,11 @@ class TreeNode(object):
         >>> p.iterate(hello, args=['hello'], filter=['_name=="c1"'])
         ['hello c1']
         '''
-        with self._mutex:
-            result = []
-            if filter:
-                filters_passed = True
-                for f in filter:
-                    if type(f) == str:
-                        if not eval('self.' + f):
-                            filters_passed = False
-                            break
-                    else:
-                        if not f(self):
-                            filters_passed = False
-                            break
-                if filters_passed:
-                    result = [func(self, args)]
-            else:
-                result = [func(self, args)]
-            for child in self._children:
-                result += self._children[child].iterate(func, args, filter)
-        return result
+        filter = nodefilter.compile_filter(filter)
+        nodes = self._nodes_of_type(filter.type_property)
+        if nodes is not None:
+            return [func(n, args) for n in [self] + nodes if filter.passes(n)]
+        return [func(n, args) for n in self.walk(filter)]
 
     def rem_callback(self, event, cb):
         '''Remove a callback from this node.
@@ -225,24 +280,71 @@ class TreeNode(object):
         @param cb The callback function to remove.
 
         '''
-        if event not in self._cbs:
+        if event not in self._events:
             raise exceptions.NoSuchEventError(self.name, event)
-        c = [(x[0], x[1]) for x in self._cbs[event]]
+        cbs = self._cbs.get(event, []) if self._cbs else []
+        c = [(x[0], x[1]) for x in cbs]
         if not c:
             raise exceptions.NoCBError(self.name, event, cb)
-        self._cbs[event].remove(c[0])
+        cbs.remove(c[0])
+
+    def walk(self, filter=[], prune=None, breadth_first=False):
+        '''Visit this node and the nodes below it, one at a time.
+
+        This is a generator. The nodes are found using an explicit stack or
+        queue rather than recursion, so the depth of the tree is not limited,
+        and no node's lock is held while a node is being used. Stopping
+        early skips the rest of the tree. Lazy directories are expanded as
+        the walk reaches them.
+
+        @param filter A list of filters a node must pass to be given, as for
+                      @ref iterate. Nodes that do not pass are still walked
+                      through.
+        @param prune A function called with each node. If it returns True,
+                     the nodes below that node are not visited.
+        @param breadth_first If True, visit the nodes level by level.
+                             Otherwise, the walk is depth first, each node
+                             coming before its children.
+        @return An iterator over the nodes.
+        @raises BadFilterError if a string filter cannot be compiled.
+
+        Example:
+        >>> c1 = TreeNode(name='c1')
+        >>> c2 = TreeNode(name='c2')
+        >>> p = TreeNode(name='p', children={'c1':c1, 'c2':c2})
+        >>> c1._parent = p
+        >>> c2._parent = p
+        >>> [n._name for n in p.walk(prune=lambda n: n._name == 'p')]
+        ['p']
+        >>> len(list(p.walk(filter=['_name!="p"'], breadth_first=True)))
+        2
+        '''
+        filter = nodefilter.compile_filter(filter)
+        todo = collections.deque([self])
+        while todo:
+            if breadth_first:
+                node = todo.popleft()
+            else:
+                node = todo.pop()
+            if filter.passes(node):
+                yield node
+            if prune is not None and prune(node):
+                continue
+            children = node.children
+            if breadth_first:
+                todo.extend(children)
+            else:
+                todo.extend(reversed(children))
 
     @property
     def children(self):
         '''The child nodes of this node (if any).'''
-        with self._mutex:
-            return list(self._children.values())
+        return list(self._children.values())
 
     @property
     def children_names(self):
         '''A list of the names of the child nodes of this node (if any).'''
-        with self._mutex:
-            return list(self._children.keys())
+        return list(self._children.keys())
 
     @property
     def depth(self):
@@ -251,11 +353,7 @@ class TreeNode(object):
         The root node is depth 0.
 
         '''
-        with self._mutex:
-            if self._parent:
-                return len(self.full_path) - 1
-            else:
-                return 0
+        return len(self._get_path_info()[0]) - 1
 
     @property
     def dynamic(self):
@@ -276,23 +374,12 @@ class TreeNode(object):
     @property
     def full_path(self):
         '''The full path of this node.'''
-        with self._mutex:
-            if self._parent:
-                return self._parent.full_path + [self._name]
-            else:
-                return [self._name]
+        return list(self._get_path_info()[0])
 
     @property
     def full_path_str(self):
         '''The full path of this node as a string.'''
-        with self._mutex:
-            if self._parent:
-                if self._parent._name == '/':
-                    return self._parent.full_path_str + self._name
-                else:
-                    return self._parent.full_path_str + '/' + self._name
-            else:
-                return self._name
+        return self._get_path_info()[1]
 
     @property
     def is_component(self):
@@ -317,6 +404,16 @@ class TreeNode(object):
         '''Is this node a name server (specialisation of directory nodes)?'''
         return False
 
+    @property
+    def is_pending(self):
+        '''Is this node waiting to be filled in from the name server?'''
+        return False
+
+    @property
+    def is_placeholder(self):
+        '''Is this node a placeholder for an unresolved object?'''
+        return False
+
     @property
     def is_unknown(self):
         '''Is this node unknown?'''
@@ -336,14 +433,7 @@ class TreeNode(object):
     @property
     def nameserver(self):
         '''The name server of the node (i.e. its top-most parent below /).'''
-        with self._mutex:
-            if not self._parent:
-                # The root node does not have a name server
-                return None
-            elif self._parent.name == '/':
-                return self
-            else:
-                return self._parent.nameserver
+        return self._get_path_info()[2]
 
     @property
     def orb(self):
@@ -369,7 +459,12 @@ class TreeNode(object):
         with self._mutex:
             if child.name not in self._children:
                 raise exceptions.NotRelatedError(self.name, child.name)
-            del self._children[child.name]
+            children = dict(self._children)
+            old = children.pop(child.name)
+            self._children = children
+            root, path = self._indexed_root()
+            if root:
+                root._unindex(old, path + (old._name,))
 
     @parent.setter
     def parent(self, new_parent):
@@ -378,6 +473,7 @@ class TreeNode(object):
                 # Make sure to unlink the tree as well
                 self._parent.remove_child(self)
             self._parent = new_parent
+            self._clear_path_info()
 
     @property
     def parent_name(self):
@@ -391,21 +487,211 @@ class TreeNode(object):
     @property
     def root(self):
         '''The root node of the tree this node is in.'''
-        with self._mutex:
-            if self._parent:
-                return self._parent.root
-            else:
-                return self
+        return self._get_path_info()[3]
+
+    @property
+    def timed_out(self):
+        '''Did a remote call for this node time out while it was parsed?'''
+        return False
 
     def _add_child(self, new_child):
-        # Add a child to this node.
+        # Add a child to this node, replacing any child of the same name.
+        with self._mutex:
+            old = self._children.get(new_child._name)
+            children = dict(self._children)
+            children[new_child._name] = new_child
+            self._children = children
+            root, path = self._indexed_root()
+            if root:
+                path += (new_child._name,)
+                if old is not None and old is not new_child:
+                    root._unindex(old, path)
+                root._reindex(new_child, path)
+
+    def _remove_all_children(self):
+        # Remove all the children of this node.
+        with self._mutex:
+            old_children = list(self._children.values())
+            self._children = {}
+            root, path = self._indexed_root()
+            if root:
+                for old in old_children:
+                    root._unindex(old, path + (old._name,))
+
+    def _order_children(self, names):
+        # Put the children in the order of a list of names, such as the order
+        # of the bindings in a naming context. Children that are not named
+        # follow the others in their current order.
         with self._mutex:
-            self._children[new_child._name] = new_child
+            children = dict([(n, self._children[n]) for n in names
+                if n in self._children])
+            for name, child in self._children.items():
+                children.setdefault(name, child)
+            self._children = children
+
+    def _nodes_of_type(self, type_property):
+        # Get the nodes below this root node that have an is_* type property,
+        # in depth-first order, or None if they cannot be taken from the
+        # index: this node is not the root, or a lazy directory has not been
+        # listed yet.
+        if self._types is None or type_property is None:
+            return None
+        with self._index_mutex:
+            if self._pending:
+                return None
+            nodes = list(self._types[type_property])
+        return self._depth_first(nodes)
+
+    def _depth_first(self, nodes):
+        # Sort nodes below this node into the order a depth-first walk visits
+        # them in: by the position of each node, and of each node above it,
+        # among its siblings. The children are read without locking; see
+        # __init__.
+        keys = {self: ()}
+        positions = {}
+        def key(node):
+            above = []
+            while node not in keys:
+                if node._parent is None:
+                    # Removed from the tree since it was found
+                    return ()
+                above.append(node)
+                node = node._parent
+            k = keys[node]
+            for n in reversed(above):
+                parent = n._parent
+                pos = positions.get(parent)
+                if pos is None:
+                    pos = dict([(c, ii) for ii, c in
+                        enumerate(parent._children.values())])
+                    positions[parent] = pos
+                k += (pos.get(n, -1),)
+                keys[n] = k
+            return k
+        return sorted(nodes, key=key)
+
+    def _clear_path_info(self):
+        # Forget the paths of this node and the nodes below it, after it has
+        # been moved.
+        todo = [self]
+        while todo:
+            node = todo.pop()
+            node._path_info = None
+            todo.extend(list(node._children.values()))
+
+    def _get_path_info(self):
+        # Get the path of this node as a tuple, the path as a string, the name
+        # server the node is below and the root node, working them out the
+        # first time they are needed. A node's parent only changes through
+        # the parent property, which clears them. The parents are read
+        # without taking their locks, which may be held by threads waiting
+        # for this one.
+        info = self._path_info
+        if info is not None:
+            return info
+        nodes = []
+        node = self
+        while node is not None:
+            nodes.append(node)
+            node = node._parent
+        nodes.reverse()
+        path_str = nodes[0]._name
+        nameserver = None
+        for parent, node in zip(nodes, nodes[1:]):
+            if parent._name == '/':
+                path_str += node._name
+                nameserver = node
+            else:
+                path_str += '/' + node._name
+        info = (tuple([n._name for n in nodes]), path_str, nameserver,
+                nodes[0])
+        self._path_info = info
+        return info
+
+    def _is_unlisted(self):
+        # Is this node a lazy directory that has not been listed yet? Called
+        # while the root's index is locked, so it must not lock this node.
+        return False
+
+    def _note_pending(self):
+        # Tell the root of the tree whether this node is waiting to be listed,
+        # after that has changed.
+        root, path = self._indexed_root()
+        if root:
+            root._set_pending(self, path)
+
+    def _set_pending(self, node, path):
+        # Record whether a node below this root node is waiting to be listed.
+        # Its state is read with the index locked, so the last change wins.
+        with self._index_mutex:
+            if self._index.get(path) is not node:
+                return
+            if node._is_unlisted():
+                self._pending.add(node)
+            else:
+                self._pending.discard(node)
+
+    def _indexed_root(self):
+        # Find the root node above this node and the path to this node from
+        # it, as a tuple. Returns (None, None) if the root does not keep an
+        # index, or this node is not attached to the tree because a node
+        # above it has not been added to its parent yet; its subtree is
+        # indexed when it is. The parents are read without taking their
+        # locks, which may be held by threads waiting for this one.
+        path = []
+        node = self
+        while node._parent is not None:
+            parent = node._parent
+            if parent._children.get(node._name) is not node:
+                return None, None
+            path.append(node._name)
+            node = parent
+        if node._index is None:
+            return None, None
+        path.append(node._name)
+        path.reverse()
+        return node, tuple(path)
+
+    def _reindex(self, node, path):
+        # Add a node and the nodes below it to the index of this root node.
+        # The nodes are found, in depth-first order, and their types read
+        # before the index is locked, as reading a type may lock the node.
+        found = []
+        todo = [(node, path)]
+        while todo:
+            node, path = todo.pop()
+            found.append((node, path, _type_properties(node)))
+            todo.extend(reversed([(c, path + (c._name,))
+                for c in list(node._children.values())]))
+        with self._index_mutex:
+            for node, path, props in found:
+                self._index[path] = node
+                for p in props:
+                    self._types[p].add(node)
+                if node._is_unlisted():
+                    self._pending.add(node)
+
+    def _unindex(self, node, path):
+        # Remove a node and the nodes below it from the index of this root
+        # node.
+        with self._index_mutex:
+            todo = [(node, path)]
+            while todo:
+                node, path = todo.pop()
+                if self._index.get(path) is node:
+                    del self._index[path]
+                    for p in _type_properties(node):
+                        self._types[p].discard(node)
+                    self._pending.discard(node)
+                todo.extend([(c, path + (c._name,))
+                    for c in list(node._children.values())])
 
     def _call_cb(self, event, value):
-        if event not in self._cbs:
+        if event not in self._events:
             raise exceptions.NoSuchEventError(self.name, event)
-        for (cb, args) in self._cbs[event]:
+        if not self._cbs:
+            return
+        for (cb, args) in self._cbs.get(event, []):
             cb(self, value, args)
 
     def _enable_dynamic(self, enable=True):
@@ -413,14 +699,27 @@ class TreeNode(object):
         # By default, do nothing.
         pass
 
-    def _remove_all_children(self):
-        # Remove all children from this node.
-        self._children = {}
-
     def _set_events(self, events):
-        self._cbs = {}
-        for e in events:
-            self._cbs[e] = []
+        # Set the events callbacks can be added for. The sequence is kept, not
+        # copied, so child classes can share one.
+        self._events = events
+        self._cbs = None
+
+
+# The type properties of each class of node; see _type_properties
+_class_types = {}
+
+
+def _type_properties(node):
+    # Get the is_* type properties that are true for a node. They are fixed
+    # for each class of node below the root, so are only read once.
+    cls = type(node)
+    props = _class_types.get(cls)
+    if props is None:
+        props = tuple([p for p in nodefilter.TYPE_PROPERTIES
+            if getattr(node, p)])
+        _class_types[cls] = props
+    return props
 
 
 # vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
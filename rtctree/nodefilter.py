@@ -0,0 +1,276 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Object used to choose the nodes a function is called on during an iteration.
+
+'''
+
+
+import ast
+import operator
+import re
+
+from rtctree import exceptions
+
+
+# The is_* properties that give the type of a node, which the root node keeps
+# a set of nodes for
+TYPE_PROPERTIES = ('is_component', 'is_directory', 'is_manager',
+        'is_nameserver', 'is_placeholder', 'is_unknown', 'is_zombie')
+
+
+##############################################################################
+## Node filter object
+
+class NodeFilter(object):
+    '''A list of iteration filters compiled into a single test.
+
+    Each filter is a function object, called with the node, or a string.
+    A string naming an attribute of the node, such as 'is_component', is
+    compiled into an attribute getter. Any other string is an expression
+    over the node's attributes, such as '_name=="c1"'; it is parsed once,
+    when the filter is compiled, and never given to eval. Expressions may
+    use attribute names, constants, comparisons, arithmetic, 'and', 'or'
+    and 'not', method calls such as 'name.startswith("c")', and indexing
+    such as 'properties["vendor"]'. Names starting with '__' are not
+    allowed.
+
+    >>> class N(object):
+    ...     is_component = True
+    ...     _name = 'c1'
+    >>> NodeFilter(['is_component', '_name=="c1"']).passes(N())
+    True
+    >>> NodeFilter(['not is_component or _name in ("c2", "c3")']).passes(N())
+    False
+    >>> NodeFilter(['_name.startswith("c")']).passes(N())
+    True
+    >>> NodeFilter(['is_component']).type_property
+    'is_component'
+
+    '''
+    def __init__(self, filters=[]):
+        '''Constructor.
+
+        @param filters A list of filters, each a string or a function object.
+        @raises BadFilterError if a string filter cannot be compiled.
+
+        '''
+        super(NodeFilter, self).__init__()
+        self._tests = [_compile(f) for f in filters]
+        self._type_property = None
+        for f in filters:
+            if _is_string(f) and f.strip() in TYPE_PROPERTIES:
+                self._type_property = f.strip()
+                break
+
+    def passes(self, node):
+        '''Does a node pass every filter?'''
+        for test in self._tests:
+            if not test(node):
+                return False
+        return True
+
+    @property
+    def type_property(self):
+        '''The first is_* type property that nodes must have to pass, or None.
+
+        Only nodes in the root node's set for this type need be tested.
+
+        '''
+        return self._type_property
+
+
+def compile_filter(filter):
+    '''Compile a list of iteration filters.
+
+    @param filter A list of filters, or a NodeFilter, which is returned
+                  unchanged.
+    @return A NodeFilter.
+
+    '''
+    if isinstance(filter, NodeFilter):
+        return filter
+    return NodeFilter(filter)
+
+
+##############################################################################
+## Internal functions
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$')
+
+_COMPARISONS = {
+        ast.Eq: operator.eq,
+        ast.NotEq: operator.ne,
+        ast.Lt: operator.lt,
+        ast.LtE: operator.le,
+        ast.Gt: operator.gt,
+        ast.GtE: operator.ge,
+        ast.Is: operator.is_,
+        ast.IsNot: operator.is_not,
+        ast.In: lambda a, b: a in b,
+        ast.NotIn: lambda a, b: a not in b,
+        }
+
+_OPERATORS = {
+        ast.Add: operator.add,
+        ast.Sub: operator.sub,
+        ast.Mult: operator.mul,
+        ast.Div: operator.truediv,
+        ast.FloorDiv: operator.floordiv,
+        ast.Mod: operator.mod,
+        }
+
+_UNARY_OPERATORS = {
+        ast.Not: operator.not_,
+        ast.USub: operator.neg,
+        ast.UAdd: operator.pos,
+        }
+
+_NAMED_CONSTANTS = {'True': True, 'False': False, 'None': None}
+
+
+def _is_string(f):
+    try:
+        return isinstance(f, basestring)
+    except NameError:
+        return isinstance(f, str)
+
+
+def _compile(f):
+    # Turn one filter into a function of the node.
+    if not _is_string(f):
+        return f
+    f = f.strip()
+    if _IDENTIFIER.match(f) and f not in _NAMED_CONSTANTS:
+        for name in f.split('.'):
+            _check_name(name, f)
+        return operator.attrgetter(f)
+    try:
+        tree = ast.parse(f, mode='eval')
+        return _compile_expr(tree.body, f)
+    except SyntaxError:
+        raise exceptions.BadFilterError(f)
+
+
+def _compile_expr(expr, source):
+    # Turn a node of the syntax tree of a filter expression into a function
+    # of the node being filtered. Names are attributes of the node.
+    if isinstance(expr, ast.Name):
+        if expr.id in _NAMED_CONSTANTS:
+            value = _NAMED_CONSTANTS[expr.id]
+            return lambda node: value
+        _check_name(expr.id, source)
+        return operator.attrgetter(expr.id)
+    if isinstance(expr, ast.Attribute):
+        value = _compile_expr(expr.value, source)
+        attr = _check_name(expr.attr, source)
+        return lambda node: getattr(value(node), attr)
+    if isinstance(expr, ast.Call):
+        return _compile_call(expr, source)
+    if isinstance(expr, ast.Subscript):
+        value = _compile_expr(expr.value, source)
+        index = expr.slice
+        if isinstance(index, getattr(ast, 'Index', ())):
+            # Before Python 3.9, the index is wrapped
+            index = index.value
+        if isinstance(index, (ast.Slice, getattr(ast, 'ExtSlice', ()))):
+            raise exceptions.BadFilterError(source)
+        index = _compile_expr(index, source)
+        return lambda node: value(node)[index(node)]
+    if isinstance(expr, ast.UnaryOp):
+        operand = _compile_expr(expr.operand, source)
+        try:
+            op = _UNARY_OPERATORS[type(expr.op)]
+        except KeyError:
+            raise exceptions.BadFilterError(source)
+        return lambda node: op(operand(node))
+    if isinstance(expr, ast.BinOp):
+        left = _compile_expr(expr.left, source)
+        right = _compile_expr(expr.right, source)
+        try:
+            op = _OPERATORS[type(expr.op)]
+        except KeyError:
+            raise exceptions.BadFilterError(source)
+        return lambda node: op(left(node), right(node))
+    if isinstance(expr, ast.BoolOp):
+        values = [_compile_expr(v, source) for v in expr.values]
+        if isinstance(expr.op, ast.And):
+            return lambda node: all(v(node) for v in values)
+        return lambda node: any(v(node) for v in values)
+    if isinstance(expr, ast.Compare):
+        operands = [_compile_expr(expr.left, source)] + \
+                [_compile_expr(c, source) for c in expr.comparators]
+        try:
+            ops = [_COMPARISONS[type(op)] for op in expr.ops]
+        except KeyError:
+            raise exceptions.BadFilterError(source)
+        def compare(node):
+            left = operands[0](node)
+            for op, operand in zip(ops, operands[1:]):
+                right = operand(node)
+                if not op(left, right):
+                    return False
+                left = right
+            return True
+        return compare
+    if isinstance(expr, (ast.Tuple, ast.List)):
+        elts = [_compile_expr(e, source) for e in expr.elts]
+        return lambda node: tuple(e(node) for e in elts)
+    constant = _constant(expr)
+    if constant is not _constant:
+        return lambda node: constant
+    raise exceptions.BadFilterError(source)
+
+
+def _compile_call(expr, source):
+    # Compile a call of a method of the node, or of one of its attributes.
+    # Only plain positional and keyword arguments are allowed.
+    if not isinstance(expr.func, (ast.Name, ast.Attribute)):
+        raise exceptions.BadFilterError(source)
+    if getattr(expr, 'starargs', None) or getattr(expr, 'kwargs', None):
+        raise exceptions.BadFilterError(source)
+    starred = getattr(ast, 'Starred', ())
+    if any(isinstance(a, starred) for a in expr.args) or \
+            any(k.arg is None for k in expr.keywords):
+        raise exceptions.BadFilterError(source)
+    func = _compile_expr(expr.func, source)
+    args = [_compile_expr(a, source) for a in expr.args]
+    kwargs = [(k.arg, _compile_expr(k.value, source)) for k in expr.keywords]
+    def call(node):
+        return func(node)(*[a(node) for a in args],
+                **dict((k, v(node)) for k, v in kwargs))
+    return call
+
+
+def _check_name(name, source):
+    # Refuse names that reach the internals of Python objects.
+    if name.startswith('__'):
+        raise exceptions.BadFilterError(source)
+    return name
+
+
+def _constant(expr):
+    # Get the value of a constant in the syntax tree, or _constant if the
+    # expression is not a constant. The node types differ between Python
+    # versions.
+    for node_type, field in (('Constant', 'value'), ('Str', 's'),
+            ('Num', 'n'), ('NameConstant', 'value'), ('Bytes', 's')):
+        t = getattr(ast, node_type, None)
+        if t is not None and isinstance(expr, t):
+            return getattr(expr, field)
+    return _constant
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
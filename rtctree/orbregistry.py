@@ -0,0 +1,166 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Process-wide registry of the ORB shared by trees.
+
+'''
+
+
+import threading
+import warnings
+
+from omniORB import CORBA
+
+
+# Guards the creation of the registry
+_registry_mutex = threading.Lock()
+
+
+##############################################################################
+## ORB registry object
+
+class ORBRegistry(object):
+    '''Holds the ORB and root POA shared by all the trees in a process.
+
+    Starting an ORB and activating its root POA takes time, and shutting it
+    down closes every connection it has made. Trees that are not given an
+    ORB use the shared ORB from this registry instead, so a tree created
+    after another has been dropped starts at once and reuses the connections
+    already made to name servers and managers.
+
+    The registry counts the users of the shared ORB. By default, the ORB is
+    kept running when the count drops to zero, ready for the next tree; set
+    keep_alive to False to shut it down as soon as it is no longer used, or
+    call @ref shutdown to shut it down if it is not in use.
+
+    The ORB is started with the arguments given to the first @ref acquire
+    call. A later call giving different arguments still gets the running
+    ORB, and a RuntimeWarning is issued.
+
+    There is only one registry in a process, even when threads create it at
+    the same time:
+
+    >>> ORBRegistry() is ORBRegistry()
+    True
+
+    '''
+    def __new__(cls, *p, **k):
+        with _registry_mutex:
+            if not '_the_instance' in cls.__dict__:
+                instance = object.__new__(cls)
+                instance._init_registry()
+                cls._the_instance = instance
+            return cls._the_instance
+
+    def acquire(self, args=[]):
+        '''Get the shared ORB and root POA, starting them if necessary.
+
+        Each call must be matched by a call to @ref release once the ORB is
+        no longer needed.
+
+        @param args Arguments to pass to the ORB if it has to be started. If
+                    the shared ORB is already running, they are not used,
+                    and a RuntimeWarning is issued if they differ from the
+                    arguments it was started with.
+        @return A tuple of the ORB and its root POA, which is active.
+
+        '''
+        with self._mutex:
+            if not self._orb:
+                orb = CORBA.ORB_init(args)
+                poa = orb.resolve_initial_references('RootPOA')
+                poa._get_the_POAManager().activate()
+                self._orb = orb
+                self._poa = poa
+                self._args = list(args)
+            elif list(args) != self._args:
+                warnings.warn('The shared ORB is already running with the '
+                        'arguments {0}; ignoring {1}'.format(self._args,
+                            list(args)), RuntimeWarning, stacklevel=2)
+            self._users += 1
+            return self._orb, self._poa
+
+    def release(self, orb):
+        '''Stop using the shared ORB.
+
+        @param orb The ORB returned by @ref acquire. Any other ORB is
+                   ignored.
+
+        '''
+        with self._mutex:
+            if orb is not self._orb or not self._users:
+                return
+            self._users -= 1
+            if not self._users and not self._keep_alive:
+                self._destroy()
+
+    def shutdown(self):
+        '''Shut down the shared ORB if nothing is using it.
+
+        @return True if the ORB was shut down or was not running.
+
+        '''
+        with self._mutex:
+            if self._users:
+                return False
+            if self._orb:
+                self._destroy()
+            return True
+
+    @property
+    def keep_alive(self):
+        '''Is the shared ORB kept running when it has no users?'''
+        with self._mutex:
+            return self._keep_alive
+
+    @keep_alive.setter
+    def keep_alive(self, keep_alive):
+        with self._mutex:
+            self._keep_alive = keep_alive
+            if not keep_alive and not self._users and self._orb:
+                self._destroy()
+
+    @property
+    def orb(self):
+        '''The shared ORB, or None if it is not running.'''
+        with self._mutex:
+            return self._orb
+
+    @property
+    def users(self):
+        '''The number of users of the shared ORB.'''
+        with self._mutex:
+            return self._users
+
+    def _destroy(self):
+        # Shut down and destroy the shared ORB. The next user starts a new
+        # one.
+        orb = self._orb
+        self._orb = None
+        self._poa = None
+        self._args = None
+        orb.shutdown(wait_for_completion=CORBA.FALSE)
+        orb.destroy()
+
+    def _init_registry(self):
+        self._mutex = threading.RLock()
+        self._orb = None
+        self._poa = None
+        self._args = None
+        self._users = 0
+        self._keep_alive = True
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
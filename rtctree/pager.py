@@ -0,0 +1,205 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Object used to fetch the bindings of a naming context a page at a time.
+
+'''
+
+
+import threading
+import time
+
+from omniORB import CORBA
+
+from rtctree.deadline import limit_calls
+
+
+##############################################################################
+## Binding pager object
+
+class BindingPager(object):
+    '''Fetches the bindings in a naming context, a page at a time.
+
+    The first page is fetched by listing the context. Any further bindings
+    are fetched from the binding iterator the naming service gives back.
+    Each page is fetched in a background thread while the bindings of the
+    previous page are being used, and the size of each page is chosen from
+    how long the previous page took to arrive and how large it was:
+
+    - Pages that arrive quickly are dominated by the round trip, so the page
+      size is doubled.
+    - Pages that take longer than @ref target_time are shrunk in proportion.
+    - Pages are never allowed to grow past @ref max_payload bytes, estimated
+      from the sizes of the bindings received so far, so that they stay well
+      within the ORB's maximum message size.
+
+    The binding iterator is always destroyed, even if the bindings are not
+    all used or fetching them fails. Use the pager as a context manager to
+    make sure of this:
+
+    with BindingPager(context, 100) as bindings:
+        for binding in bindings:
+            ...
+
+    '''
+    def __init__(self, context, first_page=100, adaptive=True,
+            target_time=0.2, max_page=10000, max_payload=1048576,
+            deadline=None):
+        '''Constructor.
+
+        @param context The naming context to list.
+        @param first_page The number of bindings to get when listing the
+                          context. Later pages are this size if
+                          @ref adaptive is False.
+        @param adaptive Choose the size of each page from how the previous
+                        page was fetched.
+        @param target_time The time, in seconds, that fetching one page
+                           should take at most.
+        @param max_page The largest number of bindings to fetch in one page.
+        @param max_payload The largest estimated size, in bytes, of a page.
+        @param deadline A Deadline whose call timeout limits the fetching of
+                        pages in the background.
+
+        '''
+        super(BindingPager, self).__init__()
+        self._context = context
+        self._page_size = first_page
+        self._adaptive = adaptive
+        self._target_time = target_time
+        self._max_page = max_page
+        self._max_payload = max_payload
+        self._deadline = deadline
+        self._iterator = None
+        self._fetcher = None
+        self._bytes = 0
+        self._count = 0
+        self._pages = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __iter__(self):
+        start = time.time()
+        bindings, self._iterator = self._context.list(self._page_size)
+        self._update_page_size(bindings, time.time() - start)
+        try:
+            while True:
+                if self._iterator is None:
+                    fetcher = None
+                else:
+                    # Get the next page while this one is being used
+                    fetcher = self._Fetcher(self._iterator, self._page_size,
+                            self._deadline)
+                    fetcher.start()
+                self._fetcher = fetcher
+                for binding in bindings:
+                    yield binding
+                if not fetcher:
+                    break
+                more, bindings = fetcher.result()
+                self._fetcher = None
+                if not more:
+                    break
+                self._update_page_size(bindings, fetcher.elapsed)
+        finally:
+            self.close()
+
+    def close(self):
+        '''Destroy the binding iterator, if there is one.
+
+        Any page still being fetched is waited for first.
+
+        '''
+        if self._fetcher:
+            self._fetcher.join()
+            self._fetcher = None
+        if self._iterator is not None:
+            iterator = self._iterator
+            self._iterator = None
+            try:
+                iterator.destroy()
+            except CORBA.SystemException:
+                # The naming service will clean up the iterator itself
+                # eventually
+                pass
+
+    @property
+    def page_size(self):
+        '''The size of the next page to be fetched.'''
+        return self._page_size
+
+    @property
+    def pages(self):
+        '''The number of pages fetched so far, including the first.'''
+        return self._pages
+
+    def _update_page_size(self, bindings, elapsed):
+        # Choose the size of the next page from the size of the page just
+        # fetched and the time it took to arrive.
+        self._pages += 1
+        if not bindings:
+            return
+        self._count += len(bindings)
+        self._bytes += sum([_binding_size(b) for b in bindings])
+        if not self._adaptive:
+            return
+        size = self._page_size
+        if elapsed < self._target_time / 2 and len(bindings) >= size:
+            size *= 2
+        elif elapsed > self._target_time:
+            size = int(size * self._target_time / elapsed)
+        payload_limit = self._max_payload * self._count // self._bytes
+        self._page_size = max(1, min(size, self._max_page, payload_limit))
+
+    class _Fetcher(threading.Thread):
+        # Fetches one page from a binding iterator in the background.
+        def __init__(self, iterator, size, deadline=None):
+            threading.Thread.__init__(self)
+            self.daemon = True
+            self._iterator = iterator
+            self._size = size
+            self._deadline = deadline
+            self._result = None
+            self._error = None
+            self.elapsed = 0
+
+        def run(self):
+            start = time.time()
+            try:
+                with limit_calls(self._deadline):
+                    self._result = self._iterator.next_n(self._size)
+            except Exception as e:
+                self._error = e
+            self.elapsed = time.time() - start
+
+        def result(self):
+            self.join()
+            if self._error:
+                raise self._error
+            return self._result
+
+
+def _binding_size(binding):
+    # Estimate the size of a binding when marshalled. Each name component is
+    # two strings, each with a length and a terminating null, and the binding
+    # type is an enum.
+    return 4 + sum([len(nc.id) + len(nc.kind) + 10 \
+            for nc in binding.binding_name]) + 4
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
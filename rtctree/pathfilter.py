@@ -0,0 +1,269 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Object used to restrict the parts of a tree that are parsed.
+
+'''
+
+
+import fnmatch
+import re
+
+
+##############################################################################
+## Path filter object
+
+class PathFilter(object):
+    '''A set of paths restricting which nodes are parsed, compiled into a
+    trie.
+
+    A path filter is made from a list of paths, each a list of path elements,
+    such as [['/', 'localhost', 'host.cxt', 'comp1.rtc']]. A directory passes
+    the filter if its path is the start of one of the paths, or if one of the
+    paths is the start of its path; everything below the end of a path is
+    parsed. Any other node passes if it is at the end of one of the paths or
+    below it. An empty list of paths does not filter anything.
+
+    Path elements can be patterns as well as names:
+
+    - An element containing any of the characters '*', '?' or '[' is a glob
+      pattern, matched against the names of nodes as by fnmatch.
+    - A compiled regular expression (the result of re.compile) must match
+      the whole name of a node.
+    - The element '**' matches any number of levels, including none.
+
+    For example, [['/', '*', '**', '*.host_cxt', '**', 'Camera*.rtc']] passes
+    every component whose name starts with 'Camera' anywhere below a host
+    context on any name server. Because the filter is checked as the naming
+    contexts are listed, objects that do not pass it are never resolved or
+    contacted.
+
+    Each level of the trie answers whether a child passes, and gives the
+    filter for the child's own children. Names are looked up in a
+    dictionary; only the patterns at a level are matched one by one:
+
+    >>> f = PathFilter([['/', 'localhost', 'host.cxt', 'comp1.rtc']])
+    >>> f.child('/').child('localhost').child('host.cxt').passes('comp2.rtc')
+    False
+    >>> f.descend(['/', 'localhost', 'host.cxt']).passes('comp1.rtc')
+    True
+    >>> f.descend(['/', 'localhost', 'host.cxt', 'comp1.rtc']).passes_all
+    True
+    >>> f = PathFilter([['/', '*', '**', 'Camera*.rtc']])
+    >>> f.descend(['/', 'localhost', 'a.cxt', 'b.cxt']).matches('Camera0.rtc')
+    True
+    >>> f.descend(['/', 'localhost', 'a.cxt']).matches('Laser0.rtc')
+    False
+
+    '''
+    def __init__(self, paths=[]):
+        '''Constructor.
+
+        @param paths A list of paths (each a list of names and patterns).
+
+        '''
+        super(PathFilter, self).__init__()
+        self._branches = {}
+        self._patterns = []
+        self._deep = []
+        # An empty filter does not filter anything
+        self._all = not paths
+        for path in paths:
+            self._add(path)
+
+    def child(self, name):
+        '''Get the filter for the children of a child node.
+
+        @param name The name of the child node.
+        @return The filter to parse the child's children with, or None if
+                the child does not pass this filter.
+
+        '''
+        if self._all:
+            return self
+        branch = self._branches.get(name)
+        if not self._patterns and not self._deep:
+            return branch
+        found = []
+        if branch is not None:
+            found.append(branch)
+        for pattern, branch in self._patterns:
+            m = pattern.match(name)
+            if m and m.end() == len(name):
+                found.append(branch)
+        for rest, anywhere in self._deep:
+            # The child may be the next level after a '**', or one of the
+            # levels it covers.
+            branch = rest.child(name)
+            if branch is not None:
+                found.append(branch)
+            found.append(anywhere)
+        if not found:
+            return None
+        return _union(found)
+
+    def descend(self, path):
+        '''Get the filter for the children of a node several levels down.
+
+        @param path The path to the node, as a list of path elements, starting
+                    with a child of the node this filter applies to.
+        @return The filter to parse the node's children with, or None if the
+                node does not pass this filter.
+
+        '''
+        result = self
+        for name in path:
+            result = result.child(name)
+            if result is None:
+                return None
+        return result
+
+    def matches(self, name):
+        '''Check if a child node is at the end of one of the paths, or below
+        it.
+
+        Nodes other than directories must match to be parsed; passing only
+        means that a path continues below the node.
+
+        '''
+        branch = self.child(name)
+        return branch is not None and branch._all
+
+    def passes(self, name):
+        '''Check if a child node passes this filter.'''
+        return self.child(name) is not None
+
+    def paths(self):
+        '''Get a list of paths that compile to a filter passing the same
+        nodes as this one.
+
+        Glob patterns are given as the regular expressions they were compiled
+        to.
+
+        >>> PathFilter([['a', 'b'], ['a', '**', 'c']]).child('a').paths()
+        [['b'], ['**', 'c']]
+        >>> PathFilter().paths()
+        [[]]
+
+        '''
+        if self._all:
+            return [[]]
+        result = []
+        for name in sorted(self._branches):
+            result += [[name] + p for p in self._branches[name].paths()]
+        for pattern, branch in self._patterns:
+            result += [[pattern] + p for p in branch.paths()]
+        for rest, anywhere in self._deep:
+            result += [['**'] + p for p in rest.paths()]
+        return result
+
+    @property
+    def passes_all(self):
+        '''Does everything below this point pass the filter?'''
+        return self._all
+
+    def _add(self, path):
+        # Add a path to the trie. Paths that end at or below a point where
+        # everything already passes change nothing; a path that ends at a
+        # point replaces anything that had been added below it. A '**' at the
+        # end of a path may match no levels, so the path ends before it.
+        path = list(path)
+        while path and path[-1] == '**':
+            path.pop()
+        node = self
+        for name in path:
+            if node._all:
+                return
+            if name == '**':
+                rest = _branch()
+                anywhere = _branch()
+                anywhere._deep.append((rest, anywhere))
+                node._deep.append((rest, anywhere))
+                node = rest
+                continue
+            pattern = _compile_pattern(name)
+            if pattern is None:
+                branch = node._branches.get(name)
+                if branch is None:
+                    branch = node._branches[name] = _branch()
+            else:
+                for p, branch in node._patterns:
+                    if p.pattern == pattern.pattern:
+                        break
+                else:
+                    branch = _branch()
+                    node._patterns.append((pattern, branch))
+            node = branch
+        node._all = True
+        node._branches = {}
+        node._patterns = []
+        node._deep = []
+
+
+def compile_filter(filter):
+    '''Compile a list of paths into a PathFilter.
+
+    @param filter A list of paths (each a list of names and patterns), or a
+                  PathFilter, which is returned unchanged.
+    @return A PathFilter.
+
+    '''
+    if isinstance(filter, PathFilter):
+        return filter
+    return PathFilter(filter)
+
+
+def _branch():
+    # Make a point in the trie that nothing passes until paths are added
+    # through it.
+    result = PathFilter.__new__(PathFilter)
+    result._branches = {}
+    result._patterns = []
+    result._deep = []
+    result._all = False
+    return result
+
+
+def _compile_pattern(element):
+    # Get the regular expression for a path element, or None if the element
+    # is a plain name.
+    if hasattr(element, 'match'):
+        return element
+    if any(c in element for c in '*?['):
+        return re.compile(fnmatch.translate(element))
+    return None
+
+
+def _union(branches):
+    # Make a point in the trie that passes what any of several points pass.
+    if len(branches) == 1:
+        return branches[0]
+    for b in branches:
+        if b._all:
+            return b
+    result = _branch()
+    for b in branches:
+        for name, branch in b._branches.items():
+            if name in result._branches:
+                branch = _union([result._branches[name], branch])
+            result._branches[name] = branch
+        result._patterns.extend(b._patterns)
+        for deep in b._deep:
+            if deep not in result._deep:
+                result._deep.append(deep)
+    return result
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
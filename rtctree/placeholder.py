@@ -0,0 +1,109 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Object representing a placeholder node in the tree.
+
+'''
+
+
+from rtctree import exceptions
+from rtctree.node import TreeNode
+
+
+##############################################################################
+## Placeholder node object
+
+class Placeholder(TreeNode):
+    '''Node standing in for an object on a name server that has not been
+    resolved.
+
+    Placeholder nodes are created by directories parsed in names-only mode,
+    and for objects that were not resolved because the parse ran out of time
+    or a call to the object timed out. They know only the name and kind of
+    their binding, taken from the listing of the naming context, so creating
+    them makes no remote calls. Call @ref upgrade to replace a placeholder
+    with a Component, Manager, Zombie or Unknown node for the object.
+    Placeholders cannot contain any children.
+
+    '''
+    __slots__ = ('_binding', '_timed_out')
+
+    def __init__(self, name, parent, binding, timed_out=False, *args,
+            **kwargs):
+        '''Constructor.
+
+        @param name Name of this object (i.e. its entry in the path).
+        @param parent The parent node of this node, if any.
+        @param binding The CosNaming binding of the object.
+        @param timed_out True if the placeholder was created because a call
+                         to resolve or contact the object timed out.
+
+        '''
+        super(Placeholder, self).__init__(name=name, parent=parent, *args,
+                **kwargs)
+        self._binding = binding
+        self._timed_out = timed_out
+
+    def upgrade(self):
+        '''Replace this placeholder with a node for the object it stands for.
+
+        The object is resolved and a node of the correct type is put in place
+        of this node in the parent directory. This node should not be used
+        after it has been upgraded.
+
+        @return The new node, or None if the binding no longer refers to an
+                object.
+
+        '''
+        return self.parent._upgrade_child(self)
+
+    @property
+    def binding(self):
+        '''The CosNaming binding of the object.'''
+        with self._mutex:
+            return self._binding
+
+    @property
+    def is_pending(self):
+        '''Is this node waiting to be filled in from the name server?'''
+        return True
+
+    @property
+    def is_placeholder(self):
+        '''Is this node a placeholder for an unresolved object?'''
+        return True
+
+    @property
+    def kind(self):
+        '''The kind of the object's binding, such as 'rtc' or 'mgr'.'''
+        with self._mutex:
+            return self._binding.binding_name[0].kind
+
+    @property
+    def timed_out(self):
+        '''Did a remote call for this node time out while it was parsed?'''
+        with self._mutex:
+            return self._timed_out
+
+
+    ###########################################################################
+    # Internal API
+
+    def _add_child(self):
+        # Placeholders cannot contain children.
+        raise exceptions.CannotHoldChildrenError
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
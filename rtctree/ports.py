@@ -23,9 +23,8 @@ create the correct type of port object automatically.
 '''
 
 
-import threading
-
 from rtctree import exceptions
+from rtctree import locks
 from rtctree import utils
 from rtctree.rtc import RTC
 
@@ -33,7 +32,7 @@ from rtctree.rtc import RTC
 ##############################################################################
 ## API functions
 
-def parse_port(port_obj, owner):
+def parse_port(port_obj, owner, profile=None):
     '''Create a port object of the correct type.
 
     The correct port object type is chosen based on the port.port_type
@@ -41,19 +40,22 @@ def parse_port(port_obj, owner):
 
     @param port_obj The CORBA PortService object to wrap.
     @param owner The owner of this port. Should be a Component object or None.
+    @param profile The port's profile, if it is already known. If None, it
+                   will be retrieved from port_obj.
     @return The created port object.
 
     '''
-    profile = port_obj.get_port_profile()
+    if not profile:
+        profile = port_obj.get_port_profile()
     props = utils.nvlist_to_dict(profile.properties)
     if props['port.port_type'] == 'DataInPort':
-        return DataInPort(port_obj, owner)
+        return DataInPort(port_obj, owner, profile)
     elif props['port.port_type'] == 'DataOutPort':
-        return DataOutPort(port_obj, owner)
+        return DataOutPort(port_obj, owner, profile)
     elif props['port.port_type'] == 'CorbaPort':
-        return CorbaPort(port_obj, owner)
+        return CorbaPort(port_obj, owner, profile)
     else:
-        return Port(port_obj, owner)
+        return Port(port_obj, owner, profile)
 
 
 ##############################################################################
@@ -65,20 +67,26 @@ class Port(object):
     Do not create Port objects directly. Call parse_port().
 
     '''
-    def __init__(self, port_obj=None, owner=None, *args, **kwargs):
+    __slots__ = ('_connections', '_mutex', '_name', '_obj', '_owner',
+            '_properties')
+
+    def __init__(self, port_obj=None, owner=None, profile=None, *args,
+            **kwargs):
         '''Base port constructor.
 
         @param port_obj The CORBA PortService object to wrap.
         @param owner The owner of this port. Should be a Component object or
                      None.
+        @param profile The port's profile, if it is already known. If None,
+                       it will be retrieved from port_obj.
 
         '''
         super(Port, self).__init__(*args, **kwargs)
         self._obj = port_obj
         self._connections = None
         self._owner = owner
-        self._mutex = threading.RLock()
-        self._parse()
+        self._mutex = locks.lock_for(self)
+        self._parse(profile)
 
     def connect(self, dests=[], name=None, id='', props={}):
         '''Connect this port to other ports.
@@ -96,87 +104,74 @@ class Port(object):
         @raises IncompatibleDataPortConnectionPropsError, FailedToConnectError
 
         '''
-        with self._mutex:
-            if self.porttype == 'DataInPort' or self.porttype == 'DataOutPort':
-                for prop in props:
-                    if prop in self.properties:
-                        if props[prop] not in [x.strip() for x in self.properties[prop].split(',')] and \
-                                'any' not in self.properties[prop].lower():
-                            # Invalid property selected
-                            raise exceptions.IncompatibleDataPortConnectionPropsError
-                    for d in dests:
-                        if prop in d.properties:
-                            if props[prop] not in [x.strip() for x in d.properties[prop].split(',')] and \
-                                    'any' not in d.properties[prop].lower():
-                                # Invalid property selected
-                                raise exceptions.IncompatibleDataPortConnectionPropsError
-            if not name:
-                name = self.name + '_'.join([d.name for d in dests])
-            props = utils.dict_to_nvlist(props)
-            profile = RTC.ConnectorProfile(name, id,
-                    [self._obj] + [d._obj for d in dests], props)
-            return_code, profile = self._obj.connect(profile)
-            if return_code != RTC.RTC_OK:
-                raise exceptions.FailedToConnectError(return_code)
-            self.reparse_connections()
-            for d in dests:
-                d.reparse_connections()
+        if self.porttype == 'DataInPort' or self.porttype == 'DataOutPort':
+            for prop in props:
+                if prop in self.properties:
+                    _check_connection_prop(props[prop], self.properties[prop])
+                for d in dests:
+                    if prop in d.properties:
+                        _check_connection_prop(props[prop], d.properties[prop])
+        if not name:
+            name = self.name + '_'.join([d.name for d in dests])
+        props = utils.dict_to_nvlist(props)
+        profile = RTC.ConnectorProfile(name, id,
+                [self._obj] + [d._obj for d in dests], props)
+        return_code, profile = self._obj.connect(profile)
+        if return_code != RTC.RTC_OK:
+            raise exceptions.FailedToConnectError(return_code)
+        self.reparse_connections()
+        for d in dests:
+            d.reparse_connections()
 
     def disconnect_all(self):
         '''Disconnect all connections to this port.'''
-        with self._mutex:
-            for conn in self.connections:
-                self.object.disconnect(conn.id)
-            self.reparse_connections()
+        for conn in self.connections:
+            self.object.disconnect(conn.id)
+        self.reparse_connections()
 
     def get_connection_by_dest(self, dest):
         '''DEPRECATED. Search for a connection between this and another port.'''
-        with self._mutex:
-            for conn in self.connections:
-                if conn.has_port(self) and conn.has_port(dest):
-                    return conn
-            return None
+        for conn in self.connections:
+            if conn.has_port(self) and conn.has_port(dest):
+                return conn
+        return None
 
     def get_connections_by_dest(self, dest):
         '''Search for all connections between this and another port.'''
-        with self._mutex:
-            res = []
-            for c in self.connections:
-                if c.has_port(self) and c.has_port(dest):
-                    res.append(c)
-            return res
+        res = []
+        for c in self.connections:
+            if c.has_port(self) and c.has_port(dest):
+                res.append(c)
+        return res
 
     def get_connections_by_dests(self, dests):
         '''Search for all connections involving this and all other ports.'''
-        with self._mutex:
-            res = []
-            for c in self.connections:
-                if not c.has_port(self):
-                    continue
-                has_dest = False
-                for d in dests:
-                    if c.has_port(d):
-                        has_dest = True
-                        break
-                if has_dest:
-                    res.append(c)
-            return res
+        res = []
+        for c in self.connections:
+            if not c.has_port(self):
+                continue
+            has_dest = False
+            for d in dests:
+                if c.has_port(d):
+                    has_dest = True
+                    break
+            if has_dest:
+                res.append(c)
+        return res
 
     def get_connection_by_id(self, id):
         '''Search for a connection on this port by its ID.'''
-        with self._mutex:
-            for conn in self.connections:
-                if conn.id == id:
-                    return conn
-            return None
+        for conn in self.connections:
+            if conn.id == id:
+                return conn
+        return None
 
     def get_connection_by_name(self, name):
         '''Search for a connection to or from this port by name.'''
-        with self._mutex:
-            for conn in self.connections:
-                if conn.name == name:
-                    return conn
-            return None
+        for conn in self.connections:
+            if conn.name == name:
+                return conn
+        return None
 
     def reparse(self):
         '''Reparse the port.'''
@@ -198,19 +193,26 @@ class Port(object):
         triggered).
 
         '''
+        with self._mutex:
+            if self._connections:
+                return self._connections
+        # The connections are made without holding this port's lock, which
+        # they may share.
+        connections = [Connection(cp, self) \
+                       for cp in self.object.get_connector_profiles()]
         with self._mutex:
             if not self._connections:
-                self._connections = [Connection(cp, self) \
-                                     for cp in self._obj.get_connector_profiles()]
-        return self._connections
+                self._connections = connections
+            return self._connections
 
     @property
     def is_connected(self):
         '''Check if this port is connected to any other ports.'''
-        with self._mutex:
-            if self.connections:
-                return True
-            return False
+        # Not locked: getting the connections makes remote calls and takes
+        # the locks of the new Connection objects
+        if self.connections:
+            return True
+        return False
 
     @property
     def name(self):
@@ -245,16 +247,21 @@ class Port(object):
         with self._mutex:
             return self._properties
 
-    def _parse(self):
-        # Parse the PortService object to build a port profile.
-        with self._mutex:
-            profile = self._obj.get_port_profile()
-            self._name = profile.name
+    def _parse(self, profile=None):
+        # Parse the PortService object to build a port profile. The owner's
+        # instance name is got before taking this port's lock, which may be
+        # shared with the owner's other ports.
+        if not profile:
+            profile = self.object.get_port_profile()
+        name = profile.name
+        owner = self.owner
+        if owner:
+            prefix = owner.instance_name + '.'
+            if name.startswith(prefix):
+                name = name[len(prefix):]
+        with self._mutex:
+            self._name = name
             self._properties = utils.nvlist_to_dict(profile.properties)
-            if self.owner:
-                prefix = self.owner.instance_name + '.'
-                if self._name.startswith(prefix):
-                    self._name = self._name[len(prefix):]
 
 
 ##############################################################################
@@ -266,16 +273,20 @@ class DataPort(Port):
     Do not create DataPort objects directly. Call parse_port().
 
     '''
-    def __init__(self, port_obj=None, owner=None, *args, **kwargs):
+    __slots__ = ()
+
+    def __init__(self, port_obj=None, owner=None, profile=None, *args,
+            **kwargs):
         '''DataPort constructor.
 
         @param port_obj The CORBA PortService object to wrap.
         @param owner The owner of this port. Should be a Component object or
                      None.
+        @param profile The port's profile, if it is already known.
 
         '''
-        super(DataPort, self).__init__(port_obj=port_obj, owner=owner, *args,
-                                       **kwargs)
+        super(DataPort, self).__init__(port_obj=port_obj, owner=owner,
+                                       profile=profile, *args, **kwargs)
 
     def connect(self, dests=[], name=None, id='', props={}):
         '''Connect this port to other DataPorts.
@@ -294,26 +305,25 @@ class DataPort(Port):
 
         '''
         # Data ports can only connect to opposite data ports
-        with self._mutex:
-            new_props = props.copy()
-            ptypes = [d.porttype for d in dests]
-            if self.porttype == 'DataInPort':
-                if 'DataOutPort' not in ptypes:
-                    raise exceptions.WrongPortTypeError
-            if self.porttype == 'DataOutPort':
-                if 'DataInPort' not in ptypes:
-                    raise exceptions.WrongPortTypeError
-            if 'dataport.dataflow_type' not in new_props:
-                new_props['dataport.dataflow_type'] = 'push'
-            if 'dataport.interface_type' not in new_props:
-                new_props['dataport.interface_type'] = 'corba_cdr'
-            if 'dataport.subscription_type' not in new_props:
-                new_props['dataport.subscription_type'] = 'new'
-            if 'dataport.data_type' not in new_props:
-                new_props['dataport.data_type'] = \
-                        self.properties['dataport.data_type']
-            super(DataPort, self).connect(dests=dests, name=name, id=id,
-                                          props=new_props)
+        new_props = props.copy()
+        ptypes = [d.porttype for d in dests]
+        if self.porttype == 'DataInPort':
+            if 'DataOutPort' not in ptypes:
+                raise exceptions.WrongPortTypeError
+        if self.porttype == 'DataOutPort':
+            if 'DataInPort' not in ptypes:
+                raise exceptions.WrongPortTypeError
+        if 'dataport.dataflow_type' not in new_props:
+            new_props['dataport.dataflow_type'] = 'push'
+        if 'dataport.interface_type' not in new_props:
+            new_props['dataport.interface_type'] = 'corba_cdr'
+        if 'dataport.subscription_type' not in new_props:
+            new_props['dataport.subscription_type'] = 'new'
+        if 'dataport.data_type' not in new_props:
+            new_props['dataport.data_type'] = \
+                    self.properties['dataport.data_type']
+        super(DataPort, self).connect(dests=dests, name=name, id=id,
+                                      props=new_props)
 
 
 class DataInPort(DataPort):
@@ -322,7 +332,7 @@ class DataInPort(DataPort):
     Do not create DataInPort objects directly. Call parse_port().
 
     '''
-    pass
+    __slots__ = ()
 
 
 class DataOutPort(DataPort):
@@ -331,7 +341,7 @@ class DataOutPort(DataPort):
     Do not create DataOutPort objects directly. Call parse_port().
 
     '''
-    pass
+    __slots__ = ()
 
 
 ##############################################################################
@@ -343,17 +353,21 @@ class CorbaPort(Port):
     Do not create CorbaPort objects directly. Call parse_port().
 
     '''
-    def __init__(self, port_obj=None, owner=None, *args, **kwargs):
+    __slots__ = ('_interfaces',)
+
+    def __init__(self, port_obj=None, owner=None, profile=None, *args,
+            **kwargs):
         '''CorbaPort constructor.
 
         @param port_obj The CORBA PortService object to wrap.
         @param owner The owner of this port. Should be a Component object or
                      None.
+        @param profile The port's profile, if it is already known.
 
         '''
-        super(CorbaPort, self).__init__(port_obj=port_obj, owner=owner,
-                                        *args, **kwargs)
         self._interfaces = None
+        super(CorbaPort, self).__init__(port_obj=port_obj, owner=owner,
+                                        profile=profile, *args, **kwargs)
 
     def connect(self, dests=None, name=None, id='', props={}):
         '''Connect this port to other CorbaPorts.
@@ -372,44 +386,42 @@ class CorbaPort(Port):
                 MismatchedPolarityError
 
         '''
-        with self._mutex:
-            # Corba ports can only connect to corba ports of the opposite
-            # polarity
+        # Corba ports can only connect to corba ports of the opposite
+        # polarity
+        for d in dests:
+            if not d.porttype == 'CorbaPort':
+                raise exceptions.WrongPortTypeError
+        # Check the interfaces and their respective polarities match
+        if self.interfaces:
             for d in dests:
-                if not d.porttype == 'CorbaPort':
-                    raise exceptions.WrongPortTypeError
-            # Check the interfaces and their respective polarities match
-            if self.interfaces:
-                for d in dests:
-                    if not d.interfaces:
-                        raise exceptions.MismatchedInterfacesError
-                for intf in self.interfaces:
-                    for d in dests:
-                        match = d.get_interface_by_instance_name(
-                                    intf.instance_name)
-                        if not match:
-                            raise exceptions.MismatchedInterfacesError
-                        if intf.polarity == match.polarity:
-                            # Polarity should be opposite
-                            raise exceptions.MismatchedPolarityError
-            else:
+                if not d.interfaces:
+                    raise exceptions.MismatchedInterfacesError
+            for intf in self.interfaces:
                 for d in dests:
-                    if d.interfaces:
+                    match = d.get_interface_by_instance_name(
+                                intf.instance_name)
+                    if not match:
                         raise exceptions.MismatchedInterfacesError
-            # Make the connection
-            new_props = props.copy()
-            if 'port.port_type' not in new_props:
-                new_props['port.port_type'] = 'CorbaPort'
-            super(CorbaPort, self).connect(dests=dests, name=name, id=id,
-                                           props=new_props)
+                    if intf.polarity == match.polarity:
+                        # Polarity should be opposite
+                        raise exceptions.MismatchedPolarityError
+        else:
+            for d in dests:
+                if d.interfaces:
+                    raise exceptions.MismatchedInterfacesError
+        # Make the connection
+        new_props = props.copy()
+        if 'port.port_type' not in new_props:
+            new_props['port.port_type'] = 'CorbaPort'
+        super(CorbaPort, self).connect(dests=dests, name=name, id=id,
+                                       props=new_props)
 
     def get_interface_by_instance_name(self, name):
         '''Get an interface of this port by instance name.'''
-        with self._mutex:
-            for intf in self.interfaces:
-                if intf.instance_name == name:
-                    return intf
-            return None
+        for intf in self.interfaces:
+            if intf.instance_name == name:
+                return intf
+        return None
 
     @property
     def interfaces(self):
@@ -421,12 +433,25 @@ class CorbaPort(Port):
         triggered).
 
         '''
+        with self._mutex:
+            if self._interfaces:
+                return self._interfaces
+        profile = self.object.get_port_profile()
+        interfaces = [SvcInterface(intf) for intf in profile.interfaces]
         with self._mutex:
             if not self._interfaces:
-                profile = self._obj.get_port_profile()
-                self._interfaces = [SvcInterface(intf) \
-                                    for intf in profile.interfaces]
-        return self._interfaces
+                self._interfaces = interfaces
+            return self._interfaces
+
+    def _parse(self, profile=None):
+        # The interfaces are part of the profile, so keep them while it is at
+        # hand.
+        if not profile:
+            profile = self.object.get_port_profile()
+        super(CorbaPort, self)._parse(profile)
+        interfaces = [SvcInterface(intf) for intf in profile.interfaces]
+        with self._mutex:
+            self._interfaces = interfaces
 
 
 ##############################################################################
@@ -434,6 +459,9 @@ class CorbaPort(Port):
 
 class SvcInterface(object):
     '''Object representing the interface used by a service port.'''
+    __slots__ = ('_instance_name', '_mutex', '_obj', '_polarity',
+            '_type_name')
+
     def __init__(self, intf_obj=None, *args, **kwargs):
         '''Constructor.
 
@@ -442,7 +470,7 @@ class SvcInterface(object):
         '''
         super(SvcInterface, self).__init__(*args, **kwargs)
         self._obj = intf_obj
-        self._mutex = threading.RLock()
+        self._mutex = locks.lock_for(self)
         self._parse()
 
     def polarity_as_string(self, add_colour=True):
@@ -514,6 +542,9 @@ class SvcInterface(object):
 
 class Connection(object):
     '''An object representing a connection between two or more ports.'''
+    __slots__ = ('_id', '_mutex', '_name', '_obj', '_owner', '_ports',
+            '_properties')
+
     def __init__(self, conn_profile_obj=None, owner=None, *args, **kwargs):
         '''Constructor.
 
@@ -526,7 +557,7 @@ class Connection(object):
         super(Connection, self).__init__(*args, **kwargs)
         self._obj = conn_profile_obj
         self._owner = owner
-        self._mutex = threading.RLock()
+        self._mutex = locks.lock_for(self)
         self._parse()
 
     def __str__(self):
@@ -535,21 +566,21 @@ class Connection(object):
 
     def disconnect(self):
         '''Disconnect this connection.'''
-        with self._mutex:
-            if not self.ports:
-                raise exceptions.NotConnectedError
-            # Some of the connection participants may not be in the tree,
-            # causing the port search in self.ports to return ('Unknown', None)
-            # for those participants. Search the list to find the first
-            # participant that is in the tree (there must be at least one).
-            p = self.ports[0][1]
-            ii = 1
-            while not p and ii < len(self.ports):
-                p = self.ports[ii][1]
-                ii += 1
-            if not p:
-                raise exceptions.UnknownConnectionOwnerError
-            p.object.disconnect(self.id)
+        ports = self.ports
+        if not ports:
+            raise exceptions.NotConnectedError
+        # Some of the connection participants may not be in the tree,
+        # causing the port search in self.ports to return ('Unknown', None)
+        # for those participants. Search the list to find the first
+        # participant that is in the tree (there must be at least one).
+        p = ports[0][1]
+        ii = 1
+        while not p and ii < len(ports):
+            p = ports[ii][1]
+            ii += 1
+        if not p:
+            raise exceptions.UnknownConnectionOwnerError
+        p.object.disconnect(self.id)
 
     def has_port(self, port):
         '''Return True if this connection involves the given Port object.
@@ -557,14 +588,13 @@ class Connection(object):
         @param port The Port object to search for in this connection's ports.
 
         '''
-        with self._mutex:
-            for p in self.ports:
-                if not p[1]:
-                    # Port owner not in tree, so unknown
-                    continue
-                if port.object._is_equivalent(p[1].object):
-                    return True
-            return False
+        for p in self.ports:
+            if not p[1]:
+                # Port owner not in tree, so unknown
+                continue
+            if port.object._is_equivalent(p[1].object):
+                return True
+        return False
 
     def reparse(self):
         '''Reparse the connection.'''
@@ -610,34 +640,36 @@ class Connection(object):
         triggered).
 
         '''
-        def has_port(node, args):
-            if node.get_port_by_ref(args):
-                return node
-            return None
-
+        with self._mutex:
+            if self._ports:
+                return self._ports
+            obj = self._obj
+            owner = self._owner
+        # The tree is searched without holding this connection's lock, which
+        # may be shared with the ports being searched.
+        comp = owner.owner if owner else None
+        ports = []
+        for p in obj.ports:
+            # My owner's owner is a component node in the tree
+            if comp:
+                port_owner = comp.root.find_first(
+                        lambda n: n.get_port_by_ref(p),
+                        filter=['is_component'])
+                if port_owner is None:
+                    ports.append(('Unknown', None))
+                else:
+                    port_owner_path = port_owner.full_path_str
+                    port_name = p.get_port_profile().name
+                    prefix = port_owner.instance_name + '.'
+                    if port_name.startswith(prefix):
+                        port_name = port_name[len(prefix):]
+                    ports.append((port_owner_path + ':' + port_name,
+                        parse_port(p, comp)))
+            else:
+                ports.append((p.get_port_profile().name, parse_port(p, None)))
         with self._mutex:
             if not self._ports:
-                self._ports = []
-                for p in self._obj.ports:
-                    # My owner's owner is a component node in the tree
-                    if self.owner and self.owner.owner:
-                        root = self.owner.owner.root
-                        owner_nodes = [n for n in root.iterate(has_port,
-                                args=p, filter=['is_component']) if n]
-                        if not owner_nodes:
-                            self._ports.append(('Unknown', None))
-                        else:
-                            port_owner = owner_nodes[0]
-                            port_owner_path = port_owner.full_path_str
-                            port_name = p.get_port_profile().name
-                            prefix = port_owner.instance_name + '.'
-                            if port_name.startswith(prefix):
-                                port_name = port_name[len(prefix):]
-                            self._ports.append((port_owner_path + ':' + \
-                                port_name, parse_port(p, self.owner.owner)))
-                    else:
-                        self._ports.append((p.get_port_profile().name,
-                                            parse_port(p, None)))
+                self._ports = ports
         return self._ports
 
     @property
@@ -655,4 +687,16 @@ class Connection(object):
             self._properties = utils.nvlist_to_dict(self._obj.properties)
 
 
+##############################################################################
+## Internal functions
+
+def _check_connection_prop(value, allowed):
+    # Check a connection property against the comma-separated list of values
+    # a port allows.
+    if value not in [x.strip() for x in allowed.split(',')] and \
+            'any' not in allowed.lower():
+        # Invalid property selected
+        raise exceptions.IncompatibleDataPortConnectionPropsError
+
+
 # vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
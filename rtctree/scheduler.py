@@ -0,0 +1,235 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Objects used to spread the remote calls made while parsing across a pool of
+worker threads.
+
+'''
+
+
+import collections
+from multiprocessing.pool import ThreadPool
+import threading
+
+from rtctree.deadline import limit_calls
+
+
+##############################################################################
+## Endpoint queue object
+
+class EndpointQueue(object):
+    '''Queues work by endpoint, and chooses what to start next.
+
+    Work is taken from the endpoints in turn, so all the processes in the
+    tree are worked on in parallel, and no more than a set number of items
+    are run against any one endpoint, or in total, at the same time.
+
+    The queue does no locking of its own. Its users hold their own lock
+    while calling it, and start the work it hands out on their own threads.
+
+    '''
+    def __init__(self, workers, per_endpoint=None):
+        '''Constructor.
+
+        @param workers The maximum number of items to run at the same time.
+        @param per_endpoint The maximum number of items to run at the same
+                            time against a single endpoint. If None, only
+                            @ref workers limits them. Items with no endpoint
+                            are only limited by @ref workers.
+
+        '''
+        super(EndpointQueue, self).__init__()
+        self._workers = workers
+        self._per_endpoint = per_endpoint
+        # Queued items for each endpoint, in the order the endpoints will be
+        # served in
+        self._queues = collections.OrderedDict()
+        self._running = {}
+        self._active = 0
+
+    def put(self, endpoint, item):
+        '''Queue an item of work for an endpoint.'''
+        if endpoint not in self._queues:
+            self._queues[endpoint] = collections.deque()
+        self._queues[endpoint].append(item)
+
+    def take(self):
+        '''Take the next item that can be started, counting it as running.
+
+        The endpoints are taken in turn, skipping those already running as
+        many items as they are allowed.
+
+        @return A tuple of (endpoint, item), or None if nothing can be started
+                until a running item is done.
+
+        '''
+        if self._active >= self._workers:
+            return None
+        for endpoint in list(self._queues.keys()):
+            if self._per_endpoint and endpoint is not None and \
+                    self._running.get(endpoint, 0) >= self._per_endpoint:
+                continue
+            # Move the endpoint to the back of the line
+            queue = self._queues.pop(endpoint)
+            item = queue.popleft()
+            if queue:
+                self._queues[endpoint] = queue
+            self._running[endpoint] = self._running.get(endpoint, 0) + 1
+            self._active += 1
+            return endpoint, item
+        # Every endpoint with queued items is at its limit
+        return None
+
+    def done(self, endpoint):
+        '''Count an item taken for an endpoint as no longer running.'''
+        self._active -= 1
+        self._running[endpoint] -= 1
+        if not self._running[endpoint]:
+            del self._running[endpoint]
+
+    def clear(self):
+        '''Drop the queued items.
+
+        @return The number of items dropped.
+
+        '''
+        dropped = sum([len(q) for q in self._queues.values()])
+        self._queues.clear()
+        return dropped
+
+    @property
+    def busy(self):
+        '''Are any items queued or running?'''
+        return bool(self._queues or self._active)
+
+
+##############################################################################
+## Parse scheduler object
+
+class ParseScheduler(object):
+    '''Runs parsing tasks on a bounded pool of worker threads.
+
+    Tasks may submit further tasks to the scheduler; for example, the task
+    that lists a naming context submits a task for each of its sub-contexts.
+    Tasks never wait on each other, so a small pool cannot deadlock. Use
+    @ref wait to block until every task, including those submitted by other
+    tasks, has finished.
+
+    Each task may be given the endpoint (host:port) of the process its remote
+    calls go to. Queued tasks are started taking the endpoints in turn, so
+    all the processes in the tree are worked on in parallel, and no more than
+    a set number of tasks are run against any one endpoint at the same time.
+    This keeps a single manager's ORB from being flooded with calls while
+    others sit idle.
+
+    If a task raises an exception, no further tasks are started and the
+    exception is raised from @ref wait once the running tasks have finished.
+
+    '''
+    def __init__(self, workers, per_endpoint=None, deadline=None):
+        '''Constructor.
+
+        @param workers The maximum number of tasks to run at the same time.
+        @param per_endpoint The maximum number of tasks to run at the same
+                            time against a single endpoint. If None, only
+                            @ref workers limits them.
+        @param deadline A Deadline whose call timeout limits the remote calls
+                        made by the tasks.
+
+        '''
+        self._pool = ThreadPool(workers)
+        self._deadline = deadline
+        self._cond = threading.Condition()
+        self._pending = 0
+        self._error = None
+        self._queue = EndpointQueue(workers, per_endpoint)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        '''Stop the worker threads once all submitted tasks have finished.'''
+        self._pool.close()
+        self._pool.join()
+
+    def submit(self, func, *args):
+        '''Run func(*args) on a worker thread.'''
+        self.submit_to(None, func, *args)
+
+    def submit_to(self, endpoint, func, *args):
+        '''Run func(*args) on a worker thread, counting it against the limit
+        for an endpoint.
+
+        @param endpoint The endpoint the task's remote calls go to, or None
+                        if it is not known.
+
+        '''
+        with self._cond:
+            if self._error:
+                return
+            self._pending += 1
+            self._queue.put(endpoint, (func, args))
+            self._dispatch()
+
+    def wait(self):
+        '''Wait for all submitted tasks to finish.
+
+        @raises The first exception raised by a task, if any.
+
+        '''
+        with self._cond:
+            while self._pending:
+                self._cond.wait()
+            error = self._error
+            self._error = None
+        if error:
+            raise error
+
+    def _dispatch(self):
+        # Start queued tasks while there are free workers. Must be called with
+        # _cond held.
+        while True:
+            task = self._queue.take()
+            if task is None:
+                return
+            endpoint, (func, args) = task
+            self._pool.apply_async(self._run, (endpoint, func, args))
+
+    def _run(self, endpoint, func, args):
+        # Run a task, recording the first failure.
+        try:
+            with limit_calls(self._deadline):
+                func(*args)
+        except Exception as e:
+            with self._cond:
+                if not self._error:
+                    self._error = e
+        finally:
+            with self._cond:
+                self._queue.done(endpoint)
+                self._pending -= 1
+                if self._error:
+                    # Drop the tasks that have not been started
+                    self._pending -= self._queue.clear()
+                else:
+                    self._dispatch()
+                if not self._pending:
+                    self._cond.notify_all()
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
@@ -0,0 +1,195 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Functions for parsing name servers in several processes at once.
+
+The top-level naming contexts of each name server are shared out between a
+pool of worker processes. Each worker parses its contexts with its own ORB,
+and sends each subtree back as a snapshot record (names, IORs and profiles),
+which is restored into the tree without further remote calls. Objects bound
+directly in the root context of a name server are resolved by the calling
+process.
+
+'''
+
+
+import multiprocessing
+
+import CosNaming
+
+from rtctree import exceptions
+from rtctree import snapshot
+from rtctree.deadline import Deadline, limit_calls
+from rtctree.directory import Directory, corba_name_to_string
+from rtctree.endpoints import EndpointCache
+from rtctree.nameserver import NameServer
+from rtctree.orbregistry import ORBRegistry
+
+
+##############################################################################
+## API functions
+
+def parse_servers(root, orb, servers, filter, processes, orb_args=[],
+        deadline=None, call_timeout=None, dead_endpoints=None,
+        dynamic=False, **kwargs):
+    '''Parse name servers below a root node using a pool of processes.
+
+    Each name server node is added to the root node as soon as its root
+    context has been listed. Its top-level contexts are pending until the
+    worker parsing them has finished. An error in a worker only affects the
+    context it was parsing: that context is left pending, and is listed in
+    the calling process when it is first used, raising the error again if
+    it persists. Errors listing the root contexts are raised.
+
+    Worker processes are started afresh rather than forked, because an ORB
+    cannot be used after a fork. A script using this must therefore protect
+    its main code with "if __name__ == '__main__':". Where processes can
+    only be forked, as on Python 2, this raises ProcessesNotSupportedError;
+    see @ref check_processes.
+
+    @param root The root node to add the name servers to.
+    @param orb The ORB used by the calling process.
+    @param servers A list of name server addresses.
+    @param filter A PathFilter restricting what is parsed, starting at the
+                  root node.
+    @param processes The number of worker processes to use.
+    @param orb_args The arguments to start each worker's ORB with.
+    @param deadline A Deadline limiting the time spent parsing. Each worker is
+                    given the time remaining when the pool starts.
+    @param call_timeout The timeout, in seconds, for remote calls made by the
+                        workers.
+    @param dead_endpoints An EndpointCache used for the objects resolved by
+                          the calling process. Each worker uses its own.
+    @param dynamic Enable dynamic features on the restored nodes.
+    @param kwargs Parsing settings such as concurrency, lazy, names_only and
+                  trust_kinds, used by the workers and given to the restored
+                  directories.
+    @raises ProcessesNotSupportedError
+
+    '''
+    check_processes(processes)
+    shards = []
+    for address in servers:
+        ns_filter = filter.descend(['/', address])
+        if ns_filter is None:
+            continue
+        ns = NameServer(orb, address, root, parse=False, dynamic=dynamic,
+                deadline=deadline, dead_endpoints=dead_endpoints, **kwargs)
+        root._add_child(ns)
+        shards += _split_server(ns, orb, ns_filter)
+    if not shards:
+        return
+    budget = deadline.remaining if deadline else None
+    tasks = [(subdir.parent.name, [(nc.id, nc.kind) for nc in binding_name],
+        subdir_filter, budget, call_timeout, orb_args, kwargs)
+        for subdir, binding_name, subdir_filter in shards]
+    pool = _context().Pool(min(processes, len(tasks)))
+    try:
+        for (subdir, binding_name, subdir_filter), (ok, result) in \
+                zip(shards, pool.imap(_try_parse_shard, tasks)):
+            if not ok:
+                # Leave the directory pending
+                continue
+            parent = subdir.parent
+            parent._add_child(snapshot.from_record(snapshot.loads(result),
+                parent, orb, restored=False, dynamic=dynamic, **kwargs))
+    except:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    pool.join()
+
+
+def check_processes(processes):
+    '''Check that name servers can be parsed with a number of processes.
+
+    A forked worker would inherit the running ORB of the calling process,
+    which cannot be used after a fork, so workers must be started afresh.
+    Python 2 cannot do that.
+
+    @param processes The number of processes to parse with.
+    @raises ProcessesNotSupportedError if processes is greater than 1 and
+            fresh worker processes cannot be started.
+
+    '''
+    if processes > 1 and not hasattr(multiprocessing, 'get_context'):
+        raise exceptions.ProcessesNotSupportedError(processes)
+
+
+##############################################################################
+## Internal functions
+
+def _context():
+    # Get the multiprocessing context that starts fresh processes.
+    return multiprocessing.get_context('spawn')
+
+
+def _split_server(ns, orb, filter):
+    # List the root context of a name server. Objects are resolved here; each
+    # context is added as a pending directory to keep the order of the
+    # bindings, and returned with its binding name and filter to be parsed by
+    # a worker.
+    shards = []
+    context = ns.context
+    for binding in ns._list_bindings(context):
+        name = corba_name_to_string(binding.binding_name)
+        subdir_filter = filter.child(name)
+        if binding.binding_type != CosNaming.ncontext or \
+                subdir_filter is None:
+            ns._process_binding(binding, orb, filter)
+            continue
+        subdir = ns._make_subdir(name, subdir_filter)
+        subdir._defer_context(binding.binding_name, orb, subdir_filter)
+        ns._add_child(subdir)
+        shards.append((subdir, binding.binding_name, subdir_filter))
+    return shards
+
+
+def _try_parse_shard(task):
+    # Parse a shard, returning (True, record) if it worked, or (False, None)
+    # if not. The error is not sent back, as it may not be possible to pickle
+    # it; the pending directory meets it again when it is listed.
+    try:
+        return True, _parse_shard(task)
+    except Exception:
+        return False, None
+
+
+def _parse_shard(task):
+    # Parse one top-level context of a name server in a worker process, and
+    # return the subtree as a JSON snapshot record.
+    address, binding_name, filter, budget, call_timeout, orb_args, \
+            settings = task
+    registry = ORBRegistry()
+    orb, poa = registry.acquire(orb_args)
+    deadline = Deadline(budget, call_timeout)
+    try:
+        ns = NameServer(orb, address, None, parse=False)
+        binding = CosNaming.Binding([CosNaming.NameComponent(str(id),
+            str(kind)) for id, kind in binding_name], CosNaming.ncontext)
+        subdir = Directory(corba_name_to_string(binding.binding_name), ns,
+                deadline=deadline, dead_endpoints=EndpointCache(), **settings)
+        ns._add_child(subdir)
+        with limit_calls(deadline):
+            # Connect to the name server to resolve the context from
+            ns.context
+            ns._parse_subdir(subdir, binding, orb, filter)
+        return snapshot.dumps(snapshot.to_record(subdir))
+    finally:
+        registry.release(orb)
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
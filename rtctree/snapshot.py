@@ -0,0 +1,519 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Functions for saving a parsed tree to a file and restoring it again.
+
+A snapshot records the type and name of every node, the IOR of every object,
+and whatever profiles, ports and connections have already been retrieved. A
+tree restored from a snapshot is built without any remote calls; objects are
+only contacted when their nodes are used, or when the tree is validated.
+
+'''
+
+
+import base64
+import json
+import os
+import re
+import threading
+
+import CosNaming
+import omniORB
+import omniORB.any
+from omniORB import CORBA, TRANSIENT_ConnectFailed
+
+from rtctree import exceptions
+from rtctree import utils
+from rtctree import RTCTREE_VERSION
+from rtctree.component import Component
+from rtctree.directory import Directory
+from rtctree.manager import Manager
+from rtctree.nameserver import NameServer
+from rtctree.placeholder import Placeholder
+from rtctree.ports import Connection, parse_port
+from rtctree.rtc import RTC
+from rtctree.rtc import RTM
+from rtctree.unknown import Unknown
+from rtctree.zombie import Zombie
+
+
+## Version of the snapshot file format.
+SNAPSHOT_FORMAT = 1
+
+
+##############################################################################
+## API functions
+
+def save(root, filename, ports=False):
+    '''Save the tree below a node to a snapshot file.
+
+    Only information that has already been retrieved is saved, so saving does
+    not make any remote calls unless @ref ports is True.
+
+    @param root The root node of the tree to save.
+    @param filename The name of the file to write. It is replaced atomically.
+    @param ports If True, the ports and connections of every component are
+                 retrieved, if they have not been already, so that they are
+                 included in the snapshot.
+    @raises TypeError if a property value cannot be stored in a CORBA any.
+
+    '''
+    orb = _find_orb(root)
+    servers = [_save_node(ns, orb, ports) for ns in root.children]
+    data = {'format': SNAPSHOT_FORMAT, 'version': RTCTREE_VERSION,
+            'servers': servers}
+    # Encode before opening the file so that a failure leaves nothing behind.
+    text = dumps(data)
+    tmp_name = filename + '.tmp'
+    with open(tmp_name, 'w') as f:
+        f.write(text)
+    if os.name == 'nt' and os.path.exists(filename):
+        os.remove(filename)
+    os.rename(tmp_name, filename)
+
+
+def load(root, filename, orb, **kwargs):
+    '''Restore the name servers in a snapshot file below a root node.
+
+    No remote calls are made. Name servers already present below the root
+    node are not restored.
+
+    @param root The root node to add the name servers to.
+    @param filename The name of the snapshot file to read.
+    @param orb The ORB used to turn IORs back into object references.
+    @param kwargs Settings such as dynamic or lazy to give the restored
+                  directory nodes.
+    @raises InvalidSnapshotError
+
+    '''
+    try:
+        with open(filename, 'r') as f:
+            data = loads(f.read())
+    except (IOError, ValueError) as e:
+        raise exceptions.InvalidSnapshotError(filename, e)
+    if data.get('format') != SNAPSHOT_FORMAT:
+        raise exceptions.InvalidSnapshotError(filename,
+                'unsupported format {0}'.format(data.get('format')))
+    for record in data['servers']:
+        if record['name'] in root.children_names:
+            continue
+        root._add_child(_restore_node(record, root, orb, kwargs))
+
+
+def to_record(node, ports=False):
+    '''Describe a node and the tree below it in a JSON-compatible record.
+
+    This is the form in which each node is written to a snapshot file. No
+    remote calls are made unless @ref ports is True.
+
+    @param node The node to describe.
+    @param ports If True, the ports and connections of every component are
+                 retrieved, if they have not been already.
+    @return A dictionary.
+
+    '''
+    return _save_node(node, node.orb, ports)
+
+
+def from_record(record, parent, orb, restored=True, **kwargs):
+    '''Create the node described by a record, and the tree below it.
+
+    No remote calls are made.
+
+    @param record A record made by @ref to_record.
+    @param parent The node to make the new node's parent. The new node is
+                  not added to it.
+    @param orb The ORB used to turn IORs back into object references.
+    @param restored If True, the directories are treated as restored from a
+                    snapshot: each lists its naming context again the first
+                    time a child it does not have is looked up. Pass False if
+                    the record is known to be up to date.
+    @param kwargs Settings such as dynamic or lazy to give the directory
+                  nodes.
+    @return The new node.
+
+    '''
+    return _restore_node(record, parent, orb, kwargs, restored)
+
+
+def dumps(data):
+    '''Encode a record, or a structure of records, as JSON text.
+
+    Property values that JSON cannot hold, such as CORBA structures and
+    enumerations, are stored as CDR-encoded anys so that they are restored
+    unchanged.
+
+    @param data The record to encode.
+    @return The JSON text.
+    @raises TypeError if a value cannot be stored in a CORBA any.
+
+    '''
+    return json.dumps(data, default=_encode_value)
+
+
+def loads(text):
+    '''Decode JSON text made by @ref dumps.
+
+    @param text The JSON text.
+    @return The decoded record.
+    @raises ValueError if the text is not valid JSON.
+
+    '''
+    return json.loads(text, object_hook=_decode_value)
+
+
+def validate(root, background=False):
+    '''Check that the objects of the nodes below a node still exist.
+
+    Each component, manager and unknown object is pinged with
+    _non_existent(). When an object has gone, its binding is resolved again
+    from the naming context of its directory, so a component restarted under
+    the same name since the snapshot was taken replaces the old node. Nodes
+    whose names are no longer bound to a live object are replaced by Zombie
+    nodes. Directories are not re-listed; a restored directory re-lists its
+    naming context by itself the first time a path that is not in it is
+    looked up.
+
+    @param root The node to start validating from.
+    @param background If True, validate in a daemon thread and return that
+                      thread immediately.
+    @return The validation thread if background is True, otherwise None.
+
+    '''
+    if background:
+        t = threading.Thread(target=_validate, args=(root,))
+        t.daemon = True
+        t.start()
+        return t
+    _validate(root)
+
+
+##############################################################################
+## Encoding
+
+## Key of the JSON object that holds a value JSON cannot represent.
+_ANY_KEY = '__any__'
+
+## Key of the JSON object that holds a regular expression in a path filter.
+_PATTERN_KEY = 're'
+
+
+def _encode_value(value):
+    # Store a value that JSON cannot hold as a CDR-encoded any.
+    try:
+        encoded = omniORB.cdrMarshal(CORBA._tc_any,
+                omniORB.any.to_any(value))
+    except (CORBA.BAD_PARAM, TypeError, ValueError):
+        raise TypeError('{0!r} cannot be saved in a snapshot'.format(value))
+    return {_ANY_KEY: base64.b64encode(encoded).decode('ascii')}
+
+
+def _decode_value(obj):
+    # Restore a value stored by _encode_value.
+    if len(obj) == 1 and _ANY_KEY in obj:
+        try:
+            encoded = base64.b64decode(obj[_ANY_KEY].encode('ascii'))
+            return omniORB.cdrUnmarshal(CORBA._tc_any, encoded).value()
+        except (CORBA.SystemException, TypeError, ValueError) as e:
+            raise ValueError('bad encoded value: {0}'.format(e))
+    return obj
+
+
+##############################################################################
+## Saving
+
+def _find_orb(root):
+    # Get the ORB from the first name server below the root node.
+    for ns in root.children:
+        if ns.is_nameserver:
+            return ns.orb
+    return None
+
+
+def _object_to_string(orb, obj):
+    if obj is None or CORBA.is_nil(obj):
+        return None
+    return orb.object_to_string(obj)
+
+
+def _save_node(node, orb, ports):
+    # Build the record for a node and, recursively, its children.
+    record = {'name': node.name}
+    if node.is_nameserver:
+        record['type'] = 'nameserver'
+    elif node.is_manager:
+        record['type'] = 'manager'
+        record['ior'] = _object_to_string(orb, node.object)
+        with node._mutex:
+            record['profile'] = node._profile
+            record['configuration'] = node._configuration
+    elif node.is_directory:
+        record['type'] = 'directory'
+    elif node.is_component:
+        record['type'] = 'component'
+        record['ior'] = _object_to_string(orb, node.object)
+        record.update(_save_component(node, orb, ports))
+    elif node.is_zombie:
+        record['type'] = 'zombie'
+    elif node.is_placeholder:
+        record['type'] = 'placeholder'
+        record['id'] = node.binding.binding_name[0].id
+        record['kind'] = node.kind
+    else:
+        record['type'] = 'unknown'
+        record['ior'] = _object_to_string(orb, node.object)
+    if node.is_directory and not node.is_manager:
+        with node._mutex:
+            if node._deferred and not node._context:
+                # A lazy directory whose context was never resolved.
+                record['binding'] = [{'id': nc.id, 'kind': nc.kind}
+                        for nc in node._deferred[0]]
+            else:
+                record['ior'] = _object_to_string(orb, node._context)
+            record['expanded'] = not node._deferred
+            if node._deferred:
+                record['filter'] = _save_filter(node._deferred[2])
+    if node.is_directory:
+        with node._mutex:
+            children = list(node._children.values())
+        record['children'] = [_save_node(c, orb, ports) for c in children]
+    return record
+
+
+def _save_filter(filter):
+    # Describe the filter a lazy directory will be parsed with as a list of
+    # paths, with each pattern given by its regular expression. None means
+    # that nothing is filtered.
+    if filter.passes_all:
+        return None
+    return [[{_PATTERN_KEY: e.pattern} if hasattr(e, 'match') else e
+        for e in path] for path in filter.paths()]
+
+
+def _save_component(comp, orb, ports):
+    # Build the parts of a component's record that hold its cached profile,
+    # ports and connections.
+    record = {}
+    with comp._mutex:
+        if comp._profile_parsed:
+            record['profile'] = {'instance_name': comp._instance_name,
+                    'type_name': comp._type_name,
+                    'description': comp._description,
+                    'version': comp._version,
+                    'vendor': comp._vendor,
+                    'category': comp._category,
+                    'parent': comp._parent_obj,
+                    'properties': comp._properties}
+        port_list = comp._ports
+    if ports:
+        # Retrieving the ports makes remote calls
+        port_list = comp.ports
+    if port_list is None:
+        return record
+    record['ports'] = []
+    for p in port_list:
+        # A port's lock is taken from the pool, so it is only held while the
+        # cached fields are copied. Getting the connections makes remote
+        # calls, and the interfaces and connections take their own locks.
+        with p._mutex:
+            obj = p._obj
+            port_record = {'name': p._name, 'properties': p._properties}
+            interfaces = getattr(p, '_interfaces', None)
+            conns = p._connections
+        port_record['ior'] = _object_to_string(orb, obj)
+        if p.porttype == 'CorbaPort':
+            port_record['interfaces'] = [{'instance_name': i.instance_name,
+                'type_name': i.type_name,
+                'polarity': 'provided' if i.polarity == i.PROVIDED \
+                        else 'required'} for i in interfaces or []]
+        if ports:
+            conns = p.connections
+        if conns is not None:
+            port_record['connections'] = [{'name': c.name, 'id': c.id,
+                'properties': c.properties,
+                'ports': [_object_to_string(orb, po) for po in c._obj.ports]}
+                for c in conns]
+        record['ports'].append(port_record)
+    return record
+
+
+##############################################################################
+## Restoring
+
+class _Record(object):
+    # Stands in for the CORBA profile structures when restoring ports and
+    # connections.
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def _string_to_object(orb, ior, obj_type=None):
+    if not ior:
+        return None
+    obj = orb.string_to_object(ior)
+    if obj_type:
+        # The type was known when the snapshot was taken; trust it rather
+        # than making a remote call.
+        obj = obj._unchecked_narrow(obj_type)
+    return obj
+
+
+def _restore_node(record, parent, orb, settings, restored=True):
+    # Create the node for a record and, recursively, its children.
+    name = record['name']
+    node_type = record['type']
+    dynamic = settings.get('dynamic', False)
+    if node_type == 'nameserver':
+        node = NameServer(orb, name, parent, parse=False, **settings)
+        _restore_directory(node, record, orb, settings, restored)
+    elif node_type == 'directory':
+        node = Directory(name, parent, **settings)
+        _restore_directory(node, record, orb, settings, restored)
+    elif node_type == 'manager':
+        node = Manager(name, parent,
+                _string_to_object(orb, record['ior'], RTM.Manager),
+                parse=False, dynamic=dynamic)
+        with node._mutex:
+            node._profile = record.get('profile')
+            node._configuration = record.get('configuration')
+        for c in record.get('children', []):
+            node._add_child(_restore_node(c, node, orb, settings, restored))
+    elif node_type == 'component':
+        node = Component(name, parent,
+                _string_to_object(orb, record['ior'], RTC.RTObject),
+                defer_profile=True, dynamic=dynamic)
+        _restore_component(node, record, orb)
+    elif node_type == 'zombie':
+        node = Zombie(name, parent)
+    elif node_type == 'placeholder':
+        binding = CosNaming.Binding([CosNaming.NameComponent(
+            str(record['id']), str(record['kind']))], CosNaming.nobject)
+        node = Placeholder(name, parent, binding)
+    else:
+        node = Unknown(name, parent,
+                _string_to_object(orb, record.get('ior')))
+    return node
+
+
+def _restore_directory(node, record, orb, settings, restored):
+    # Restore a directory's context and children. A directory that had not
+    # been listed is listed with the filter it would have been parsed with.
+    filter = _restore_filter(record.get('filter'))
+    with node._mutex:
+        node._orb = orb
+        if 'binding' in record:
+            node._defer_context([CosNaming.NameComponent(str(nc['id']),
+                str(nc['kind'])) for nc in record['binding']], orb, filter)
+        else:
+            node._context = _string_to_object(orb, record.get('ior'),
+                    CosNaming.NamingContext)
+            if not record.get('expanded', True):
+                node._defer_context(None, orb, filter)
+        node._restored = restored
+    for c in record.get('children', []):
+        node._add_child(_restore_node(c, node, orb, settings, restored))
+
+
+def _restore_filter(paths):
+    # Rebuild the list of paths saved by _save_filter.
+    if paths is None:
+        return []
+    return [[re.compile(e[_PATTERN_KEY]) if isinstance(e, dict) else str(e)
+        for e in path] for path in paths]
+
+
+def _restore_component(comp, record, orb):
+    # Restore a component's cached profile, ports and connections.
+    profile = record.get('profile')
+    if profile:
+        with comp._mutex:
+            comp._instance_name = profile['instance_name']
+            comp._type_name = profile['type_name']
+            comp._description = profile['description']
+            comp._version = profile['version']
+            comp._vendor = profile['vendor']
+            comp._category = profile['category']
+            comp._parent_obj = profile['parent']
+            comp._properties = profile['properties']
+            comp._profile_parsed = True
+    if 'ports' not in record:
+        return
+    port_list = []
+    for p in record['ports']:
+        interfaces = [_Record(instance_name=i['instance_name'],
+            type_name=i['type_name'],
+            polarity=RTC.PROVIDED if i['polarity'] == 'provided' \
+                    else RTC.REQUIRED) for i in p.get('interfaces', [])]
+        port_profile = _Record(name=p['name'],
+                properties=utils.dict_to_nvlist(p['properties']),
+                interfaces=interfaces)
+        port = parse_port(_string_to_object(orb, p['ior'], RTC.PortService),
+                comp, port_profile)
+        if 'connections' in p:
+            conns = []
+            for c in p['connections']:
+                cp = _Record(name=c['name'], connector_id=c['id'],
+                        properties=utils.dict_to_nvlist(c['properties']),
+                        ports=[_string_to_object(orb, ior, RTC.PortService)
+                            for ior in c['ports']])
+                conns.append(Connection(cp, port))
+            with port._mutex:
+                port._connections = conns
+        port_list.append(port)
+    with comp._mutex:
+        comp._ports = port_list
+
+
+##############################################################################
+## Validation
+
+def _object_exists(obj):
+    # Ping an object. Objects that cannot be reached are treated as gone.
+    try:
+        return not obj._non_existent()
+    except CORBA.OBJECT_NOT_EXIST:
+        return False
+    except CORBA.TRANSIENT as e:
+        if e.args[0] == TRANSIENT_ConnectFailed:
+            return False
+        raise
+
+
+def _validate(node):
+    with node._mutex:
+        children = list(node._children.values())
+    for child in children:
+        if child.is_component or child.is_manager or child.is_unknown:
+            if child.object is None or not _object_exists(child.object):
+                child = _rebind(node, child)
+                if child is None:
+                    continue
+        _validate(child)
+
+
+def _rebind(node, child):
+    # Replace a child whose object has gone with a node for the object now
+    # bound to its name, if that object exists, or with a zombie. Returns the
+    # new node if it is live.
+    if isinstance(node, Directory):
+        new = node._rebind_child(child)
+        if new is not None and not new.is_zombie:
+            if new.object is not None and _object_exists(new.object):
+                return new
+    node._add_child(Zombie(child.name, node))
+    return None
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
@@ -18,20 +18,30 @@ of name servers, directories, managers and components.
 
 '''
 
-import copy
+from multiprocessing.pool import ThreadPool
 import os
 import sys
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 from omniORB import CORBA
 
 from rtctree import exceptions
 from rtctree import NAMESERVERS_ENV_VAR, ORB_ARGS_ENV_VAR
-from rtctree import utils
+from rtctree.deadline import Deadline, limit_calls
+from rtctree.endpoints import EndpointCache
 from rtctree.node import TreeNode
 from rtctree.directory import Directory
 from rtctree.nameserver import NameServer
+from rtctree.orbregistry import ORBRegistry
+from rtctree.pathfilter import compile_filter
 from rtctree.manager import Manager
 from rtctree.component import Component
+import rtctree.sharding
+import rtctree.snapshot
 
 
 ##############################################################################
@@ -102,7 +112,11 @@ class RTCTree(object):
     -15
     '''
     def __init__(self, servers=None, paths=None, orb=None, filter=[],
-            dynamic=False, *args, **kwargs):
+            dynamic=False, workers=1, concurrency=1, lazy=False,
+            defer_profiles=False, names_only=False, trust_kinds=False,
+            snapshot=None, budget=None, call_timeout=None,
+            dead_endpoints=None, endpoint_concurrency=None, parse=True,
+            shared_orb=True, processes=1, *args, **kwargs):
         '''Constructor.
 
         @param servers A list of servers to parse into the tree.
@@ -115,43 +129,191 @@ class RTCTree(object):
                       be parsed, to increase speed. If the tail of a
                       path is a directory, that entire directory will be
                       parsed. Directories that are not the tail will
-                      only have the next entry in the path parsed.
+                      only have the next entry in the path parsed. Path
+                      elements may be glob patterns such as '*.host_cxt',
+                      compiled regular expressions, or '**' to match any
+                      number of levels; see rtctree.pathfilter.PathFilter.
+                      Objects that do not match are never resolved.
         @param dynamic Use observers to keep the tree up-to-date. For example,
                        when a component changes state, an observer can notify
                        RTCTree so that the corresponding object in the tree can
                        be updated. Currently this only affects components.
-        @raises NonRootPathError
+        @param workers The maximum number of name servers to parse at the same
+                       time. Each name server is parsed in a worker thread and
+                       attached to the tree as soon as it is complete, so the
+                       time taken to build the tree follows the slowest server
+                       rather than the sum of all of them. The default of 1
+                       parses the servers one after the other.
+        @param concurrency The maximum number of naming contexts to list and
+                           resolve at the same time within each name server.
+                           The default of 1 walks each name server
+                           depth-first, one context at a time.
+        @param lazy If True, naming contexts are only listed, and the objects
+                    in them resolved, when they are first needed, for example
+                    by @ref get_node, @ref has_path or @ref iterate. Getting a
+                    node by path then only makes remote calls for the
+                    directories along that path.
+        @param defer_profiles If True, component nodes are created without
+                              contacting the components, so each component
+                              costs one resolve on the name server. A
+                              component's profile is fetched the first time
+                              it is used. Components that no longer exist are
+                              not detected until then: using the profile
+                              raises the CORBA error, and the component's
+                              node is replaced by a Zombie node.
+        @param names_only If True, the tree is built only from the names and
+                          kinds of the bindings in each naming context.
+                          Objects are not resolved; each is represented by a
+                          Placeholder node, which can be upgraded to a
+                          Component, Manager or other node when it is needed
+                          using @ref upgrade or Placeholder.upgrade.
+        @param trust_kinds If True, the kind of each binding ('rtc', 'mgr' or a
+                           naming context) is trusted to give the type of its
+                           object, and object references are narrowed without
+                           the checking is_a call. This saves one round trip
+                           for every component, manager and naming context
+                           below the root context of each name server. An
+                           object's type is checked only if the first call on
+                           it fails because the object does not support it.
+        @param snapshot The name of a snapshot file saved by
+                        @ref save_snapshot. If the file exists, the name
+                        servers in it are restored without contacting them,
+                        and are not parsed again. Restored nodes are checked
+                        when they are used; see @ref validate. If the file
+                        does not exist, the tree is built as normal.
+        @param budget The maximum time, in seconds, to spend building the
+                      tree. When it runs out, the constructor returns a
+                      partial tree: naming contexts not yet listed are left
+                      pending, to be listed when they are first used, and
+                      objects not yet resolved are represented by
+                      Placeholder nodes. Check a node's is_pending and
+                      timed_out properties to see what was not finished.
+                      Each remote call is limited to the time left in the
+                      budget, as well as by @ref call_timeout.
+        @param call_timeout The maximum time, in seconds, to wait for a single
+                            remote call or connection. A context or object
+                            whose call times out is left pending and marked
+                            as timed out, rather than stopping the parse.
+                            The timeout applies only to the threads parsing
+                            the tree, and only while the tree is built; later
+                            calls, and calls made by other trees, are not
+                            affected. If not given, calls are only limited
+                            by the time left in @ref budget.
+        @param dead_endpoints An EndpointCache to record unreachable
+                              endpoints in. Once connecting to one object at
+                              an endpoint (host and port) has failed, the
+                              other objects at the same endpoint are made
+                              into zombies without trying to connect to them.
+                              If not given, a new cache is used while the
+                              tree is constructed, then discarded. Pass a
+                              cache with a time to live to keep the
+                              knowledge between trees; if it has a file name,
+                              it is saved once the tree is constructed.
+        @param endpoint_concurrency When @ref concurrency is greater than 1,
+                                    the maximum number of remote calls made
+                                    at the same time to any one endpoint.
+                                    Components are then contacted from the
+                                    worker pool, grouped by the endpoint in
+                                    their IORs, and the endpoints are taken
+                                    in turn, so that every manager process is
+                                    worked on in parallel without flooding
+                                    any one of them. The name server counts
+                                    as an endpoint too. If None, only
+                                    @ref concurrency limits the calls.
+        @param parse If False, no name servers are parsed, not even those in
+                     the environment. Use @ref iter_parse or
+                     @ref add_name_server to fill in the tree.
+        @param shared_orb If True and no ORB is given, the tree uses the
+                          process-wide ORB held by
+                          rtctree.orbregistry.ORBRegistry, starting it if it
+                          is not running yet. Trees then start without
+                          initialising an ORB and share the connections
+                          already made. If False, the tree initialises and
+                          activates its own ORB, and shuts it down when the
+                          tree is deleted.
+        @param processes The number of worker processes to parse name
+                         servers with. If greater than 1, the top-level
+                         naming contexts of all the name servers are parsed
+                         in a pool of processes, each with its own ORB, and
+                         the subtrees are sent back and merged into this
+                         tree. This spreads the work of big deployments over
+                         several CPUs. The other parsing settings apply
+                         within each worker. Not used by @ref iter_parse. See
+                         rtctree.sharding. Not available on Python 2.
+        @raises NonRootPathError, InvalidSnapshotError,
+                ProcessesNotSupportedError
 
         '''
         super(RTCTree, self).__init__()
+        rtctree.sharding.check_processes(processes)
         self._root = TreeNode('/', None, dynamic=dynamic)
-        self._create_orb(orb)
+        self._create_orb(orb, shared_orb)
         self._dynamic = dynamic
-        if servers:
-            self._parse_name_servers(servers, filter=filter, dynamic=dynamic)
-        if paths:
-            if type(paths[0]) == str:
-                if paths[0][0] != '/':
-                    raise exceptions.NonRootPathError(paths[0])
-                if len(paths) > 1:
-                    self.add_name_server(paths[1], filter=filter,
-                            dynamic=dynamic)
-            else:
-                for p in paths:
-                    if p[0] != '/':
-                        raise exceptions.NonRootPathError(p)
-                    if len(p) > 1:
-                        self.add_name_server(p[1], filter=filter,
-                                dynamic=dynamic)
-            self.load_servers_from_env(filter=filter, dynamic=dynamic)
-        if not servers and not paths:
-            self.load_servers_from_env(filter=filter, dynamic=dynamic)
+        self._workers = workers
+        self._concurrency = concurrency
+        self._lazy = lazy
+        self._defer_profiles = defer_profiles
+        self._names_only = names_only
+        self._trust_kinds = trust_kinds
+        self._endpoint_concurrency = endpoint_concurrency
+        self._processes = processes
+        self._call_timeout = None
+        self._deadline = None
+        if dead_endpoints is None:
+            self._dead_endpoints = EndpointCache()
+        else:
+            self._dead_endpoints = dead_endpoints
+        if budget is not None or call_timeout is not None:
+            self._deadline = Deadline(budget, call_timeout)
+            self._call_timeout = call_timeout
+        if snapshot and os.path.exists(snapshot):
+            rtctree.snapshot.load(self._root, snapshot, self._orb,
+                    dynamic=dynamic, concurrency=concurrency, lazy=lazy,
+                    defer_profiles=defer_profiles, names_only=names_only,
+                    trust_kinds=trust_kinds)
+        if not parse:
+            servers = paths = None
+        with limit_calls(self._deadline):
+            if servers:
+                self._parse_name_servers(servers, filter=filter,
+                        dynamic=dynamic)
+            if paths:
+                if type(paths[0]) == str:
+                    if paths[0][0] != '/':
+                        raise exceptions.NonRootPathError(paths[0])
+                    path_servers = paths[1:2]
+                else:
+                    path_servers = []
+                    for p in paths:
+                        if p[0] != '/':
+                            raise exceptions.NonRootPathError(p)
+                        if len(p) > 1:
+                            path_servers.append(p[1])
+                self._parse_name_servers(path_servers, filter=filter,
+                        dynamic=dynamic)
+                self.load_servers_from_env(filter=filter, dynamic=dynamic)
+            if parse and not servers and not paths:
+                self.load_servers_from_env(filter=filter, dynamic=dynamic)
+        if self._deadline:
+            # Anything left pending is parsed without a time limit when it is
+            # used.
+            self._deadline.clear()
+        if dead_endpoints is None:
+            # Objects may be restarted at the same endpoints before the tree
+            # is next reparsed.
+            self._dead_endpoints.close()
+        else:
+            self._dead_endpoints.save()
 
     def __del__(self):
-        # Destructor to ensure the ORB shuts down correctly.
+        # Destructor to ensure the ORB shuts down correctly. The shared ORB is
+        # only released; the registry decides when to shut it down.
         if self._orb_is_mine:
-            self._orb.shutdown(wait_for_completion=CORBA.FALSE)
-            self._orb.destroy()
+            if self._orb_is_shared:
+                ORBRegistry().release(self._orb)
+            else:
+                self._orb.shutdown(wait_for_completion=CORBA.FALSE)
+                self._orb.destroy()
 
     def __str__(self):
         # Get a (potentially very large) string describing the tree.
@@ -176,6 +338,19 @@ class RTCTree(object):
             dynamic = self._dynamic
         self._parse_name_server(server, filter, dynamic=dynamic)
 
+    def find_first(self, predicate, filter=[], prune=None,
+            breadth_first=False):
+        '''Find the first node in the tree that satisfies a predicate.
+
+        @param predicate A function called with each node that passes
+                         @ref filter. The first node it returns True for is
+                         the result.
+        @param filter, prune, breadth_first As for @ref walk.
+        @return The node found, or None.
+
+        '''
+        return self._root.find_first(predicate, filter, prune, breadth_first)
+
     def get_node(self, path):
         '''Get a node by path.
 
@@ -230,6 +405,16 @@ class RTCTree(object):
             return False
         return node.is_nameserver
 
+    def is_placeholder(self, path):
+        '''Is the node pointed to by @ref path a placeholder for an unresolved
+        object?
+
+        '''
+        node = self.get_node(path)
+        if not node:
+            return False
+        return node.is_placeholder
+
     def is_unknown(self, path):
         '''Is the node pointed to by @ref path an unknown object?'''
         node = self.get_node(path)
@@ -244,10 +429,78 @@ class RTCTree(object):
             return False
         return node.is_zombie
 
+    def iter_parse(self, servers=None, filter=[], dynamic=None):
+        '''Parse name servers into the tree, yielding each node as it is added.
+
+        The name servers are parsed in a background thread using the tree's
+        settings. Each node is yielded as soon as it is added to the tree,
+        before the rest of the tree is complete, so results can be shown or
+        indexed as they arrive. Name servers already in the tree are not
+        parsed again.
+
+        If the caller stops iterating early, the parse is stopped after the
+        remote calls in progress finish. Whatever had not been parsed is left
+        pending, to be parsed when it is first used.
+
+        @param servers A list of name server addresses to parse. If None, the
+                       name servers in the environment variable are parsed.
+        @param filter Restrict the parsed objects to only those in these
+                      paths.
+        @param dynamic Override the tree-wide dynamic setting. If not provided,
+                       the value given when the tree was created will be used.
+        @return A generator of (path, node) tuples, where path is the full
+                path of the node as a list.
+
+        '''
+        if dynamic == None:
+            dynamic = self._dynamic
+        if servers is None:
+            servers = []
+            if NAMESERVERS_ENV_VAR in os.environ:
+                servers = [s for s in \
+                        os.environ[NAMESERVERS_ENV_VAR].split(';') if s]
+        nodes = queue.Queue()
+        stop = Deadline(call_timeout=self._call_timeout)
+        # Nodes created after the iteration has finished, such as when a
+        # pending directory is expanded, are not reported
+        streaming = [True]
+        def listener(node):
+            # The path is found by the thread that added the node, which
+            # already holds the locks of the directories above it.
+            if streaming[0]:
+                nodes.put((node.full_path, node, None))
+        def parse():
+            try:
+                with limit_calls(stop):
+                    self._parse_name_servers(servers, filter, dynamic,
+                            listener=listener, deadline=stop)
+            except Exception as e:
+                nodes.put((None, None, e))
+            else:
+                nodes.put((None, None, None))
+        parser = threading.Thread(target=parse)
+        parser.daemon = True
+        parser.start()
+        try:
+            while True:
+                path, node, error = nodes.get()
+                if error:
+                    raise error
+                if not node:
+                    break
+                yield path, node
+        finally:
+            streaming[0] = False
+            stop.expire()
+            parser.join()
+            stop.clear()
+
     def iterate(self, func, args=None, filter=[]):
         '''Call a function on the root node, and recursively all its children.
 
-        This is a depth-first iteration.
+        This is a depth-first iteration, except that when a filter is one of
+        the is_* type properties, only the nodes of that type are visited, in
+        the order they were added to the tree.
 
         @param func The function to call. Its declaration must be
                     'def blag(node, args)', where 'node' is the current node
@@ -257,13 +510,75 @@ class RTCTree(object):
         @param filter A list of filters to apply before calling func for each
                       node in the iteration. If the filter is not True,
                       @ref func will not be called for that node. Each filter
-                      entry should be a string, representing on of the is_*
-                      properties (is_component, etc), or a function object.
+                      entry should be a string, representing one of the is_*
+                      properties (is_component, etc) or an expression over
+                      the node's attributes, or a function object. See
+                      NodeFilter.
         @return The results of the calls to @ref func in a list.
+        @raises BadFilterError if a string filter cannot be compiled.
 
         '''
         return self._root.iterate(func, args, filter)
 
+    def save_snapshot(self, filename, ports=False):
+        '''Save the tree to a snapshot file.
+
+        The snapshot can be given to the constructor to rebuild the tree
+        without contacting the name servers and components again. Only
+        information that has already been retrieved is saved.
+
+        @param filename The name of the file to write.
+        @param ports If True, the ports and connections of every component are
+                     retrieved first so that they are included.
+
+        '''
+        rtctree.snapshot.save(self._root, filename, ports=ports)
+
+    def validate(self, background=False):
+        '''Check that the objects in the tree still exist.
+
+        Each component and manager is pinged, and those that have gone are
+        replaced by zombie nodes. This is most useful after restoring a tree
+        from a snapshot.
+
+        @param background If True, check in a background thread and return
+                          the thread immediately.
+        @return The thread doing the check if background is True, otherwise
+                None.
+
+        '''
+        return rtctree.snapshot.validate(self._root, background=background)
+
+    def walk(self, filter=[], prune=None, breadth_first=False):
+        '''Visit the nodes of the tree one at a time, starting at the root.
+
+        Unlike @ref iterate, this is a generator: the walk can be stopped
+        early, and the rest of the tree is not visited.
+
+        @param filter A list of filters a node must pass to be given, as for
+                      @ref iterate.
+        @param prune A function called with each node. If it returns True,
+                     the nodes below that node are not visited.
+        @param breadth_first If True, visit the nodes level by level rather
+                             than depth first.
+        @return An iterator over the nodes.
+
+        '''
+        return self._root.walk(filter, prune, breadth_first)
+
+    def upgrade(self, path):
+        '''Get a node by path, upgrading it first if it is a placeholder.
+
+        @param path A list of path elements pointing to a node in the tree.
+        @return The node pointed to by @ref path, or None if the path does not
+                point to a node in the tree.
+
+        '''
+        node = self.get_node(path)
+        if node and node.is_placeholder:
+            return node.upgrade()
+        return node
+
     def load_servers_from_env(self, filter=[], dynamic=None):
         '''Load the name servers environment variable and parse each server in
         the list.
@@ -287,7 +602,9 @@ class RTCTree(object):
     def give_away_orb(self):
         '''Releases ownership of an ORB created by the tree.
 
-        This will prevent the ORB being destroyed when the tree is.
+        This will prevent the ORB being destroyed when the tree is. If the tree
+        is using the shared ORB, its use of the ORB is never released, so the
+        registry does not shut the ORB down.
 
         '''
         self._orb_is_mine = False
@@ -305,9 +622,12 @@ class RTCTree(object):
         '''The reference to the ORB held by this tree.'''
         return self._orb
 
-    def _create_orb(self, orb=None):
+    def _create_orb(self, orb=None, shared=True):
         # Create the ORB, optionally checking the environment variable for
-        # arguments to pass to the ORB.
+        # arguments to pass to the ORB. The shared ORB's POA manager is
+        # already active.
+        self._orb_is_shared = False
+        self._orb_args = []
         if orb:
             self._orb = orb
             self._orb_is_mine = False
@@ -316,32 +636,107 @@ class RTCTree(object):
                 orb_args = os.environ[ORB_ARGS_ENV_VAR].split(';')
             else:
                 orb_args = []
-            self._orb = CORBA.ORB_init(orb_args)
+            self._orb_args = orb_args
             self._orb_is_mine = True
+            if shared:
+                self._orb, self._poa = ORBRegistry().acquire(orb_args)
+                self._orb_is_shared = True
+                return
+            self._orb = CORBA.ORB_init(orb_args)
         # Run the POA manager
         self._poa = self._orb.resolve_initial_references('RootPOA')
         self._poa._get_the_POAManager().activate()
 
-    def _parse_name_servers(self, servers, filter=[], dynamic=False):
-        # Parse a list of name servers.
+    def _parse_name_servers(self, servers, filter=[], dynamic=False,
+            listener=None, deadline=None):
+        # Parse a list of name servers. The filter is compiled once for all of
+        # them.
+        filter = compile_filter(filter)
         if type(servers) is str:
-            # Don't parse any servers already parsed
-            if servers in self._root.children_names:
-                return
-            self._parse_name_server(servers, filter, dynamic=dynamic)
+            servers = [servers]
+        # Don't parse any servers already parsed
+        to_parse = []
+        for server in servers:
+            if server not in to_parse and \
+                    server not in self._root.children_names:
+                to_parse.append(server)
+        if self._processes > 1 and not listener:
+            rtctree.sharding.parse_servers(self._root, self._orb, to_parse,
+                    filter, self._processes, orb_args=self._orb_args,
+                    deadline=deadline or self._deadline,
+                    call_timeout=self._call_timeout,
+                    dead_endpoints=self._dead_endpoints, dynamic=dynamic,
+                    concurrency=self._concurrency, lazy=self._lazy,
+                    defer_profiles=self._defer_profiles,
+                    names_only=self._names_only,
+                    trust_kinds=self._trust_kinds,
+                    endpoint_concurrency=self._endpoint_concurrency)
+        elif self._workers > 1 and len(to_parse) > 1:
+            self._parse_name_servers_concurrently(to_parse, filter, dynamic,
+                    listener, deadline)
         else:
-            for server in servers:
-                # Don't parse any servers already parsed
-                if server in self._root.children_names:
-                    return
-                self._parse_name_server(server, filter, dynamic=dynamic)
-
-    def _parse_name_server(self, address, filter=[], dynamic=False):
+            for server in to_parse:
+                self._parse_name_server(server, filter, dynamic=dynamic,
+                        listener=listener, deadline=deadline)
+
+    def _parse_name_servers_concurrently(self, servers, filter=[],
+            dynamic=False, listener=None, deadline=None):
+        # Parse a list of name servers using a pool of worker threads. Each
+        # name server node is added to the root node as soon as its parse is
+        # complete. As in the serial path, an error parsing a server is
+        # raised, but only once every worker has stopped, so the servers
+        # that could be parsed are all in the tree. If several servers fail,
+        # the error of the first of them in the list is raised.
+        def parse(address):
+            try:
+                with limit_calls(deadline or self._deadline):
+                    return address, self._make_name_server_node(address,
+                            filter, dynamic, listener, deadline), None
+            except Exception as e:
+                return address, None, e
+
+        errors = {}
+        pool = ThreadPool(min(self._workers, len(servers)))
+        try:
+            for address, new_ns_node, error in pool.imap_unordered(parse,
+                    servers):
+                if error is not None:
+                    errors[address] = error
+                elif new_ns_node:
+                    self._root._add_child(new_ns_node)
+        finally:
+            pool.close()
+            pool.join()
+        for address in servers:
+            if address in errors:
+                raise errors[address]
+
+    def _parse_name_server(self, address, filter=[], dynamic=False,
+            listener=None, deadline=None):
         # Parse a single name server and add it to the root node.
-        if not utils.filtered(['/', address], filter):
-            new_ns_node = NameServer(self._orb, address, self._root,
-                    utils.trim_filter(copy.deepcopy(filter), 2), dynamic=dynamic)
+        new_ns_node = self._make_name_server_node(address, filter, dynamic,
+                listener, deadline)
+        if new_ns_node:
             self._root._add_child(new_ns_node)
 
+    def _make_name_server_node(self, address, filter=[], dynamic=False,
+            listener=None, deadline=None):
+        # Parse a single name server, returning its node, or None if the
+        # server is removed by the filter. The node is not added to the tree.
+        # The tree's deadline is used if none is given.
+        if not deadline:
+            deadline = self._deadline
+        ns_filter = compile_filter(filter).descend(['/', address])
+        if ns_filter is None:
+            return None
+        return NameServer(self._orb, address, self._root, ns_filter,
+                dynamic=dynamic,
+                concurrency=self._concurrency, lazy=self._lazy,
+                defer_profiles=self._defer_profiles,
+                names_only=self._names_only, trust_kinds=self._trust_kinds,
+                deadline=deadline, dead_endpoints=self._dead_endpoints,
+                endpoint_concurrency=self._endpoint_concurrency,
+                listener=listener)
+
 
 # vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
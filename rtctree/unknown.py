@@ -32,6 +32,8 @@ class Unknown(TreeNode):
     cannot contain any children.
 
     '''
+    __slots__ = ('_obj',)
+
     def __init__(self, name, parent, obj):
         '''Constructor.
 
@@ -18,6 +18,8 @@ of name servers, directories, managers and components.
 
 '''
 
+import binascii
+import struct
 import sys
 
 import omniORB
@@ -200,10 +202,74 @@ def filtered(path, filter):
     return True
 
 
+def ior_endpoint(ior):
+    '''Get the address of the first IIOP profile in a stringified IOR.
+
+    @param ior An IOR string, as returned by ORB.object_to_string().
+    @return The address as a string in the form 'host:port', or None if the
+            IOR does not contain an IIOP profile or cannot be decoded.
+
+    '''
+    if not ior or not ior.startswith('IOR:'):
+        return None
+    try:
+        ior_stream = _CDRStream(binascii.unhexlify(ior[4:]))
+        ior_stream.string() # Repository ID
+        for ii in range(ior_stream.ulong()):
+            tag = ior_stream.ulong()
+            profile = ior_stream.octets(ior_stream.ulong())
+            if tag == 0: # TAG_INTERNET_IOP
+                body = _CDRStream(profile)
+                body.octets(2) # IIOP version
+                host = body.string()
+                port = body.ushort()
+                return '{0}:{1}'.format(host, port)
+    except (TypeError, ValueError, struct.error, binascii.Error):
+        pass
+    return None
+
+
 def trim_filter(filter, levels=1):
     '''Trim @ref levels levels from the front of each path in @filter.'''
     trimmed = [f[levels:] for f in filter]
     return [f for f in trimmed if f]
 
 
+class _CDRStream(object):
+    # Reads the basic CDR types found in an IOR from an encapsulation. The
+    # first octet of an encapsulation gives its byte order, and alignment is
+    # relative to the start of the encapsulation.
+    def __init__(self, data):
+        if not data:
+            raise ValueError('CDR data too short')
+        self._data = data
+        if bytearray(data[:1])[0]:
+            self._order = '<'
+        else:
+            self._order = '>'
+        self._pos = 1
+
+    def octets(self, length):
+        value = self._data[self._pos:self._pos + length]
+        if len(value) != length:
+            raise ValueError('CDR data too short')
+        self._pos += length
+        return value
+
+    def string(self):
+        return self.octets(self.ulong())[:-1].decode('latin-1')
+
+    def ulong(self):
+        return self._unpack('I', 4)
+
+    def ushort(self):
+        return self._unpack('H', 2)
+
+    def _unpack(self, fmt, size):
+        self._pos += -self._pos % size
+        value = struct.unpack_from(self._order + fmt, self._data, self._pos)[0]
+        self._pos += size
+        return value
+
+
 # vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
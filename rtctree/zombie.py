@@ -33,6 +33,8 @@ class Zombie(TreeNode):
     name still registered on the name server.
 
     '''
+    __slots__ = ()
+
     def __init__(self, name, parent, *args, **kwargs):
         '''Constructor.
 
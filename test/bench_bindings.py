@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Benchmark listing a naming context holding a large number of bindings.
+
+A temporary context is created on the name server and filled with bindings,
+then listed using fixed-size pages and using adaptive paging. The context is
+removed again afterwards. A name server must be running at the given address.
+
+'''
+
+
+from optparse import OptionParser
+import sys
+import time
+
+import CosNaming
+from omniORB import CORBA
+
+from rtctree.pager import BindingPager
+from rtctree.tree import RTCTree
+
+
+BENCH_CONTEXT = [CosNaming.NameComponent('rtctree_bench', 'cxt')]
+
+
+def make_context(root, count):
+    # Create the benchmark context and bind the root context in it under
+    # count different names.
+    cxt = root.bind_new_context(BENCH_CONTEXT)
+    for ii in range(count):
+        cxt.bind([CosNaming.NameComponent('obj{0}'.format(ii), 'bench')],
+                root)
+    return cxt
+
+
+def remove_context(root, cxt):
+    # Remove the benchmark context and everything in it.
+    with BindingPager(cxt) as bindings:
+        names = [b.binding_name for b in bindings]
+    for name in names:
+        cxt.unbind(name)
+    cxt.destroy()
+    root.unbind(BENCH_CONTEXT)
+
+
+def time_pager(cxt, repeats, **kwargs):
+    # Return the best time to list the context, and the pages used.
+    best = None
+    for ii in range(repeats):
+        start = time.time()
+        with BindingPager(cxt, 100, **kwargs) as bindings:
+            count = len([b for b in bindings])
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, bindings.pages, count
+
+
+def time_tree(address, repeats):
+    # Return the best time to parse the name server names-only, which lists
+    # the benchmark context with the tree's paging.
+    best = None
+    for ii in range(repeats):
+        start = time.time()
+        tree = RTCTree(servers=[address], names_only=True,
+                filter=[['/', address, 'rtctree_bench.cxt']])
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main(argv):
+    parser = OptionParser(usage='usage: %prog [options]')
+    parser.add_option('-a', '--address', dest='address', default='localhost',
+            help='Address of the name server. [Default: %default]')
+    parser.add_option('-n', '--count', dest='count', type='int',
+            default=10000,
+            help='Number of bindings to create. [Default: %default]')
+    parser.add_option('-r', '--repeats', dest='repeats', type='int',
+            default=3,
+            help='Number of times to repeat each run. [Default: %default]')
+    options, args = parser.parse_args(argv[1:])
+
+    orb = CORBA.ORB_init([])
+    ns = orb.string_to_object(
+            'corbaloc::{0}/NameService'.format(options.address))
+    root = ns._narrow(CosNaming.NamingContext)
+    print('Binding {0} objects...'.format(options.count))
+    cxt = make_context(root, options.count)
+    try:
+        for label, kwargs in (('Fixed pages', {'adaptive': False}),
+                ('Adaptive pages', {'adaptive': True})):
+            elapsed, pages, count = time_pager(cxt, options.repeats,
+                    **kwargs)
+            print('{0}: {1} bindings in {2} pages, {3:.3f}s'.format(label,
+                count, pages, elapsed))
+        print('Names-only tree: {0:.3f}s'.format(time_tree(options.address,
+            options.repeats)))
+    finally:
+        remove_context(root, cxt)
+        orb.destroy()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Benchmark reading the tree while its nodes are being changed.
+
+A tree of directories holding leaf nodes is built in memory. Reader threads
+look up paths and list the children of nodes while writer threads replace
+leaf nodes, as observer events arriving from omniORB threads do. The number
+of reads made per second is printed with no writers and with the given
+number of writers. No name server is needed.
+
+'''
+
+
+from optparse import OptionParser
+import random
+import sys
+import threading
+import time
+
+from rtctree.node import TreeNode
+
+
+def make_tree(dirs, leaves):
+    # Build a root node holding a name server node, holding the directories
+    # and their leaves. Return the root and the paths to the leaves.
+    root = TreeNode('/')
+    ns = TreeNode('localhost', root)
+    root._add_child(ns)
+    paths = []
+    for ii in range(dirs):
+        d = TreeNode('dir{0}.host_cxt'.format(ii), ns)
+        ns._add_child(d)
+        for jj in range(leaves):
+            leaf = TreeNode('comp{0}.rtc'.format(jj), d)
+            d._add_child(leaf)
+            paths.append(['localhost', d.name, leaf.name])
+    return ns, paths
+
+
+def reader(ns, paths, stop, counts, index):
+    # Look up paths below the name server node (which does not keep an
+    # index, so the children of each node are read) and list the children
+    # of each directory found, until told to stop.
+    rand = random.Random(index)
+    count = 0
+    while not stop.is_set():
+        path = rand.choice(paths)
+        node = ns.get_node(path)
+        if node is not None:
+            node.parent.children
+        count += 1
+    counts[index] = count
+
+
+def writer(ns, paths, stop, index):
+    # Replace leaf nodes, as when a component is recreated, until told to
+    # stop.
+    rand = random.Random(-index - 1)
+    while not stop.is_set():
+        path = rand.choice(paths)
+        d = ns.get_node(path[:-1])
+        d._add_child(TreeNode(path[-1], d))
+
+
+def run(ns, paths, readers, writers, duration):
+    # Return the number of reads made per second.
+    stop = threading.Event()
+    counts = [0] * readers
+    threads = [threading.Thread(target=reader,
+        args=(ns, paths, stop, counts, ii)) for ii in range(readers)]
+    threads += [threading.Thread(target=writer, args=(ns, paths, stop, ii))
+            for ii in range(writers)]
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    return sum(counts) / duration
+
+
+def main(argv):
+    parser = OptionParser(usage='usage: %prog [options]')
+    parser.add_option('-d', '--dirs', dest='dirs', type='int', default=100,
+            help='Number of directories. [Default: %default]')
+    parser.add_option('-l', '--leaves', dest='leaves', type='int',
+            default=50,
+            help='Number of leaf nodes in each directory. '
+            '[Default: %default]')
+    parser.add_option('-r', '--readers', dest='readers', type='int',
+            default=4,
+            help='Number of reader threads. [Default: %default]')
+    parser.add_option('-w', '--writers', dest='writers', type='int',
+            default=4,
+            help='Number of writer threads. [Default: %default]')
+    parser.add_option('-t', '--time', dest='duration', type='float',
+            default=2.0,
+            help='Seconds to run each test for. [Default: %default]')
+    options, args = parser.parse_args(argv[1:])
+
+    ns, paths = make_tree(options.dirs, options.leaves)
+    print('{0} directories of {1} leaves, {2} readers'.format(options.dirs,
+        options.leaves, options.readers))
+    quiet = run(ns, paths, options.readers, 0, options.duration)
+    print('No writers:   {0:.0f} reads/s'.format(quiet))
+    busy = run(ns, paths, options.readers, options.writers,
+            options.duration)
+    print('{0} writers:    {1:.0f} reads/s'.format(options.writers, busy))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Benchmark the memory used by the objects that make up a tree.
+
+A number of objects of each type is created in memory, from profiles made up
+locally, and the memory allocated for them is measured with tracemalloc. The
+bytes used per object, including its lock and the containers it holds, are
+printed for each type. No name server or component is needed.
+
+Requires Python 3.4 or later for tracemalloc.
+
+'''
+
+
+from optparse import OptionParser
+import sys
+import tracemalloc
+
+from rtctree.component import Component
+from rtctree.directory import Directory
+from rtctree.exec_context import ExecutionContext
+from rtctree.node import TreeNode
+from rtctree.ports import Connection, DataInPort, SvcInterface
+from rtctree.rtc import RTC
+from rtctree.unknown import Unknown
+from rtctree.zombie import Zombie
+
+
+class Profile(object):
+    # Stands in for the profiles the objects are normally made from.
+    def __init__(self, **kwargs):
+        for k in kwargs:
+            setattr(self, k, kwargs[k])
+
+
+class ECObject(object):
+    # Stands in for an execution context object that does not implement
+    # ExecutionContextService, so that no profile is requested.
+    def _narrow(self, type):
+        return None
+
+
+def measure(make, count):
+    # Return the bytes allocated per object when count objects are made.
+    objects = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for ii in range(count):
+        objects.append(make(ii))
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    used = sum(s.size_diff for s in stats)
+    # Leave out the list holding the objects
+    used -= sys.getsizeof(objects)
+    return used / float(count)
+
+
+def main(argv):
+    parser = OptionParser(usage='usage: %prog [options]')
+    parser.add_option('-n', '--count', dest='count', type='int',
+            default=20000,
+            help='Number of objects of each type to create. '
+            '[Default: %default]')
+    options, args = parser.parse_args(argv[1:])
+
+    root = TreeNode('/')
+    ns = Directory('localhost', root)
+    port_profile = Profile(name='in', properties=[])
+    intf_profile = Profile(instance_name='intf', type_name='Intf',
+            polarity=RTC.PROVIDED)
+    conn_profile = Profile(name='conn', connector_id='id', properties=[],
+            ports=[])
+    ec = ECObject()
+    makers = [
+            ('TreeNode', lambda ii: TreeNode('n{0}'.format(ii), ns)),
+            ('Directory', lambda ii: Directory('d{0}'.format(ii), ns)),
+            ('Component', lambda ii: Component('c{0}.rtc'.format(ii), ns,
+                defer_profile=True)),
+            ('Zombie', lambda ii: Zombie('z{0}.rtc'.format(ii), ns)),
+            ('Unknown', lambda ii: Unknown('u{0}'.format(ii), ns, None)),
+            ('DataInPort', lambda ii: DataInPort(None, None, port_profile)),
+            ('SvcInterface', lambda ii: SvcInterface(intf_profile)),
+            ('Connection', lambda ii: Connection(conn_profile)),
+            ('ExecutionContext', lambda ii: ExecutionContext(ec, ii)),
+            ]
+    print('Bytes per object, {0} objects of each type'.format(options.count))
+    for name, make in makers:
+        print('{0:<18}{1:8.0f}'.format(name, measure(make, options.count)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,146 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Fake naming service objects for tests that do not need a name server.
+
+'''
+
+
+import CosNaming
+from omniORB import CORBA
+
+
+##############################################################################
+## Fake objects
+
+class FakeObject(object):
+    '''An object bound in a fake naming context.
+
+    Narrowing returns the object itself, so it can stand in for a component
+    created without being contacted.
+
+    '''
+    def __init__(self, name=''):
+        self.name = name
+
+    def __repr__(self):
+        return 'FakeObject({0!r})'.format(self.name)
+
+    def _narrow(self, obj_type):
+        return self
+
+    def _unchecked_narrow(self, obj_type):
+        return self
+
+    def _is_equivalent(self, other):
+        return self is other
+
+    def _non_existent(self):
+        return False
+
+
+class DeadObject(FakeObject):
+    '''An object whose servant has gone, failing every call with an error.
+
+    By default, the error is the one raised for an object that no longer
+    exists.
+
+    '''
+    def __init__(self, name='', error=None):
+        super(DeadObject, self).__init__(name)
+        if error is None:
+            error = CORBA.OBJECT_NOT_EXIST(0, CORBA.COMPLETED_NO)
+        self.error = error
+
+    def get_component_profile(self):
+        raise self.error
+
+    def _non_existent(self):
+        raise self.error
+
+
+class FakeIterator(object):
+    '''A binding iterator over the bindings left after listing a context.'''
+    def __init__(self, bindings, error=None):
+        self.bindings = list(bindings)
+        self.error = error
+        self.requests = []
+        self.destroyed = False
+
+    def next_n(self, how_many):
+        self.requests.append(how_many)
+        if self.error:
+            raise self.error
+        result = self.bindings[:how_many]
+        del self.bindings[:how_many]
+        return bool(result), result
+
+    def destroy(self):
+        self.destroyed = True
+
+
+class FakeContext(FakeObject):
+    '''A naming context holding objects and other fake contexts.
+
+    Bindings are kept in the order they are added. Each call to list() is
+    recorded, along with the iterator it returned, and the (id, kind) of
+    each name resolved.
+
+    '''
+    def __init__(self, name='', error=None):
+        super(FakeContext, self).__init__(name)
+        self.error = error
+        self.entries = []
+        self.lists = []
+        self.iterators = []
+        self.resolved = []
+
+    def bind(self, id, kind, obj):
+        '''Bind an object or a context, replacing any binding of that name.'''
+        self.unbind(id, kind)
+        self.entries.append(((id, kind), obj))
+        return obj
+
+    def unbind(self, id, kind):
+        self.entries = [e for e in self.entries if e[0] != (id, kind)]
+
+    def list(self, how_many):
+        self.lists.append(how_many)
+        bindings = [self._binding(key, obj) for key, obj in self.entries]
+        if len(bindings) <= how_many:
+            return bindings, None
+        iterator = FakeIterator(bindings[how_many:], self.error)
+        self.iterators.append(iterator)
+        return bindings[:how_many], iterator
+
+    def resolve(self, name):
+        key = (name[0].id, name[0].kind)
+        self.resolved.append(key)
+        for k, obj in self.entries:
+            if k == key:
+                return obj
+        raise CosNaming.NamingContext.NotFound(
+                CosNaming.NamingContext.missing_node, name)
+
+    def _binding(self, key, obj):
+        if isinstance(obj, FakeContext):
+            binding_type = CosNaming.ncontext
+        else:
+            binding_type = CosNaming.nobject
+        return CosNaming.Binding([CosNaming.NameComponent(*key)],
+                binding_type)
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
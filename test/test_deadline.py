@@ -0,0 +1,158 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Tests for the time limits put on parsing a tree.
+
+'''
+
+
+import threading
+import time
+import unittest
+
+from rtctree import deadline
+from rtctree.deadline import Deadline, limit_calls, renew_calls
+
+
+def thread_timeout():
+    # The call timeout, in milliseconds, set for the calling thread
+    return getattr(deadline._thread_timeouts, 'ms', 0)
+
+
+class DeadlineTests(unittest.TestCase):
+    def test_expires(self):
+        d = Deadline(0.05)
+        self.assertFalse(d.expired)
+        time.sleep(0.1)
+        self.assertTrue(d.expired)
+        self.assertEqual(d.remaining, 0)
+
+    def test_no_time_limit(self):
+        d = Deadline()
+        self.assertFalse(d.expired)
+        self.assertEqual(d.remaining, None)
+        self.assertEqual(d.call_timeout, None)
+
+    def test_expire(self):
+        d = Deadline()
+        d.expire()
+        self.assertTrue(d.expired)
+        d = Deadline(60)
+        d.expire()
+        self.assertTrue(d.expired)
+
+    def test_clear(self):
+        d = Deadline(0, 5)
+        d.clear()
+        self.assertFalse(d.expired)
+        self.assertEqual(d.remaining, None)
+        self.assertEqual(d.call_timeout, None)
+
+    def test_remaining(self):
+        d = Deadline(60)
+        self.assertTrue(59 < d.remaining <= 60)
+
+    def test_call_timeout(self):
+        self.assertEqual(Deadline(call_timeout=5).call_timeout, 5)
+        self.assertEqual(Deadline(60, 5).call_timeout, 5)
+
+    def test_call_timeout_clamped(self):
+        # A call may not take longer than the time left
+        d = Deadline(0.5, 10)
+        self.assertTrue(d.call_timeout <= 0.5)
+        time.sleep(0.2)
+        self.assertTrue(d.call_timeout <= 0.3)
+        d.expire()
+        self.assertEqual(d.call_timeout, 0)
+
+    def test_budget_only(self):
+        d = Deadline(0.5)
+        self.assertTrue(0 < d.call_timeout <= 0.5)
+
+
+class LimitCallsTests(unittest.TestCase):
+    def test_sets_and_restores(self):
+        self.assertEqual(thread_timeout(), 0)
+        with limit_calls(Deadline(call_timeout=2)):
+            self.assertEqual(thread_timeout(), 2000)
+        self.assertEqual(thread_timeout(), 0)
+
+    def test_restored_on_error(self):
+        def fail():
+            with limit_calls(Deadline(call_timeout=2)):
+                raise ValueError
+        self.assertRaises(ValueError, fail)
+        self.assertEqual(thread_timeout(), 0)
+
+    def test_nested(self):
+        with limit_calls(Deadline(call_timeout=2)):
+            with limit_calls(Deadline(call_timeout=1)):
+                self.assertEqual(thread_timeout(), 1000)
+            self.assertEqual(thread_timeout(), 2000)
+
+    def test_no_limit(self):
+        with limit_calls(None):
+            self.assertEqual(thread_timeout(), 0)
+        with limit_calls(Deadline()):
+            self.assertEqual(thread_timeout(), 0)
+
+    def test_budget_limits_calls(self):
+        with limit_calls(Deadline(1)):
+            self.assertTrue(0 < thread_timeout() <= 1000)
+
+    def test_expired_deadline(self):
+        # A timeout of zero would mean no timeout, so the shortest is used
+        d = Deadline(60, 5)
+        d.expire()
+        with limit_calls(d):
+            self.assertEqual(thread_timeout(), 1)
+
+    def test_renew(self):
+        d = Deadline(0.5, 10)
+        with limit_calls(d):
+            first = thread_timeout()
+            time.sleep(0.2)
+            renew_calls()
+            self.assertTrue(thread_timeout() <= first - 150)
+            d.expire()
+            renew_calls()
+            self.assertEqual(thread_timeout(), 1)
+        self.assertEqual(thread_timeout(), 0)
+
+    def test_renew_outside_block(self):
+        renew_calls()
+        self.assertEqual(thread_timeout(), 0)
+
+    def test_renew_cleared(self):
+        d = Deadline(60, 5)
+        with limit_calls(d):
+            d.clear()
+            renew_calls()
+            self.assertEqual(thread_timeout(), 5000)
+
+    def test_other_threads_unaffected(self):
+        seen = []
+        t = threading.Thread(target=lambda: seen.append(thread_timeout()))
+        with limit_calls(Deadline(call_timeout=2)):
+            t.start()
+            t.join()
+        self.assertEqual(seen, [0])
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
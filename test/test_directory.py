@@ -0,0 +1,216 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Tests for parsing and reparsing directories, using a fake naming service.
+
+'''
+
+
+import sys
+import unittest
+
+import CosNaming
+from omniORB import CORBA, TRANSIENT_CallTimedout, TRANSIENT_ConnectFailed
+
+from rtctree.directory import Directory
+from rtctree.node import TreeNode
+from rtctree.pathfilter import PathFilter
+
+from fakes import DeadObject, FakeContext, FakeObject
+
+
+def make_tree(context, filter=[]):
+    # Parse a fake context into a directory below a new root node. Component
+    # profiles are deferred so the fake objects are never called.
+    root = TreeNode('/', None)
+    directory = Directory('host.cxt', root, defer_profiles=True)
+    root._add_child(directory)
+    directory._parse_context(context, None, filter)
+    return root, directory
+
+
+class ReparseTests(unittest.TestCase):
+    def setUp(self):
+        self.context = FakeContext('host')
+        self.context.bind('top', 'rtc', FakeObject('top'))
+        self.sub = self.context.bind('sub', '', FakeContext('sub'))
+        self.sub.bind('deep0', 'rtc', FakeObject('deep0'))
+        self.sub.bind('other', 'obj', FakeObject('other'))
+        self.root, self.dir = make_tree(self.context)
+
+    def test_unchanged_children_kept(self):
+        top = self.dir.get_node(['host.cxt', 'top.rtc'])
+        sub = self.dir.get_node(['host.cxt', 'sub'])
+        deep0 = self.dir.get_node(['host.cxt', 'sub', 'deep0.rtc'])
+        cb = lambda node, value, args: None
+        top.add_callback('component_profile', cb)
+        self.dir.reparse()
+        self.assertTrue(self.dir.get_node(['host.cxt', 'top.rtc']) is top)
+        self.assertTrue(self.dir.get_node(['host.cxt', 'sub']) is sub)
+        self.assertTrue(self.dir.get_node(['host.cxt', 'sub',
+            'deep0.rtc']) is deep0)
+        self.assertEqual(top._cbs, {'component_profile': [(cb, None)]})
+
+    def test_removed_bindings_dropped(self):
+        deep0 = self.dir.get_node(['host.cxt', 'sub', 'deep0.rtc'])
+        self.sub.unbind('deep0', 'rtc')
+        self.context.unbind('top', 'rtc')
+        self.dir.reparse()
+        self.assertEqual(sorted(self.dir.children_names), ['sub'])
+        self.assertEqual(self.root.get_node(['/', 'host.cxt', 'sub',
+            'deep0.rtc']), None)
+        self.assertFalse(('/', 'host.cxt', 'top.rtc') in self.root._index)
+        self.assertFalse(('/', 'host.cxt', 'sub', 'deep0.rtc') in \
+                self.root._index)
+        self.assertFalse(deep0 in self.root._types['is_component'])
+        self.assertEqual(list(self.root.walk(filter=['is_component'])), [])
+
+    def test_new_bindings_added(self):
+        self.sub.bind('new', 'rtc', FakeObject('new'))
+        self.context.bind('more', '', FakeContext('more')).bind('deep1',
+                'rtc', FakeObject('deep1'))
+        self.dir.reparse()
+        new = self.root.get_node(['/', 'host.cxt', 'sub', 'new.rtc'])
+        self.assertTrue(new.is_component)
+        self.assertTrue(self.root._index[('/', 'host.cxt', 'sub',
+            'new.rtc')] is new)
+        self.assertTrue(self.root.get_node(['/', 'host.cxt', 'more',
+            'deep1.rtc']).is_component)
+        self.assertEqual(len(self.root._types['is_component']), 4)
+
+    def test_restarted_component_replaced(self):
+        top = self.dir.get_node(['host.cxt', 'top.rtc'])
+        self.context.bind('top', 'rtc', FakeObject('top'))
+        self.dir.reparse()
+        new = self.dir.get_node(['host.cxt', 'top.rtc'])
+        self.assertFalse(new is top)
+        self.assertTrue(new.is_component)
+        self.assertTrue(new.object is self.context.resolve(
+            [CosNaming.NameComponent('top', 'rtc')]))
+        self.assertFalse(top in self.root._types['is_component'])
+
+    def test_objects_not_verified(self):
+        top = self.dir.get_node(['host.cxt', 'top.rtc'])
+        self.context.bind('top', 'rtc', FakeObject('top'))
+        self.dir.reparse(verify_objects=False)
+        self.assertTrue(self.dir.get_node(['host.cxt', 'top.rtc']) is top)
+
+    @unittest.skipIf(sys.version_info < (3, 7),
+            'dictionaries do not keep their order')
+    def test_listing_order(self):
+        top = self.context.resolve([CosNaming.NameComponent('top', 'rtc')])
+        self.context.unbind('top', 'rtc')
+        self.context.bind('new', 'rtc', FakeObject('new'))
+        self.context.bind('top', 'rtc', top)
+        self.dir.reparse()
+        self.assertEqual(self.dir.children_names,
+                ['sub', 'new.rtc', 'top.rtc'])
+
+    def test_filtered_iterate_depth_first(self):
+        self.sub.bind('new', 'rtc', FakeObject('new'))
+        self.dir.reparse()
+        walked = list(self.root.walk(filter=['is_component']))
+        iterated = self.root.iterate(lambda n, args: n,
+                filter=['is_component'])
+        self.assertEqual(len(iterated), 3)
+        self.assertEqual(iterated, walked)
+
+    def test_changed_type_replaced(self):
+        deep0 = self.dir.get_node(['host.cxt', 'sub', 'deep0.rtc'])
+        self.context.bind('sub', '', FakeObject('sub'))
+        self.dir.reparse()
+        self.assertTrue(self.dir.get_node(['host.cxt', 'sub']).is_unknown)
+        self.assertFalse(('/', 'host.cxt', 'sub', 'deep0.rtc') in \
+                self.root._index)
+        self.assertFalse(deep0 in self.root._types['is_component'])
+
+
+class FilterTests(unittest.TestCase):
+    def setUp(self):
+        self.context = FakeContext('host')
+        for name in ('comp0', 'comp1', 'mid', 'laser0'):
+            self.context.bind(name, 'rtc', FakeObject(name))
+        self.sub = self.context.bind('sub', '', FakeContext('sub'))
+        self.sub.bind('comp0', 'rtc', FakeObject('sub/comp0'))
+        self.sub.bind('comp1', 'rtc', FakeObject('sub/comp1'))
+        self.context.bind('skipped', '', FakeContext('skipped'))
+
+    def test_patterns(self):
+        root, directory = make_tree(self.context, PathFilter([['comp*.rtc'],
+            ['sub', '**', 'comp0.rtc']]))
+        self.assertEqual(sorted(directory.children_names),
+                ['comp0.rtc', 'comp1.rtc', 'sub'])
+        self.assertEqual(directory.get_node(['host.cxt',
+            'sub']).children_names, ['comp0.rtc'])
+        self.assertEqual(self.sub.resolved, [('comp0', 'rtc')])
+
+    def test_objects_resolved_at_end_of_path(self):
+        # An object is not resolved when a path only continues below it,
+        # since only directories and managers can hold the rest of a path
+        root, directory = make_tree(self.context, PathFilter([['comp0.rtc'],
+            ['mid.rtc', 'below.rtc']]))
+        self.assertEqual(directory.children_names, ['comp0.rtc'])
+        self.assertEqual(self.context.resolved, [('comp0', 'rtc')])
+
+    def test_contexts_not_resolved(self):
+        root, directory = make_tree(self.context, PathFilter([['sub',
+            'comp1.rtc']]))
+        self.assertEqual(directory.children_names, ['sub'])
+        self.assertEqual(self.context.resolved, [('sub', '')])
+        self.assertEqual(self.sub.resolved, [('comp1', 'rtc')])
+
+
+class DeferredProfileTests(unittest.TestCase):
+    def make_dead(self, error=None):
+        context = FakeContext('host')
+        context.bind('live', 'rtc', FakeObject('live'))
+        context.bind('dead', 'rtc', DeadObject('dead', error))
+        self.root, self.dir = make_tree(context)
+        return self.dir.get_node(['host.cxt', 'dead.rtc'])
+
+    def test_dead_component_zombified(self):
+        dead = self.make_dead()
+        self.assertTrue(dead.is_component)
+        self.assertRaises(CORBA.OBJECT_NOT_EXIST, getattr, dead,
+                'instance_name')
+        zombie = self.dir.get_node(['host.cxt', 'dead.rtc'])
+        self.assertTrue(zombie.is_zombie)
+        self.assertEqual(sorted(self.dir.children_names),
+                ['dead.rtc', 'live.rtc'])
+        self.assertTrue(self.root._index[('/', 'host.cxt', 'dead.rtc')] is
+                zombie)
+        self.assertFalse(dead in self.root._types['is_component'])
+        self.assertTrue(zombie in self.root._types['is_zombie'])
+
+    def test_unreachable_component_zombified(self):
+        dead = self.make_dead(CORBA.TRANSIENT(TRANSIENT_ConnectFailed,
+            CORBA.COMPLETED_NO))
+        self.assertRaises(CORBA.TRANSIENT, getattr, dead, 'properties')
+        self.assertTrue(self.dir.get_node(['host.cxt',
+            'dead.rtc']).is_zombie)
+
+    def test_timed_out_component_kept(self):
+        # A component that is only slow to answer may still exist
+        slow = self.make_dead(CORBA.TRANSIENT(TRANSIENT_CallTimedout,
+            CORBA.COMPLETED_NO))
+        self.assertRaises(CORBA.TRANSIENT, getattr, slow, 'type_name')
+        self.assertTrue(self.dir.get_node(['host.cxt', 'dead.rtc']) is slow)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
@@ -0,0 +1,144 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Tests for the cache of unreachable endpoints.
+
+'''
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from rtctree import endpoints
+from rtctree.endpoints import EndpointCache
+
+
+class FakeClock(object):
+    # Stands in for the time module, so expiry can be tested without waiting.
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+class EndpointCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.real_time = endpoints.time
+        endpoints.time = self.clock
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'endpoints.json')
+
+    def tearDown(self):
+        endpoints.time = self.real_time
+        shutil.rmtree(self.dir)
+
+    def test_add(self):
+        cache = EndpointCache()
+        cache.add('host:2810')
+        cache.add(None)
+        self.assertTrue('host:2810' in cache)
+        self.assertFalse('host:2811' in cache)
+        self.assertEqual(len(cache), 1)
+
+    def test_no_ttl(self):
+        cache = EndpointCache()
+        cache.add('host:2810')
+        self.clock.now += 1e6
+        self.assertTrue('host:2810' in cache)
+
+    def test_ttl_expiry(self):
+        cache = EndpointCache(ttl=10)
+        cache.add('host:2810')
+        self.clock.now += 9
+        self.assertTrue('host:2810' in cache)
+        self.clock.now += 1
+        self.assertFalse('host:2810' in cache)
+        self.assertEqual(len(cache), 0)
+
+    def test_add_again_extends_ttl(self):
+        cache = EndpointCache(ttl=10)
+        cache.add('host:2810')
+        self.clock.now += 5
+        cache.add('host:2810')
+        self.clock.now += 9
+        self.assertTrue('host:2810' in cache)
+
+    def test_clear(self):
+        cache = EndpointCache()
+        cache.add('host:2810')
+        cache.clear()
+        self.assertFalse('host:2810' in cache)
+        cache.add('host:2810')
+        self.assertTrue('host:2810' in cache)
+
+    def test_close(self):
+        cache = EndpointCache()
+        cache.add('host:2810')
+        cache.close()
+        self.assertFalse('host:2810' in cache)
+        cache.add('host:2810')
+        self.assertFalse('host:2810' in cache)
+
+    def test_save_and_load(self):
+        cache = EndpointCache(ttl=10, filename=self.filename)
+        cache.add('host:2810')
+        cache.save()
+        self.assertFalse(os.path.exists(self.filename + '.tmp'))
+        loaded = EndpointCache(ttl=10, filename=self.filename)
+        self.assertTrue('host:2810' in loaded)
+        self.assertEqual(loaded.filename, self.filename)
+        self.assertEqual(loaded.ttl, 10)
+
+    def test_load_keeps_expiry(self):
+        cache = EndpointCache(ttl=10, filename=self.filename)
+        cache.add('host:2810')
+        self.clock.now += 5
+        cache.add('host:2811')
+        cache.save()
+        self.clock.now += 6
+        loaded = EndpointCache(ttl=10, filename=self.filename)
+        self.assertFalse('host:2810' in loaded)
+        self.assertTrue('host:2811' in loaded)
+        self.assertEqual(len(loaded), 1)
+
+    def test_load_without_ttl(self):
+        cache = EndpointCache(filename=self.filename)
+        cache.add('host:2810')
+        cache.save()
+        self.clock.now += 1e6
+        self.assertTrue('host:2810' in EndpointCache(filename=self.filename))
+
+    def test_damaged_file(self):
+        with open(self.filename, 'w') as f:
+            f.write('{not json')
+        cache = EndpointCache(filename=self.filename)
+        self.assertEqual(len(cache), 0)
+
+    def test_save_without_file(self):
+        cache = EndpointCache()
+        cache.add('host:2810')
+        cache.save()
+        self.assertEqual(os.listdir(self.dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
@@ -0,0 +1,285 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Tests for the tree nodes: the root's index of the nodes below it, and walking
+the tree.
+
+'''
+
+
+import unittest
+
+from rtctree.exceptions import NotRelatedError
+from rtctree.node import TreeNode
+
+
+class Comp(TreeNode):
+    # A node of a type the root keeps a set of.
+    @property
+    def is_component(self):
+        return True
+
+
+class Lazy(TreeNode):
+    # A directory that may not have been listed yet.
+    def __init__(self, *args, **kwargs):
+        super(Lazy, self).__init__(*args, **kwargs)
+        self.unlisted = True
+
+    def list(self):
+        self.unlisted = False
+        self._note_pending()
+
+    def _is_unlisted(self):
+        return self.unlisted
+
+
+def add(parent, name, cls=TreeNode):
+    node = cls(name, parent)
+    parent._add_child(node)
+    return node
+
+
+def names(nodes):
+    return [n.name for n in nodes]
+
+
+class IndexTests(unittest.TestCase):
+    def setUp(self):
+        # /
+        #   a
+        #     c0.rtc
+        #     b
+        #       c1.rtc
+        #   c2.rtc
+        self.root = TreeNode('/', None)
+        self.a = add(self.root, 'a')
+        self.c0 = add(self.a, 'c0.rtc', Comp)
+        self.b = add(self.a, 'b')
+        self.c1 = add(self.b, 'c1.rtc', Comp)
+        self.c2 = add(self.root, 'c2.rtc', Comp)
+
+    def assertIndexed(self, root):
+        # The index holds exactly the nodes found by following the children
+        expected = {}
+        todo = [(root, (root.name,))]
+        while todo:
+            node, path = todo.pop()
+            for child in node.children:
+                expected[path + (child.name,)] = child
+                todo.append((child, path + (child.name,)))
+        self.assertEqual(root._index, expected)
+        self.assertEqual(root._types['is_component'],
+                set([n for n in expected.values() if n.is_component]))
+
+    def test_add(self):
+        self.assertIndexed(self.root)
+        self.assertTrue(self.root._index[('/', 'a', 'b', 'c1.rtc')] is
+                self.c1)
+        self.assertTrue(self.root.get_node(['/', 'a', 'c0.rtc']) is self.c0)
+
+    def test_add_subtree(self):
+        # A subtree built before it is attached is indexed when it is
+        d = TreeNode('d', self.root)
+        c3 = add(d, 'c3.rtc', Comp)
+        self.assertFalse(('/', 'd', 'c3.rtc') in self.root._index)
+        self.root._add_child(d)
+        self.assertTrue(self.root._index[('/', 'd', 'c3.rtc')] is c3)
+        self.assertIndexed(self.root)
+
+    def test_replace_subtree(self):
+        new_a = TreeNode('a', self.root)
+        c3 = add(new_a, 'c3.rtc', Comp)
+        self.root._add_child(new_a)
+        self.assertIndexed(self.root)
+        self.assertFalse(self.c0 in self.root._types['is_component'])
+        self.assertFalse(self.c1 in self.root._types['is_component'])
+        self.assertTrue(c3 in self.root._types['is_component'])
+
+    def test_remove_subtree(self):
+        self.root.remove_child(self.a)
+        self.assertIndexed(self.root)
+        self.assertEqual(self.root._types['is_component'], set([self.c2]))
+        self.assertEqual(self.root.get_node(['/', 'a', 'b', 'c1.rtc']), None)
+
+    def test_remove_unrelated(self):
+        self.assertRaises(NotRelatedError, self.root.remove_child,
+                TreeNode('x', self.root))
+        self.assertIndexed(self.root)
+
+    def test_rename_subtree(self):
+        # A subtree moved to a new name is indexed under its new path only
+        self.root.remove_child(self.a)
+        self.a._name = 'e'
+        self.a._clear_path_info()
+        self.root._add_child(self.a)
+        self.assertIndexed(self.root)
+        self.assertTrue(self.root._index[('/', 'e', 'b', 'c1.rtc')] is
+                self.c1)
+        self.assertFalse(('/', 'a') in self.root._index)
+        self.assertEqual(self.c1.full_path_str, '/e/b/c1.rtc')
+
+    def test_move_subtree(self):
+        self.b.parent = self.root
+        self.root._add_child(self.b)
+        self.assertIndexed(self.root)
+        self.assertTrue(self.root._index[('/', 'b', 'c1.rtc')] is self.c1)
+        self.assertEqual(self.c1.full_path, ['/', 'b', 'c1.rtc'])
+
+    def test_remove_all_children(self):
+        self.a._remove_all_children()
+        self.assertEqual(self.a.children, [])
+        self.assertIndexed(self.root)
+        self.assertEqual(self.root._types['is_component'], set([self.c2]))
+        self.root._remove_all_children()
+        self.assertEqual(self.root._index, {})
+        self.assertEqual(self.root._types['is_component'], set())
+
+    def test_remove_stale_node(self):
+        # Removing a node that has already been replaced leaves its
+        # replacement in the index
+        old_b = self.b
+        new_b = add(self.a, 'b')
+        self.root._unindex(old_b, ('/', 'a', 'b'))
+        self.assertTrue(self.root._index[('/', 'a', 'b')] is new_b)
+        self.assertIndexed(self.root)
+
+    def test_copy_on_write(self):
+        # Readers holding the old children are not affected by changes
+        children = self.a._children
+        add(self.a, 'new')
+        self.a.remove_child(self.c0)
+        self.assertEqual(sorted(children.keys()), ['b', 'c0.rtc'])
+        self.assertEqual(sorted(self.a.children_names), ['b', 'new'])
+
+    def test_pending(self):
+        lazy = add(self.a, 'lazy', Lazy)
+        self.assertEqual(self.root._pending, set([lazy]))
+        self.assertEqual(self.root._nodes_of_type('is_component'), None)
+        lazy.list()
+        self.assertEqual(self.root._pending, set())
+        self.assertEqual(set(self.root._nodes_of_type('is_component')),
+                set([self.c0, self.c1, self.c2]))
+
+    def test_pending_removed(self):
+        lazy = add(self.b, 'lazy', Lazy)
+        self.a._remove_all_children()
+        self.assertEqual(self.root._pending, set())
+        # A change to a node no longer in the tree is ignored
+        lazy.unlisted = True
+        lazy._note_pending()
+        self.assertEqual(self.root._pending, set())
+
+
+class WalkTests(unittest.TestCase):
+    def setUp(self):
+        # The children are added in listing order, which Python 2's
+        # dictionaries do not keep, so the order they are walked in is
+        # read back from them.
+        self.root = TreeNode('/', None)
+        for name in ('a', 'b'):
+            d = add(self.root, name)
+            for sub in ('x', 'y'):
+                s = add(d, sub)
+                add(s, name + sub + '.rtc', Comp)
+
+    def depth_first(self, node):
+        result = [node]
+        for child in node.children:
+            result.extend(self.depth_first(child))
+        return result
+
+    def breadth_first(self, node):
+        result = [node]
+        for n in result:
+            result.extend(n.children)
+        return result
+
+    def test_depth_first(self):
+        self.assertEqual(list(self.root.walk()), self.depth_first(self.root))
+
+    def test_breadth_first(self):
+        self.assertEqual(list(self.root.walk(breadth_first=True)),
+                self.breadth_first(self.root))
+
+    def test_filter(self):
+        # Nodes that do not pass the filter are still walked through
+        expected = [n for n in self.depth_first(self.root) if n.is_component]
+        self.assertEqual(len(expected), 4)
+        self.assertEqual(list(self.root.walk(filter=['is_component'])),
+                expected)
+        expected = [n for n in self.breadth_first(self.root)
+                if n.name.startswith('a')]
+        self.assertEqual(list(self.root.walk(filter=['name.startswith("a")'],
+            breadth_first=True)), expected)
+
+    def test_prune(self):
+        a = self.root.get_node(['/', 'a'])
+        walked = list(self.root.walk(prune=lambda n: n is a))
+        self.assertTrue(a in walked)
+        self.assertEqual([n for n in walked if n.parent is a], [])
+        self.assertEqual(len(walked), 1 + 1 + 1 + 2 + 2)
+
+    def test_prune_and_filter(self):
+        walked = list(self.root.walk(filter=['is_component'],
+            prune=lambda n: n.name == 'x'))
+        self.assertEqual(sorted(names(walked)), ['ay.rtc', 'by.rtc'])
+
+    def test_iterate_matches_walk(self):
+        # From the root, the nodes of one type are taken from the index but
+        # still given in the order of the walk
+        for f in (['is_component'], ['is_component', 'name < "b"'], []):
+            self.assertEqual(self.root.iterate(lambda n, args: n, filter=f),
+                    list(self.root.walk(filter=f)))
+
+    def test_iterate_after_changes(self):
+        b = self.root.get_node(['/', 'b'])
+        self.root.remove_child(b)
+        add(self.root, 'c')
+        add(self.root.get_node(['/', 'a', 'x']), 'new.rtc', Comp)
+        self.assertEqual(self.root.iterate(lambda n, args: n,
+            filter=['is_component']),
+            list(self.root.walk(filter=['is_component'])))
+
+    def test_find_first(self):
+        comps = [n for n in self.depth_first(self.root) if n.is_component]
+        self.assertTrue(self.root.find_first(lambda n: n.is_component) is
+                comps[0])
+        self.assertEqual(self.root.find_first(lambda n: False), None)
+
+    def test_find_first_stops(self):
+        seen = []
+        def predicate(node):
+            seen.append(node)
+            return node.name == 'a'
+        self.assertEqual(self.root.find_first(predicate).name, 'a')
+        self.assertEqual(seen, self.depth_first(self.root)[:len(seen)])
+        self.assertEqual(seen[-1].name, 'a')
+        self.assertTrue(len(seen) < len(self.depth_first(self.root)))
+
+    def test_find_first_filter(self):
+        # The predicate only sees the nodes that pass the filter
+        seen = []
+        found = self.root.find_first(lambda n: seen.append(n) or True,
+                filter=['is_component'], breadth_first=True)
+        self.assertTrue(found.is_component)
+        self.assertEqual(seen, [found])
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
@@ -0,0 +1,141 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Tests for compiling iteration filters.
+
+'''
+
+
+import unittest
+
+from rtctree.exceptions import BadFilterError
+from rtctree.nodefilter import NodeFilter
+
+
+class Node(object):
+    # Has the kinds of attributes the nodes of a tree have.
+    is_component = True
+    is_manager = False
+    _name = 'Camera0.rtc'
+    properties = {'vendor': 'AIST', 'rate': 10}
+    owner = None
+
+    @property
+    def name(self):
+        return self._name
+
+    def get_state_string(self, add_colour=True):
+        if add_colour:
+            return '\033[32mActive\033[0m'
+        return 'Active'
+
+    def count(self, *values):
+        return len(values)
+
+
+def passes(f, node=None):
+    return NodeFilter([f]).passes(node or Node())
+
+
+class AcceptedTests(unittest.TestCase):
+    def test_attribute(self):
+        self.assertTrue(passes('is_component'))
+        self.assertFalse(passes('is_manager'))
+
+    def test_function(self):
+        self.assertTrue(passes(lambda n: n.name == 'Camera0.rtc'))
+
+    def test_comparison(self):
+        self.assertTrue(passes('_name == "Camera0.rtc"'))
+        self.assertTrue(passes('"a" < "b" < "c"'))
+        self.assertFalse(passes('name != "Camera0.rtc"'))
+        self.assertTrue(passes('owner is None'))
+
+    def test_boolean(self):
+        self.assertTrue(passes('is_component and not is_manager'))
+        self.assertTrue(passes('is_manager or name in ["Camera0.rtc"]'))
+
+    def test_method_call(self):
+        self.assertTrue(passes('name.startswith("Camera")'))
+        self.assertFalse(passes('name.endswith(".mgr")'))
+        self.assertTrue(passes('get_state_string(False) == "Active"'))
+        self.assertTrue(passes(
+            'get_state_string(add_colour=False) == "Active"'))
+        self.assertFalse(passes('get_state_string() == "Active"'))
+
+    def test_call_arguments(self):
+        self.assertTrue(passes('count() == 0'))
+        self.assertTrue(passes('count(name, 1, properties["rate"]) == 3'))
+
+    def test_subscript(self):
+        self.assertTrue(passes('properties["vendor"] == "AIST"'))
+        self.assertTrue(passes('name[0] == "C"'))
+        self.assertTrue(passes('name.split(".")[-1] == "rtc"'))
+
+    def test_arithmetic(self):
+        self.assertTrue(passes('properties["rate"] * 2 + 1 == 21'))
+        self.assertTrue(passes('-properties["rate"] < 0'))
+        self.assertTrue(passes('properties["rate"] % 3 == 1'))
+
+    def test_each_filter_must_pass(self):
+        self.assertTrue(NodeFilter(['is_component',
+            'name.startswith("C")']).passes(Node()))
+        self.assertFalse(NodeFilter(['is_component',
+            'is_manager']).passes(Node()))
+
+    def test_type_property(self):
+        self.assertEqual(NodeFilter(['name == "x"',
+            'is_component']).type_property, 'is_component')
+        self.assertEqual(NodeFilter(['name == "x"']).type_property, None)
+
+
+class RejectedTests(unittest.TestCase):
+    def assertBad(self, f):
+        self.assertRaises(BadFilterError, NodeFilter, [f])
+
+    def test_syntax_error(self):
+        self.assertBad('name ==')
+        self.assertBad('name = "x"')
+
+    def test_slice(self):
+        self.assertBad('name[1:] == "amera0.rtc"')
+
+    def test_unpacked_arguments(self):
+        self.assertBad('count(*properties)')
+        self.assertBad('count(**properties)')
+
+    def test_call_of_expression(self):
+        self.assertBad('(lambda: 1)()')
+        self.assertBad('properties["f"]()')
+
+    def test_other_expressions(self):
+        self.assertBad('lambda: True')
+        self.assertBad('[n for n in name]')
+        self.assertBad('is_component if name else is_manager')
+        self.assertBad('{"a": 1}')
+        self.assertBad('1 ** 2')
+        self.assertBad('~1')
+
+    def test_private_names(self):
+        self.assertBad('__class__')
+        self.assertBad('name.__class__ is str')
+        self.assertBad('__import__("os")')
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
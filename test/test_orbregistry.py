@@ -0,0 +1,199 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Tests for the registry of the ORB shared by trees.
+
+The ORBs are stand-ins, so the registry can be started and shut down as often
+as needed without touching omniORB's own ORB.
+
+'''
+
+
+import threading
+import unittest
+import warnings
+
+from rtctree import orbregistry
+from rtctree.orbregistry import ORBRegistry
+
+
+class FakePOAManager(object):
+    def activate(self):
+        pass
+
+
+class FakePOA(object):
+    def _get_the_POAManager(self):
+        return FakePOAManager()
+
+
+class FakeORB(object):
+    def __init__(self, args):
+        self.args = args
+        self.destroyed = False
+
+    def resolve_initial_references(self, name):
+        return FakePOA()
+
+    def shutdown(self, wait_for_completion):
+        pass
+
+    def destroy(self):
+        self.destroyed = True
+
+
+class FakeCORBA(object):
+    # Has the parts of the CORBA module the registry uses.
+    FALSE = False
+
+    def __init__(self):
+        self.started = []
+
+    def ORB_init(self, args):
+        orb = FakeORB(args)
+        self.started.append(orb)
+        return orb
+
+
+class RegistryTests(unittest.TestCase):
+    def setUp(self):
+        # Each test gets a new registry using stand-in ORBs
+        self.old_instance = ORBRegistry.__dict__.get('_the_instance')
+        if self.old_instance is not None:
+            del ORBRegistry._the_instance
+        self.old_corba = orbregistry.CORBA
+        self.corba = FakeCORBA()
+        orbregistry.CORBA = self.corba
+
+    def tearDown(self):
+        orbregistry.CORBA = self.old_corba
+        if '_the_instance' in ORBRegistry.__dict__:
+            del ORBRegistry._the_instance
+        if self.old_instance is not None:
+            ORBRegistry._the_instance = self.old_instance
+
+    def test_one_instance(self):
+        self.assertTrue(ORBRegistry() is ORBRegistry())
+
+    def test_one_instance_across_threads(self):
+        start = threading.Event()
+        made = []
+        def make():
+            start.wait()
+            made.append(ORBRegistry())
+        threads = [threading.Thread(target=make) for ii in range(8)]
+        for t in threads:
+            t.start()
+        start.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(made), 8)
+        self.assertEqual(len(set([id(r) for r in made])), 1)
+
+    def test_shared(self):
+        registry = ORBRegistry()
+        orb1, poa1 = registry.acquire()
+        orb2, poa2 = registry.acquire()
+        self.assertTrue(orb1 is orb2)
+        self.assertTrue(poa1 is poa2)
+        self.assertEqual(len(self.corba.started), 1)
+        self.assertEqual(registry.users, 2)
+
+    def test_release(self):
+        registry = ORBRegistry()
+        orb, poa = registry.acquire()
+        registry.acquire()
+        registry.release(orb)
+        self.assertEqual(registry.users, 1)
+        # An ORB that is not shared is ignored
+        registry.release(FakeORB([]))
+        self.assertEqual(registry.users, 1)
+        registry.release(orb)
+        self.assertEqual(registry.users, 0)
+        registry.release(orb)
+        self.assertEqual(registry.users, 0)
+        # Kept running for the next user
+        self.assertTrue(registry.orb is orb)
+        self.assertFalse(orb.destroyed)
+
+    def test_not_kept_alive(self):
+        registry = ORBRegistry()
+        registry.keep_alive = False
+        orb, poa = registry.acquire()
+        registry.release(orb)
+        self.assertTrue(orb.destroyed)
+        self.assertEqual(registry.orb, None)
+        new_orb, poa = registry.acquire()
+        self.assertFalse(new_orb is orb)
+
+    def test_shutdown(self):
+        registry = ORBRegistry()
+        orb, poa = registry.acquire()
+        self.assertFalse(registry.shutdown())
+        self.assertFalse(orb.destroyed)
+        registry.release(orb)
+        self.assertTrue(registry.shutdown())
+        self.assertTrue(orb.destroyed)
+        self.assertTrue(registry.shutdown())
+
+    def test_concurrent_acquire(self):
+        registry = ORBRegistry()
+        start = threading.Event()
+        orbs = []
+        def use():
+            start.wait()
+            orbs.append(registry.acquire()[0])
+        threads = [threading.Thread(target=use) for ii in range(8)]
+        for t in threads:
+            t.start()
+        start.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(self.corba.started), 1)
+        self.assertEqual(registry.users, 8)
+        for orb in orbs:
+            registry.release(orb)
+        self.assertEqual(registry.users, 0)
+
+    def test_different_args_warn(self):
+        registry = ORBRegistry()
+        orb, poa = registry.acquire(['-ORBclientCallTimeOutPeriod', '100'])
+        self.assertEqual(orb.args, ['-ORBclientCallTimeOutPeriod', '100'])
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            registry.acquire(('-ORBclientCallTimeOutPeriod', '100'))
+            self.assertEqual(caught, [])
+            self.assertTrue(registry.acquire([])[0] is orb)
+        self.assertEqual(len(caught), 1)
+        self.assertTrue(issubclass(caught[0].category, RuntimeWarning))
+
+    def test_args_of_restarted_orb(self):
+        # Once shut down, the next ORB is started with the new arguments
+        registry = ORBRegistry()
+        orb, poa = registry.acquire(['a'])
+        registry.release(orb)
+        registry.shutdown()
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            orb, poa = registry.acquire(['b'])
+        self.assertEqual(caught, [])
+        self.assertEqual(orb.args, ['b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
@@ -0,0 +1,185 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Tests for paging through the bindings of a naming context, using a fake
+naming service.
+
+'''
+
+
+import time
+import unittest
+
+from omniORB import CORBA
+
+from rtctree.pager import BindingPager
+
+from fakes import FakeContext, FakeIterator, FakeObject
+
+
+def make_context(count, error=None):
+    context = FakeContext('cxt', error)
+    for ii in range(count):
+        context.bind('obj{0}'.format(ii), 'rtc', FakeObject())
+    return context
+
+
+def names(bindings):
+    return [b.binding_name[0].id for b in bindings]
+
+
+class SlowIterator(FakeIterator):
+    # Takes a fixed time to return each page.
+    delay = 0.05
+
+    def next_n(self, how_many):
+        time.sleep(self.delay)
+        return super(SlowIterator, self).next_n(how_many)
+
+
+class BrokenIterator(FakeIterator):
+    # Fails to be destroyed, as when the naming service has gone.
+    def destroy(self):
+        self.destroyed = True
+        raise CORBA.COMM_FAILURE(0, CORBA.COMPLETED_NO)
+
+
+class OtherIteratorContext(FakeContext):
+    # Hands out binding iterators of another class.
+    def __init__(self, count, iterator_class):
+        super(OtherIteratorContext, self).__init__('cxt')
+        self.iterator_class = iterator_class
+        for ii in range(count):
+            self.bind('obj{0}'.format(ii), 'rtc', FakeObject())
+
+    def list(self, how_many):
+        bindings, iterator = super(OtherIteratorContext, self).list(how_many)
+        if iterator:
+            iterator = self.iterator_class(iterator.bindings)
+            self.iterators[-1] = iterator
+        return bindings, iterator
+
+
+class BindingPagerTests(unittest.TestCase):
+    def test_all_bindings(self):
+        context = make_context(95)
+        with BindingPager(context, 10) as bindings:
+            result = names(bindings)
+        self.assertEqual(result, ['obj{0}'.format(ii) for ii in range(95)])
+        self.assertEqual(context.lists, [10])
+
+    def test_single_page(self):
+        context = make_context(5)
+        with BindingPager(context, 10) as bindings:
+            self.assertEqual(len(names(bindings)), 5)
+        self.assertEqual(context.iterators, [])
+        self.assertEqual(bindings.pages, 1)
+
+    def test_fixed_pages(self):
+        context = make_context(45)
+        with BindingPager(context, 10, adaptive=False) as bindings:
+            self.assertEqual(len(names(bindings)), 45)
+        self.assertEqual(context.iterators[0].requests, [10] * 5)
+        self.assertEqual(bindings.pages, 5)
+
+    def test_fast_pages_grow(self):
+        context = make_context(100)
+        with BindingPager(context, 10, target_time=10) as bindings:
+            self.assertEqual(len(names(bindings)), 100)
+        self.assertEqual(context.iterators[0].requests, [20, 40, 80, 80])
+
+    def test_max_page(self):
+        context = make_context(100)
+        with BindingPager(context, 10, target_time=10, max_page=15) as \
+                bindings:
+            self.assertEqual(len(names(bindings)), 100)
+        self.assertEqual(context.iterators[0].requests[:3], [15, 15, 15])
+
+    def test_max_payload(self):
+        # Each binding is estimated at 4 + (len('obj0') + len('rtc') + 10) + 4
+        # bytes
+        context = make_context(10)
+        with BindingPager(context, 2, target_time=10, max_payload=100) as \
+                bindings:
+            self.assertEqual(len(names(bindings)), 10)
+        self.assertEqual(bindings.page_size, 100 // 25)
+
+    def test_slow_pages_shrink(self):
+        # Listing the context is quick, so the first page from the iterator
+        # is twice the size of the first page; the pages after it take too
+        # long, and get smaller
+        context = OtherIteratorContext(60, SlowIterator)
+        with BindingPager(context, 16, target_time=0.02) as bindings:
+            self.assertEqual(len(names(bindings)), 60)
+        requests = context.iterators[0].requests
+        self.assertEqual(requests[0], 32)
+        self.assertTrue(requests[1] < requests[0])
+        self.assertTrue(requests[2] < requests[1])
+        self.assertTrue(min(requests) >= 1)
+
+    def test_overlapped_fetch(self):
+        # The next page is fetched while the bindings of the current page are
+        # being used
+        context = make_context(20)
+        with BindingPager(context, 10) as bindings:
+            for ii, b in enumerate(bindings):
+                if ii == 0:
+                    iterator = context.iterators[0]
+                    for jj in range(500):
+                        if iterator.requests:
+                            break
+                        time.sleep(0.01)
+                    self.assertEqual(iterator.requests, [20])
+                    self.assertEqual(iterator.bindings, [])
+
+    def test_destroy_on_success(self):
+        context = make_context(25)
+        with BindingPager(context, 10) as bindings:
+            names(bindings)
+        self.assertTrue(context.iterators[0].destroyed)
+
+    def test_destroy_on_error(self):
+        context = make_context(25,
+                CORBA.TRANSIENT(0, CORBA.COMPLETED_NO))
+        with BindingPager(context, 10) as bindings:
+            self.assertRaises(CORBA.TRANSIENT, names, bindings)
+        self.assertTrue(context.iterators[0].destroyed)
+
+    def test_destroy_on_early_exit(self):
+        context = make_context(25)
+        with BindingPager(context, 10) as bindings:
+            for b in bindings:
+                break
+        self.assertTrue(context.iterators[0].destroyed)
+
+    def test_destroy_without_with(self):
+        context = make_context(25)
+        bindings = iter(BindingPager(context, 10))
+        next(bindings)
+        bindings.close()
+        self.assertTrue(context.iterators[0].destroyed)
+
+    def test_destroy_failure_ignored(self):
+        context = OtherIteratorContext(25, BrokenIterator)
+        with BindingPager(context, 10) as bindings:
+            self.assertEqual(len(names(bindings)), 25)
+        self.assertTrue(context.iterators[0].destroyed)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
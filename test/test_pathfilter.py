@@ -0,0 +1,191 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Tests for the filters restricting which parts of a tree are parsed.
+
+'''
+
+
+import re
+import unittest
+
+from rtctree.pathfilter import PathFilter, compile_filter
+
+
+class TrieTests(unittest.TestCase):
+    def setUp(self):
+        self.f = PathFilter([['/', 'localhost', 'host.cxt', 'comp1.rtc'],
+            ['/', 'localhost', 'other.cxt']])
+
+    def test_empty_filter(self):
+        f = PathFilter()
+        self.assertTrue(f.passes_all)
+        self.assertTrue(f.child('anything') is f)
+        self.assertTrue(f.matches('anything'))
+
+    def test_child(self):
+        ns = self.f.child('/').child('localhost')
+        self.assertFalse(ns.passes_all)
+        self.assertTrue(ns.passes('host.cxt'))
+        self.assertTrue(ns.passes('other.cxt'))
+        self.assertFalse(ns.passes('third.cxt'))
+        self.assertEqual(ns.child('third.cxt'), None)
+
+    def test_descend(self):
+        host = self.f.descend(['/', 'localhost', 'host.cxt'])
+        self.assertTrue(host.passes('comp1.rtc'))
+        self.assertFalse(host.passes('comp2.rtc'))
+        self.assertEqual(self.f.descend(['/', 'otherhost']), None)
+        self.assertEqual(self.f.descend(['/', 'otherhost', 'host.cxt']),
+                None)
+        self.assertTrue(self.f.descend([]) is self.f)
+
+    def test_below_end_of_path(self):
+        # Everything below the end of a path passes
+        other = self.f.descend(['/', 'localhost', 'other.cxt'])
+        self.assertTrue(other.passes_all)
+        self.assertTrue(other.descend(['a.cxt', 'b.rtc']).passes_all)
+
+    def test_matches(self):
+        # Only the end of a path, or what is below it, matches
+        ns = self.f.descend(['/', 'localhost'])
+        self.assertFalse(ns.matches('host.cxt'))
+        self.assertTrue(ns.matches('other.cxt'))
+        self.assertTrue(ns.child('host.cxt').matches('comp1.rtc'))
+
+    def test_shorter_path_wins(self):
+        # A path ending above another makes everything below it pass,
+        # whichever order they are given in
+        for paths in ([['/', 'a', 'b', 'c'], ['/', 'a']],
+                [['/', 'a'], ['/', 'a', 'b', 'c']]):
+            f = PathFilter(paths)
+            self.assertTrue(f.descend(['/', 'a']).passes_all)
+            self.assertTrue(f.descend(['/', 'a', 'x', 'y']).passes_all)
+
+    def test_shared_prefix(self):
+        f = PathFilter([['/', 'a', 'b'], ['/', 'a', 'c']])
+        a = f.descend(['/', 'a'])
+        self.assertTrue(a.matches('b'))
+        self.assertTrue(a.matches('c'))
+        self.assertFalse(a.passes('d'))
+
+    def test_compile_filter(self):
+        self.assertTrue(compile_filter(self.f) is self.f)
+        self.assertTrue(compile_filter([]).passes_all)
+        f = compile_filter([['/', 'a']])
+        self.assertTrue(isinstance(f, PathFilter))
+        self.assertTrue(f.descend(['/', 'a']).passes_all)
+
+    def test_paths(self):
+        self.assertEqual(PathFilter().paths(), [[]])
+        self.assertEqual(self.f.descend(['/', 'localhost']).paths(),
+                [['host.cxt', 'comp1.rtc'], ['other.cxt']])
+
+
+class PatternTests(unittest.TestCase):
+    def test_glob(self):
+        f = PathFilter([['/', '*', '*.host_cxt', 'Camera?.rtc']])
+        host = f.descend(['/', 'localhost', 'a.host_cxt'])
+        self.assertTrue(host.matches('Camera0.rtc'))
+        self.assertFalse(host.passes('Camera10.rtc'))
+        self.assertFalse(host.passes('Laser0.rtc'))
+        self.assertEqual(f.descend(['/', 'localhost', 'a.cxt']), None)
+
+    def test_glob_character_set(self):
+        f = PathFilter([['[ab]*.rtc']])
+        self.assertTrue(f.matches('a0.rtc'))
+        self.assertTrue(f.matches('b0.rtc'))
+        self.assertFalse(f.passes('c0.rtc'))
+
+    def test_glob_whole_name(self):
+        f = PathFilter([['comp*']])
+        self.assertTrue(f.matches('comp0.rtc'))
+        self.assertFalse(f.passes('my_comp0.rtc'))
+
+    def test_regex(self):
+        f = PathFilter([[re.compile(r'comp\d+\.rtc')]])
+        self.assertTrue(f.matches('comp12.rtc'))
+        self.assertFalse(f.passes('comp.rtc'))
+        # The whole name must match
+        self.assertFalse(f.passes('comp1.rtc.bak'))
+        self.assertFalse(f.passes('xcomp1.rtc'))
+
+    def test_same_pattern_merged(self):
+        f = PathFilter([['*.cxt', 'a.rtc'], ['*.cxt', 'b.rtc']])
+        self.assertEqual(len(f._patterns), 1)
+        host = f.child('x.cxt')
+        self.assertTrue(host.matches('a.rtc'))
+        self.assertTrue(host.matches('b.rtc'))
+
+    def test_name_and_pattern_overlap(self):
+        # A name matching both a plain entry and a pattern gets the union of
+        # what follows them
+        f = PathFilter([['host.cxt', 'a.rtc'], ['*.cxt', 'b.rtc']])
+        host = f.child('host.cxt')
+        self.assertTrue(host.matches('a.rtc'))
+        self.assertTrue(host.matches('b.rtc'))
+        other = f.child('other.cxt')
+        self.assertFalse(other.passes('a.rtc'))
+        self.assertTrue(other.matches('b.rtc'))
+
+    def test_overlap_with_end_of_path(self):
+        f = PathFilter([['host.cxt'], ['*.cxt', 'b.rtc']])
+        self.assertTrue(f.child('host.cxt').passes_all)
+        self.assertFalse(f.child('other.cxt').passes_all)
+
+    def test_deep(self):
+        f = PathFilter([['/', '*', '**', 'Camera*.rtc']])
+        ns = f.descend(['/', 'localhost'])
+        self.assertTrue(ns.matches('Camera0.rtc'))
+        for path in (['a.cxt'], ['a.cxt', 'b.cxt'], ['a', 'b', 'c', 'd']):
+            below = ns.descend(path)
+            self.assertTrue(below.matches('Camera0.rtc'))
+            self.assertFalse(below.matches('Laser0.rtc'))
+            # Every directory may lead to a match
+            self.assertTrue(below.passes('any.cxt'))
+
+    def test_deep_at_end(self):
+        f = PathFilter([['a', '**']])
+        self.assertTrue(f.child('a').passes_all)
+
+    def test_deep_then_path(self):
+        f = PathFilter([['**', 'x.cxt', 'c.rtc']])
+        self.assertTrue(f.descend(['x.cxt']).matches('c.rtc'))
+        self.assertTrue(f.descend(['a', 'b', 'x.cxt']).matches('c.rtc'))
+        self.assertFalse(f.descend(['a', 'b']).matches('c.rtc'))
+        self.assertFalse(f.descend(['x.cxt', 'y']).matches('c.rtc'))
+
+    def test_deep_and_name(self):
+        f = PathFilter([['a', '**', 'c.rtc'], ['a', 'b', 'd.rtc']])
+        b = f.descend(['a', 'b'])
+        self.assertTrue(b.matches('c.rtc'))
+        self.assertTrue(b.matches('d.rtc'))
+        self.assertFalse(f.descend(['a', 'x']).matches('d.rtc'))
+
+    def test_paths_round_trip(self):
+        f = PathFilter([['/', '*', '**', 'Camera*.rtc'],
+            ['/', 'h', re.compile('a.c')]]).child('/')
+        g = PathFilter(f.paths())
+        for path, name in ((['h'], 'abc'), (['x', 'y', 'z'], 'Camera1.rtc'),
+                (['h'], 'Camera1.rtc'), (['x'], 'abc')):
+            self.assertEqual(g.descend(path).matches(name),
+                    f.descend(path).matches(name))
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
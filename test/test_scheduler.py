@@ -0,0 +1,192 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Tests for running parsing tasks grouped by endpoint.
+
+'''
+
+
+import threading
+import time
+import unittest
+
+from rtctree.scheduler import ParseScheduler
+
+
+class Recorder(object):
+    # Records how many tasks run at the same time, in total and for each
+    # endpoint. Tasks block until released, so the scheduler's limits can be
+    # seen while they are in force.
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.running = {}
+        self.active = 0
+        self.peak = {}
+        self.peak_active = 0
+        self.started = []
+        self.released = False
+
+    def task(self, endpoint, name):
+        with self.cond:
+            self.started.append(name)
+            self.active += 1
+            self.running[endpoint] = self.running.get(endpoint, 0) + 1
+            self.peak_active = max(self.peak_active, self.active)
+            self.peak[endpoint] = max(self.peak.get(endpoint, 0),
+                    self.running[endpoint])
+            self.cond.notify_all()
+            while not self.released:
+                self.cond.wait()
+            self.active -= 1
+            self.running[endpoint] -= 1
+
+    def wait_for_started(self, count):
+        with self.cond:
+            while len(self.started) < count:
+                self.cond.wait(5)
+
+    def release(self):
+        with self.cond:
+            self.released = True
+            self.cond.notify_all()
+
+
+class ParseSchedulerTests(unittest.TestCase):
+    def test_runs_all_tasks(self):
+        done = []
+        with ParseScheduler(4) as scheduler:
+            for ii in range(20):
+                scheduler.submit(done.append, ii)
+            scheduler.wait()
+        self.assertEqual(sorted(done), list(range(20)))
+
+    def test_tasks_submit_tasks(self):
+        done = []
+        def task(depth):
+            done.append(depth)
+            if depth < 5:
+                scheduler.submit(task, depth + 1)
+                scheduler.submit(task, depth + 1)
+        with ParseScheduler(2) as scheduler:
+            scheduler.submit(task, 0)
+            scheduler.wait()
+        self.assertEqual(len(done), 63)
+
+    def test_per_endpoint_cap(self):
+        recorder = Recorder()
+        with ParseScheduler(8, per_endpoint=2) as scheduler:
+            for ii in range(6):
+                scheduler.submit_to('a:1', recorder.task, 'a:1', ii)
+            recorder.wait_for_started(2)
+            with recorder.cond:
+                self.assertEqual(recorder.running['a:1'], 2)
+            recorder.release()
+            scheduler.wait()
+        self.assertEqual(recorder.peak['a:1'], 2)
+        self.assertEqual(len(recorder.started), 6)
+
+    def test_endpoints_in_parallel(self):
+        # Tasks for one endpoint at its limit do not hold up the others
+        recorder = Recorder()
+        with ParseScheduler(4, per_endpoint=1) as scheduler:
+            for ii in range(3):
+                scheduler.submit_to('a:1', recorder.task, 'a:1', ii)
+            for ii in range(3):
+                scheduler.submit_to('b:1', recorder.task, 'b:1', ii)
+            scheduler.submit_to('c:1', recorder.task, 'c:1', 0)
+            recorder.wait_for_started(3)
+            with recorder.cond:
+                self.assertEqual(recorder.running,
+                        {'a:1': 1, 'b:1': 1, 'c:1': 1})
+            recorder.release()
+            scheduler.wait()
+        self.assertEqual(recorder.peak, {'a:1': 1, 'b:1': 1, 'c:1': 1})
+        self.assertEqual(len(recorder.started), 7)
+
+    def test_worker_limit(self):
+        recorder = Recorder()
+        with ParseScheduler(3, per_endpoint=2) as scheduler:
+            for endpoint in ('a:1', 'b:1', 'c:1'):
+                for ii in range(2):
+                    scheduler.submit_to(endpoint, recorder.task, endpoint,
+                            ii)
+            recorder.wait_for_started(3)
+            recorder.release()
+            scheduler.wait()
+        self.assertEqual(recorder.peak_active, 3)
+
+    def test_unknown_endpoint_not_capped(self):
+        recorder = Recorder()
+        with ParseScheduler(3, per_endpoint=1) as scheduler:
+            for ii in range(3):
+                scheduler.submit(recorder.task, None, ii)
+            recorder.wait_for_started(3)
+            recorder.release()
+            scheduler.wait()
+        self.assertEqual(recorder.peak[None], 3)
+
+    def test_error_raised_from_wait(self):
+        def fail():
+            raise ValueError('failed')
+        with ParseScheduler(2) as scheduler:
+            scheduler.submit(fail)
+            self.assertRaises(ValueError, scheduler.wait)
+
+    def test_error_stops_queued_tasks(self):
+        done = []
+        def fail():
+            raise ValueError('failed')
+        with ParseScheduler(1) as scheduler:
+            scheduler.submit(fail)
+            for ii in range(5):
+                scheduler.submit(done.append, ii)
+            self.assertRaises(ValueError, scheduler.wait)
+        self.assertEqual(done, [])
+
+    def test_first_error_kept(self):
+        go = threading.Event()
+        def fail_later():
+            go.wait(5)
+            raise ValueError('second')
+        def fail():
+            raise KeyError('first')
+        with ParseScheduler(2) as scheduler:
+            scheduler.submit(fail_later)
+            scheduler.submit(fail)
+            while True:
+                with scheduler._cond:
+                    if scheduler._error:
+                        break
+                time.sleep(0.01)
+            go.set()
+            self.assertRaises(KeyError, scheduler.wait)
+
+    def test_usable_after_error(self):
+        done = []
+        def fail():
+            raise ValueError('failed')
+        with ParseScheduler(2) as scheduler:
+            scheduler.submit(fail)
+            self.assertRaises(ValueError, scheduler.wait)
+            scheduler.submit(done.append, 1)
+            scheduler.wait()
+        self.assertEqual(done, [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
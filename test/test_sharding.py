@@ -0,0 +1,93 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Tests for parsing name servers in worker processes.
+
+'''
+
+
+import multiprocessing
+import unittest
+
+from rtctree import exceptions
+from rtctree import sharding
+from rtctree.pathfilter import PathFilter
+
+
+# An address at which no name server is listening
+NO_SERVER = 'localhost:1'
+
+
+class ForkOnly(object):
+    # Stands in for the multiprocessing module of Python 2, which has no
+    # contexts.
+    Pool = multiprocessing.Pool
+
+
+class CheckProcessesTests(unittest.TestCase):
+    def setUp(self):
+        self.saved = sharding.multiprocessing
+
+    def tearDown(self):
+        sharding.multiprocessing = self.saved
+
+    def test_one_process(self):
+        sharding.multiprocessing = ForkOnly()
+        sharding.check_processes(1)
+
+    def test_fork_only_rejected(self):
+        sharding.multiprocessing = ForkOnly()
+        self.assertRaises(exceptions.ProcessesNotSupportedError,
+                sharding.check_processes, 2)
+
+    @unittest.skipUnless(hasattr(multiprocessing, 'get_context'),
+            'worker processes can only be forked')
+    def test_spawn_allowed(self):
+        sharding.check_processes(4)
+
+
+@unittest.skipUnless(hasattr(multiprocessing, 'get_context'),
+        'worker processes can only be forked')
+class WorkerTests(unittest.TestCase):
+    def run_worker(self, task):
+        # Run a task in a real worker process, started as parse_servers
+        # starts them.
+        pool = sharding._context().Pool(1)
+        try:
+            return pool.apply_async(sharding._try_parse_shard,
+                    (task,)).get(60)
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def test_failed_shard(self):
+        # The worker starts its own ORB, fails to reach the name server, and
+        # reports the shard as failed rather than hanging
+        task = (NO_SERVER, [('sub', '')], PathFilter(), 30, 5, [], {})
+        self.assertEqual(self.run_worker(task), (False, None))
+
+    def test_filter_sent_to_worker(self):
+        # The filter for the shard is pickled to reach the worker
+        task = (NO_SERVER, [('sub', '')],
+                PathFilter([['*', '**', 'c*.rtc']]), 30, 5, [],
+                {'lazy': True})
+        self.assertEqual(self.run_worker(task), (False, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
@@ -0,0 +1,257 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Tests for saving trees to snapshot files and restoring them.
+
+No name server is needed: the trees are built from records, and the object
+references are made from corbaloc addresses without contacting anything.
+
+'''
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from omniORB import CORBA
+
+from rtctree import snapshot
+from rtctree.directory import Directory
+from rtctree.node import TreeNode
+from rtctree.rtc import RTC
+
+from fakes import DeadObject, FakeContext, FakeObject
+
+
+def make_ior(orb, key):
+    return orb.object_to_string(orb.string_to_object(
+        'corbaloc::localhost:2809/{0}'.format(key)))
+
+
+def make_record(orb):
+    # A name server holding one of each kind of node.
+    port_props = {'port.port_type': 'DataOutPort',
+            'dataport.data_type': 'IDL:RTC/TimedLong:1.0'}
+    svc_props = {'port.port_type': 'CorbaPort'}
+    conn = {'name': 'out_in', 'id': 'conn0',
+            'properties': {'dataport.dataflow_type': 'push'},
+            'ports': [make_ior(orb, 'out'), make_ior(orb, 'in')]}
+    comp = {'name': 'Comp0.rtc', 'type': 'component',
+            'ior': make_ior(orb, 'comp'),
+            'profile': {'instance_name': 'Comp0', 'type_name': 'Comp',
+                'description': 'A component', 'version': '1.0',
+                'vendor': 'AIST', 'category': 'Test', 'parent': '',
+                'properties': {'exec_cxt.periodic.rate': '1000.0'}},
+            'ports': [{'ior': make_ior(orb, 'out'), 'name': 'out',
+                'properties': port_props, 'connections': [conn]},
+                {'ior': make_ior(orb, 'svc'), 'name': 'svc',
+                'properties': svc_props,
+                'interfaces': [{'instance_name': 'svc0', 'type_name': 'Svc',
+                    'polarity': 'provided'}]}]}
+    mgr = {'name': 'manager.mgr', 'type': 'manager',
+            'ior': make_ior(orb, 'mgr'),
+            'profile': {'instance_name': 'manager'},
+            'configuration': {'manager.is_master': 'NO'},
+            'children': []}
+    directory = {'name': 'host.host_cxt', 'type': 'directory',
+            'ior': make_ior(orb, 'cxt'), 'expanded': True,
+            'children': [comp, mgr,
+                {'name': 'gone.rtc', 'type': 'zombie'},
+                {'name': 'later.rtc', 'type': 'placeholder', 'id': 'later',
+                    'kind': 'rtc'},
+                {'name': 'other.obj', 'type': 'unknown',
+                    'ior': make_ior(orb, 'other')}]}
+    return {'name': 'localhost', 'type': 'nameserver',
+            'ior': make_ior(orb, 'NameService'), 'expanded': True,
+            'children': [directory]}
+
+
+class SnapshotTests(unittest.TestCase):
+    def setUp(self):
+        self.orb = CORBA.ORB_init([])
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'tree.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def build(self, record):
+        root = TreeNode('/', None)
+        root._add_child(snapshot.from_record(record, root, self.orb))
+        return root
+
+    def round_trip(self, record):
+        # Save a tree built from the record, restore it into a new tree and
+        # return both name server nodes.
+        saved = self.build(record)
+        snapshot.save(saved, self.filename)
+        loaded = TreeNode('/', None)
+        snapshot.load(loaded, self.filename, self.orb)
+        return saved.children[0], loaded.children[0]
+
+    def test_round_trip(self):
+        saved, loaded = self.round_trip(make_record(self.orb))
+        self.assertEqual(snapshot.to_record(saved),
+                snapshot.to_record(loaded))
+
+    def test_node_types(self):
+        saved, loaded = self.round_trip(make_record(self.orb))
+        self.assertTrue(loaded.is_nameserver)
+        directory = loaded.get_node(['localhost', 'host.host_cxt'])
+        self.assertTrue(directory.is_directory)
+        self.assertTrue(directory.get_node(['host.host_cxt',
+            'Comp0.rtc']).is_component)
+        self.assertTrue(directory.get_node(['host.host_cxt',
+            'manager.mgr']).is_manager)
+        self.assertTrue(directory.get_node(['host.host_cxt',
+            'gone.rtc']).is_zombie)
+        self.assertTrue(directory.get_node(['host.host_cxt',
+            'later.rtc']).is_placeholder)
+        self.assertTrue(directory.get_node(['host.host_cxt',
+            'other.obj']).is_unknown)
+
+    def test_component(self):
+        saved, loaded = self.round_trip(make_record(self.orb))
+        comp = loaded.get_node(['localhost', 'host.host_cxt', 'Comp0.rtc'])
+        orig = saved.get_node(['localhost', 'host.host_cxt', 'Comp0.rtc'])
+        self.assertTrue(comp.object._is_equivalent(orig.object))
+        self.assertEqual(comp.instance_name, 'Comp0')
+        self.assertEqual(comp.vendor, 'AIST')
+        self.assertEqual(comp.properties['exec_cxt.periodic.rate'], '1000.0')
+        self.assertEqual([p.name for p in comp.ports], ['out', 'svc'])
+        out = comp.get_port_by_name('out')
+        self.assertEqual(out.porttype, 'DataOutPort')
+        self.assertEqual(out.properties['dataport.data_type'],
+                'IDL:RTC/TimedLong:1.0')
+        self.assertEqual([(c.name, c.id) for c in out.connections],
+                [('out_in', 'conn0')])
+        self.assertEqual(out.connections[0].properties,
+                {'dataport.dataflow_type': 'push'})
+        svc = comp.get_port_by_name('svc')
+        self.assertEqual(svc.porttype, 'CorbaPort')
+        self.assertEqual([(i.instance_name, i.polarity_as_string(False))
+            for i in svc.interfaces], [('svc0', 'Provided')])
+
+    def test_manager(self):
+        saved, loaded = self.round_trip(make_record(self.orb))
+        mgr = loaded.get_node(['localhost', 'host.host_cxt', 'manager.mgr'])
+        self.assertEqual(mgr._profile, {'instance_name': 'manager'})
+        self.assertEqual(mgr._configuration, {'manager.is_master': 'NO'})
+
+    def test_non_json_properties(self):
+        record = make_record(self.orb)
+        comp = record['children'][0]['children'][0]
+        comp['profile']['properties']['time'] = RTC.Time(1, 2)
+        comp['profile']['properties']['kind'] = RTC.PERIODIC
+        comp['profile']['properties']['rates'] = [1, 2, 3]
+        saved, loaded = self.round_trip(record)
+        props = loaded.get_node(['localhost', 'host.host_cxt',
+            'Comp0.rtc']).properties
+        self.assertEqual((props['time'].sec, props['time'].nsec), (1, 2))
+        self.assertEqual(props['kind'], RTC.PERIODIC)
+        self.assertEqual(props['rates'], [1, 2, 3])
+
+    def test_pending_directory_filter(self):
+        # A directory that had not been listed is listed with its filter
+        # after being restored
+        record = make_record(self.orb)
+        pending = {'name': 'pending.host_cxt', 'type': 'directory',
+                'binding': [{'id': 'pending', 'kind': 'host_cxt'}],
+                'expanded': False,
+                'filter': [['Camera*.rtc'], ['sub', '**', 'comp0.rtc']],
+                'children': []}
+        record['children'].append(pending)
+        saved, loaded = self.round_trip(record)
+        directory = loaded.get_node(['localhost', 'pending.host_cxt'])
+        self.assertFalse(directory.expanded)
+        filter = directory._deferred[2]
+        self.assertTrue(filter.matches('Camera0.rtc'))
+        self.assertFalse(filter.passes('Laser0.rtc'))
+        self.assertTrue(filter.descend(['sub', 'a', 'b']).matches(
+            'comp0.rtc'))
+        self.assertFalse(filter.descend(['sub']).matches('comp1.rtc'))
+        self.assertEqual(snapshot.to_record(saved),
+                snapshot.to_record(loaded))
+
+    def test_pending_directory_unfiltered(self):
+        record = make_record(self.orb)
+        record['children'][0]['expanded'] = False
+        saved, loaded = self.round_trip(record)
+        directory = loaded.get_node(['localhost', 'host.host_cxt'])
+        self.assertTrue(directory._deferred[2].passes_all)
+
+    def test_unsavable_property(self):
+        record = make_record(self.orb)
+        comp = record['children'][0]['children'][0]
+        comp['profile']['properties']['bad'] = object()
+        root = self.build(record)
+        self.assertRaises(TypeError, snapshot.save, root, self.filename)
+        self.assertFalse(os.path.exists(self.filename))
+        self.assertFalse(os.path.exists(self.filename + '.tmp'))
+
+
+class ValidateTests(unittest.TestCase):
+    def setUp(self):
+        # Component profiles are deferred so the fake objects are only
+        # pinged
+        self.context = FakeContext('host')
+        self.context.bind('live', 'rtc', FakeObject('live'))
+        self.dead = self.context.bind('dead', 'rtc', DeadObject('dead'))
+        self.root = TreeNode('/', None)
+        self.dir = Directory('host.cxt', self.root, defer_profiles=True)
+        self.root._add_child(self.dir)
+        self.dir._parse_context(self.context, None)
+
+    def get(self, name):
+        return self.dir.get_node(['host.cxt', name])
+
+    def test_live_kept(self):
+        live = self.get('live.rtc')
+        snapshot.validate(self.root)
+        self.assertTrue(self.get('live.rtc') is live)
+
+    def test_dead_zombified(self):
+        snapshot.validate(self.root)
+        self.assertTrue(self.get('dead.rtc').is_zombie)
+        self.assertTrue(self.get('live.rtc').is_component)
+
+    def test_unbound_zombified(self):
+        self.context.unbind('dead', 'rtc')
+        snapshot.validate(self.root)
+        self.assertTrue(self.get('dead.rtc').is_zombie)
+
+    def test_restarted_replaced(self):
+        # A component restarted under the same name is found again rather
+        # than made a zombie
+        new = self.context.bind('dead', 'rtc', FakeObject('restarted'))
+        snapshot.validate(self.root)
+        node = self.get('dead.rtc')
+        self.assertTrue(node.is_component)
+        self.assertTrue(node.object is new)
+        self.assertTrue(self.root._index[('/', 'host.cxt', 'dead.rtc')] is
+                node)
+
+    def test_restarted_and_dead_zombified(self):
+        self.context.bind('dead', 'rtc', DeadObject('restarted'))
+        snapshot.validate(self.root)
+        self.assertTrue(self.get('dead.rtc').is_zombie)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
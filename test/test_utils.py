@@ -0,0 +1,156 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Tests for decoding the endpoints of stringified IORs.
+
+'''
+
+
+import binascii
+import struct
+import unittest
+
+from rtctree.utils import ior_endpoint
+
+
+TAG_INTERNET_IOP = 0
+TAG_MULTIPLE_COMPONENTS = 1
+
+
+class CDRWriter(object):
+    # Writes an encapsulation: a byte order octet followed by CDR data, with
+    # alignment relative to the start of the encapsulation.
+    def __init__(self, little_endian=True):
+        self.order = '<' if little_endian else '>'
+        self.data = bytearray([1 if little_endian else 0])
+
+    def align(self, size):
+        self.data += bytearray(-len(self.data) % size)
+
+    def octets(self, value):
+        self.data += bytearray(value)
+
+    def string(self, value):
+        self.ulong(len(value) + 1)
+        self.octets(value.encode('latin-1') + b'\0')
+
+    def ulong(self, value):
+        self.align(4)
+        self.data += bytearray(struct.pack(self.order + 'I', value))
+
+    def ushort(self, value):
+        self.align(2)
+        self.data += bytearray(struct.pack(self.order + 'H', value))
+
+
+def iiop_profile(host, port, little_endian=True):
+    body = CDRWriter(little_endian)
+    body.octets(b'\x01\x02')
+    body.string(host)
+    body.ushort(port)
+    body.ulong(4)
+    body.octets(b'key0')
+    return TAG_INTERNET_IOP, body.data
+
+
+def other_profile(little_endian=True):
+    body = CDRWriter(little_endian)
+    body.ulong(0)
+    return TAG_MULTIPLE_COMPONENTS, body.data
+
+
+def make_ior(profiles, type_id='IDL:omg.org/RTC/RTObject:1.0',
+        little_endian=True):
+    ior = CDRWriter(little_endian)
+    ior.string(type_id)
+    ior.ulong(len(profiles))
+    for tag, data in profiles:
+        ior.ulong(tag)
+        ior.ulong(len(data))
+        ior.octets(data)
+    return 'IOR:' + binascii.hexlify(bytes(ior.data)).decode('ascii')
+
+
+class IOREndpointTests(unittest.TestCase):
+    def test_little_endian(self):
+        ior = make_ior([iiop_profile('host', 2810)])
+        self.assertEqual(ior_endpoint(ior), 'host:2810')
+
+    def test_big_endian(self):
+        ior = make_ior([iiop_profile('host', 2810, False)],
+                little_endian=False)
+        self.assertEqual(ior_endpoint(ior), 'host:2810')
+
+    def test_mixed_byte_order(self):
+        # Each encapsulation has its own byte order
+        ior = make_ior([iiop_profile('host', 2810, False)])
+        self.assertEqual(ior_endpoint(ior), 'host:2810')
+        ior = make_ior([iiop_profile('host', 2810)], little_endian=False)
+        self.assertEqual(ior_endpoint(ior), 'host:2810')
+
+    def test_alignment(self):
+        # The lengths of the strings change the padding before the values
+        # after them
+        for length in range(1, 9):
+            host = 'h' * length
+            ior = make_ior([iiop_profile(host, 2810)], type_id='I' * length)
+            self.assertEqual(ior_endpoint(ior), host + ':2810')
+
+    def test_other_profile_first(self):
+        ior = make_ior([other_profile(), iiop_profile('host', 2810)])
+        self.assertEqual(ior_endpoint(ior), 'host:2810')
+
+    def test_first_iiop_profile(self):
+        ior = make_ior([iiop_profile('first', 2810),
+            iiop_profile('second', 2811)])
+        self.assertEqual(ior_endpoint(ior), 'first:2810')
+
+    def test_no_iiop_profile(self):
+        self.assertEqual(ior_endpoint(make_ior([other_profile()])), None)
+        self.assertEqual(ior_endpoint(make_ior([])), None)
+
+    def test_not_an_ior(self):
+        self.assertEqual(ior_endpoint(None), None)
+        self.assertEqual(ior_endpoint(''), None)
+        self.assertEqual(ior_endpoint('corbaloc::host:2809/NameService'),
+                None)
+
+    def test_empty(self):
+        self.assertEqual(ior_endpoint('IOR:'), None)
+
+    def test_bad_hex(self):
+        self.assertEqual(ior_endpoint('IOR:zz'), None)
+        self.assertEqual(ior_endpoint('IOR:010'), None)
+
+    def test_truncated(self):
+        ior = make_ior([iiop_profile('host', 2810)])
+        for end in range(4, len(ior), 2):
+            self.assertEqual(ior_endpoint(ior[:end]), None)
+
+    def test_empty_profile(self):
+        ior = make_ior([(TAG_INTERNET_IOP, bytearray())])
+        self.assertEqual(ior_endpoint(ior), None)
+
+    def test_truncated_profile(self):
+        tag, data = iiop_profile('host', 2810)
+        ior = make_ior([(tag, data[:8])])
+        self.assertEqual(ior_endpoint(ior), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79